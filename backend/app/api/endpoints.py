@@ -1,7 +1,10 @@
 from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi.responses import JSONResponse, StreamingResponse
 from ..services.data_provider import data_provider
-from ..services.analysis import train_hmm_returns, train_hmm_diff, generate_ai_recommendation, get_historical_verdicts
+from ..services.analysis import train_hmm_batch, analyze_regimes, generate_ai_recommendation
+from ..services.regime_pool import regime_pool
 from ..services.llm import llm_service
+import os
 import logging
 import asyncio
 import numpy as np
@@ -11,15 +14,36 @@ from starlette.concurrency import run_in_threadpool
 import re
 import pandas as pd
 from concurrent.futures import ThreadPoolExecutor
+from ..core.singleflight import SingleFlight
+from ..core.response_cache import analysis_cache
+from ..core.jobs import portfolio_jobs, JobQueueFull
+from ..core.scheduler import inference_scheduler, degraded_scheduler, inference_priority, current_priority, PORTFOLIO
+from ..core.admission import admission, DEGRADE, REJECT
+from ..core import deadline
+from ..core.cancellation import disconnect_watcher, ClientDisconnected
+from . import formats
 
 router = APIRouter()
 
 # Executor global compartido para todos los requests (evita crear/destruir pools por request)
 _EXECUTOR = ThreadPoolExecutor(max_workers=4)
 
-# Semáforo para serializar inferencia pesada (HMM + Chronos/PyTorch)
+# Inferencia pesada (HMM + Chronos/PyTorch) serializada en un único carril: inference_scheduler (1 slot)
 # PyTorch no es thread-safe con múltiples inferencias concurrentes en CPU
-_INFERENCE_SEMAPHORE = asyncio.Semaphore(1)
+# With HMM_WORKERS the HMM + scoring stages run on regime_pool instead and only Chronos takes this lane
+# Priority classes (core.scheduler) keep single-ticker requests ahead of portfolio sweeps and refreshes
+# GBM-only (degraded) analyses without regime workers take degraded_scheduler instead: no PyTorch involved
+
+# Portfolios with at least this many tickers fit their HMMs together in one batched engine
+PORTFOLIO_BATCH_MIN = int(os.getenv("PORTFOLIO_BATCH_MIN", "4"))
+
+# Tickers a background portfolio job keeps in flight, so interactive requests interleave with long sweeps
+PORTFOLIO_JOB_CONCURRENCY = int(os.getenv("PORTFOLIO_JOB_CONCURRENCY", "8"))
+# Tickers of a /portfolio request admitted to the lanes at once; each is admitted when its turn comes
+PORTFOLIO_CONCURRENCY = int(os.getenv("PORTFOLIO_CONCURRENCY", "16"))
+
+# Coalesces identical in-flight analyses keyed by (ticker, mode, last bar date)
+analysis_singleflight = SingleFlight("analysis")
 logger = logging.getLogger(__name__)
 _log = logger # Harmonize logging names
 
@@ -31,116 +55,205 @@ async def ping():
 def validate_ticker(ticker: str) -> bool:
     return bool(re.match(r'^[A-Z0-9]{1,10}(\.[A-Z]{1,3})?$', ticker))
 
-def sanitize_for_json(obj):
-    """Replace NaN and Infinity with None for JSON compliance"""
-    if isinstance(obj, float):
-        if np.isnan(obj) or np.isinf(obj):
-            return None
-        return obj
-    elif isinstance(obj, dict):
-        return {k: sanitize_for_json(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [sanitize_for_json(item) for item in obj]
-    return obj
-
-def _run_full_analysis(data: pd.DataFrame, ticker: str, lite_mode: bool) -> dict:
+def _run_forecast(data: pd.DataFrame, ticker: str, gbm_only: bool = False) -> list:
     """
-    SYNCHRONOUS function: runs ALL CPU-bound work (HMM + Chronos) in one place.
-    Designed to be called via loop.run_in_executor() so the asyncio event loop
-    is NEVER blocked. Chronos/PyTorch inference is safe here because it runs
-    in a dedicated thread, not in the event loop.
+    SYNCHRONOUS: 10-day forecast, Chronos with a GBM fallback. Runs under
+    inference_scheduler (the serialized Chronos lane), never in the event loop.
+    gbm_only skips Chronos (admission control downgrade under load).
     """
-    # Blacklist certain tickers that cause native library instability (SIGSEGV) in Windows/Torch
+    # Blacklist certain tickers that cause native library instability (SIGSEGV) in Windows/Torch.
+    # Only needed when Chronos runs in-process; isolated workers survive such crashes.
+    from ..services.chronos import chronos_service
     _CHRONOS_BLACKLIST = ["EOAN.DE"]
-    is_blacklisted = any(b in ticker for b in _CHRONOS_BLACKLIST)
+    is_blacklisted = any(b in ticker for b in _CHRONOS_BLACKLIST) and not chronos_service.isolated
     if is_blacklisted:
         _log.warning(f"Ticker {ticker} is blacklisted for Chronos. Using GBM fallback.")
-        lite_mode = True
+        return []
 
-    try:
-        # Step 1: HMM (hmmlearn / numpy)
-        regimes_ret, probs_ret, final_ret_stats = train_hmm_returns(data)
-        regimes_diff, probs_diff, final_diff_stats = train_hmm_diff(data)
-        
-        # Step 2: Forecast (Chronos with GBM fallback)
-        price_col = 'Close'
-        last_price = float(data[price_col].iloc[-1])
-        last_date = data.index[-1]
-        
-        forecast = []
-        if not lite_mode:
-            from ..services.chronos import chronos_service
-            from datetime import timedelta
-            
-            # Try Chronos first
-            chronos_success = False
-            if chronos_service.enabled:
-                try:
-                    _log.info("Attempting Chronos prediction...")
-                    chronos_pred = chronos_service.predict(data[price_col].values[-30:], 10)
-                    if chronos_pred:
-                        forecast = [
-                            {
-                                "date": (last_date + timedelta(days=i+1)).strftime("%Y-%m-%d"),
-                                "price": chronos_pred["prices"][i],
-                                "price_low": chronos_pred["lows"][i],
-                                "price_high": chronos_pred["highs"][i],
-                                "type": "forecast",
-                                "source": "chronos"
-                            }
-                            for i in range(len(chronos_pred["prices"]))
-                        ]
-                        chronos_success = True
-                except Exception as ce:
-                    _log.warning(f"Chronos failed: {ce}. Falling back to GBM.")
-            
-            if not chronos_success:
-                # GBM fallback (Geometric Brownian Motion)
-                import numpy as _np
-                returns = _np.diff(_np.log(data[price_col].values[-60:])) if len(data) > 1 else [0]
-                mu = float(_np.mean(returns)) if len(returns) > 0 else 0
-                sigma = float(_np.std(returns)) if len(returns) > 0 else 0.01
-                
-                for i in range(10):
-                    drift = _np.exp((mu - 0.5 * sigma**2) * (i+1))
-                    uncertainty = 1.96 * sigma * _np.sqrt(i+1)
-                    price_est = float(last_price * drift)
-                    forecast.append({
+    from datetime import timedelta
+    price_col = 'Close'
+    last_price = float(data[price_col].iloc[-1])
+    last_date = data.index[-1]
+
+    # Try Chronos first
+    forecast = []
+    if chronos_service.available and not gbm_only:
+        try:
+            _log.info("Attempting Chronos prediction...")
+            chronos_pred = chronos_service.predict(data[price_col].values[-30:], 10)
+            if chronos_pred:
+                return [
+                    {
                         "date": (last_date + timedelta(days=i+1)).strftime("%Y-%m-%d"),
-                        "price": price_est,
-                        "price_low": float(price_est * _np.exp(-uncertainty)),
-                        "price_high": float(price_est * _np.exp(uncertainty)),
+                        "price": chronos_pred["prices"][i],
+                        "price_low": chronos_pred["lows"][i],
+                        "price_high": chronos_pred["highs"][i],
                         "type": "forecast",
-                        "source": "gbm"
-                    })
-        
-        # Step 3: Hysteresis state machine
-        verdicts, scores = get_historical_verdicts(
-            data, regimes_ret, regimes_diff, final_ret_stats, final_diff_stats
-        )
-        stable_state = int(verdicts[-1]) if len(verdicts) > 0 else 0
-        smoothed_score = float(scores[-1]) if len(scores) > 0 else 50.0
-        
-        return {
-            "regimes_ret": regimes_ret,
-            "probs_ret": probs_ret,
-            "final_ret_stats": final_ret_stats,
-            "regimes_diff": regimes_diff,
-            "probs_diff": probs_diff,
-            "final_diff_stats": final_diff_stats,
-            "forecast": forecast,
-            "stable_state": stable_state,
-            "smoothed_score": smoothed_score,
-            "verdicts": verdicts,
-        }
+                        "source": "chronos"
+                    }
+                    for i in range(len(chronos_pred["prices"]))
+                ]
+        except Exception as ce:
+            _log.warning(f"Chronos failed: {ce}. Falling back to GBM.")
+
+    # GBM fallback (Geometric Brownian Motion)
+    returns = np.diff(np.log(data[price_col].values[-60:])) if len(data) > 1 else [0]
+    mu = float(np.mean(returns)) if len(returns) > 0 else 0
+    sigma = float(np.std(returns)) if len(returns) > 0 else 0.01
+
+    for i in range(10):
+        drift = np.exp((mu - 0.5 * sigma**2) * (i+1))
+        uncertainty = 1.96 * sigma * np.sqrt(i+1)
+        price_est = float(last_price * drift)
+        forecast.append({
+            "date": (last_date + timedelta(days=i+1)).strftime("%Y-%m-%d"),
+            "price": price_est,
+            "price_low": float(price_est * np.exp(-uncertainty)),
+            "price_high": float(price_est * np.exp(uncertainty)),
+            "type": "forecast",
+            "source": "gbm"
+        })
+    return forecast
+
+def _run_full_analysis(data: pd.DataFrame, ticker: str, lite_mode: bool, regimes: tuple | None = None,
+                       gbm_only: bool = False) -> dict:
+    """
+    SYNCHRONOUS function: runs ALL CPU-bound work (HMM + Chronos) in one place.
+    Designed to be called via loop.run_in_executor() so the asyncio event loop
+    is NEVER blocked. Chronos/PyTorch inference is safe here because it runs
+    in a dedicated thread, not in the event loop.
+    `regimes` optionally carries the (returns, diff) HMM results of a batched portfolio fit.
+
+    lite_mode is the verdict-only pipeline: no forecast, only the last bar's regime
+    probabilities and only the last hysteresis state (verdicts comes back empty).
+    gbm_only forecasts with GBM alone (see _admitted_analysis).
+    """
+    try:
+        # Step 1: HMM + hysteresis state machine (numpy)
+        result = analyze_regimes(data, ticker, verdict_only=lite_mode, regimes=regimes)
+        # Step 2: Forecast (Chronos with GBM fallback)
+        result["forecast"] = [] if lite_mode else _run_forecast(data, ticker, gbm_only)
+        return result
     except Exception as e:
         import traceback
         _log.error(f"_run_full_analysis failed: {e}")
         _log.error(traceback.format_exc())
         return None
 
-@router.get("/analyze/{ticker}")
-async def analyze_stock(ticker: str, lite_mode: bool = False):
+async def _run_pooled_analysis(data: pd.DataFrame, ticker: str, lite_mode: bool, gbm_only: bool = False) -> dict:
+    """
+    _run_full_analysis with the HMM and scoring stages on the regime worker pool, so
+    tickers analyse in parallel across cores; only a Chronos forecast takes the
+    serialized inference lane. Falls back to the in-process path if the pool fails.
+    """
+    try:
+        result = await regime_pool.run_regimes(ticker, data, verdict_only=lite_mode)
+    except Exception as e:
+        _log.warning(f"Regime worker failed for {ticker} ({e}). Analysing in-process.")
+        async with _lane(gbm_only).slot():
+            return await run_in_threadpool(_run_full_analysis, data, ticker, lite_mode, None, gbm_only)
+    if lite_mode:
+        result["forecast"] = []
+        return result
+    # Re-checked after the HMM stage: Chronos only if its slot and run still fit the deadline
+    # (the flight's: best priority and latest deadline among the callers waiting on it)
+    if not gbm_only and not deadline.allows(
+            deadline.CHRONOS, deadline.CHRONOS_MIN + inference_scheduler.estimate_wait(current_priority())):
+        gbm_only = result["degraded"] = True
+    try:
+        if gbm_only:
+            result["forecast"] = await run_in_threadpool(_run_forecast, data, ticker, True)
+        else:
+            async with inference_scheduler.slot():
+                result["forecast"] = await run_in_threadpool(_run_forecast, data, ticker)
+    except Exception as e:
+        _log.error(f"Forecast failed for {ticker}: {e}", exc_info=True)
+        return None
+    return result
+
+async def _until_disconnect(request: Request | None, route: str, factory):
+    """factory() cancelled as soon as the client goes away (queued work included); 499 then"""
+    try:
+        return await disconnect_watcher.run(request, route, factory)
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="El cliente cerró la conexión.")
+
+@router.get("/analyze/{ticker}", response_class=formats.NumpyJSONResponse)
+async def analyze_stock(ticker: str, lite_mode: bool = False, format: str | None = None, request: Request = None):
+    """
+    Content negotiation (?format= or Accept, see api.formats): json keeps history and
+    forecast as one dict per day; columnar, msgpack and arrow send them as column arrays.
+    """
+    if not validate_ticker(ticker):
+        raise HTTPException(status_code=400, detail=f"Ticker inválido '{ticker}'.")
+    fmt = formats.negotiate(format, request.headers.get("accept") if request is not None else None)
+    deadline.start(deadline.ANALYZE_BUDGET)
+    # Market-aware cache: stale entries are served immediately and refreshed in background
+    payload = await _until_disconnect(request, "/analyze", lambda: analysis_cache.get_or_compute(
+        f"{ticker}:{'lite' if lite_mode else 'full'}", ticker,
+        lambda: _admitted_analysis(ticker, lite_mode),
+        cacheable=_is_cacheable
+    ))
+    return formats.render(payload, fmt)
+
+def _estimated_wait(ticker: str | None, lite_mode: bool, priority: str) -> tuple[float, float | None]:
+    """
+    (estimated queue wait of the analysis as asked, the same for its GBM-only variant or
+    None for lite analyses, which have no lighter path). With regime workers the HMM
+    stage queues on the ticker's lane and only Chronos on the inference lane; without
+    them the analysis holds the inference lane, and the GBM-only one the degraded lane.
+    """
+    lane_wait = inference_scheduler.estimate_wait(priority)
+    if regime_pool.enabled:
+        hmm_wait = regime_pool.estimate_wait(priority, ticker)
+        return (hmm_wait, None) if lite_mode else (hmm_wait + lane_wait, hmm_wait)
+    return (lane_wait, None) if lite_mode else (lane_wait, degraded_scheduler.estimate_wait(priority))
+
+def _lane(gbm_only: bool):
+    """Lane for in-process analysis work: the Chronos forecast needs the serialized inference lane"""
+    return degraded_scheduler if gbm_only else inference_scheduler
+
+def _shed(wait: float, degraded_wait: float | None = None):
+    raise HTTPException(
+        status_code=503,
+        detail="Servidor saturado. Inténtalo de nuevo en unos segundos.",
+        headers={"Retry-After": admission.retry_after(wait, degraded_wait)},
+    )
+
+async def _admitted_analysis(ticker: str, lite_mode: bool) -> dict:
+    """
+    _analyze_ticker behind admission control, decided before any data is fetched:
+    admitted as asked, downgraded to the GBM-only forecast, or shed with 503 + Retry-After
+    when the estimated queue wait exceeds the budgets (core.admission).
+    """
+    priority = inference_priority.get()
+    wait, degraded_wait = _estimated_wait(ticker, lite_mode, priority)
+    decision = admission.decide(priority, wait, degraded_wait)
+    if decision == REJECT:
+        _shed(wait, degraded_wait)
+    return await _analyze_ticker(ticker, lite_mode=lite_mode, gbm_only=decision == DEGRADE)
+
+def _is_cacheable(response: dict) -> bool:
+    """
+    GBM forecasts produced only because Chronos is still warming up, or because
+    admission control or the request deadline downgraded the request, must not be cached
+    """
+    from ..services.chronos import chronos_service
+    if response.get("degraded"):
+        return False
+    if chronos_service.state in ("ready", "failed"):
+        return True
+    return not any(f.get("source") == "gbm" for f in response.get("forecast", []))
+
+async def _analyze_ticker(ticker: str, lite_mode: bool = False, prefetched: tuple | None = None,
+                          regimes: tuple | None = None, gbm_only: bool = False):
+    """
+    Shared analysis pipeline behind /analyze and /portfolio.
+    `prefetched` is an optional (DataFrame, currency) pair from a bulk fetch and
+    `regimes` the matching HMM results from train_hmm_batch. gbm_only skips Chronos.
+    Bound by the request deadline (core.deadline): Chronos is skipped when its queue
+    wait and run no longer fit, and running out of budget ends in 504.
+    """
     if not validate_ticker(ticker):
         raise HTTPException(status_code=400, detail=f"Ticker inválido '{ticker}'.")
 
@@ -148,7 +261,10 @@ async def analyze_stock(ticker: str, lite_mode: bool = False):
     
     try:
         # 1. Fetch Data (Async - yfinance runs in thread pool inside data_provider)
-        data, currency = await data_provider.fetch_ticker_data(ticker)
+        if prefetched is not None:
+            data, currency = prefetched
+        else:
+            data, currency = await data_provider.fetch_ticker_data(ticker)
         
         if data.empty:
             raise HTTPException(status_code=404, detail=f"Ticker '{ticker}' no encontrado o sin datos.")
@@ -160,8 +276,19 @@ async def analyze_stock(ticker: str, lite_mode: bool = False):
         # The semaphore serializes concurrent requests to prevent PyTorch/BLAS thread contention.
         # 2. Run FULL Analysis (CPU bound work in threadpool)
         # Using run_in_threadpool instead of manual executor for better exception handling
-        async with _INFERENCE_SEMAPHORE:
-            result = await run_in_threadpool(_run_full_analysis, data, ticker, lite_mode)
+        # Concurrent requests for the same ticker/mode/data share a single computation
+        async def _compute():
+            if regime_pool.enabled and regimes is None:
+                return await _run_pooled_analysis(data, ticker, lite_mode, gbm_only)
+            async with _lane(gbm_only).slot():
+                return await run_in_threadpool(_run_full_analysis, data, ticker, lite_mode, regimes, gbm_only)
+
+        if not lite_mode and not gbm_only:
+            wait, _ = _estimated_wait(ticker, lite_mode, inference_priority.get())
+            gbm_only = not deadline.allows(deadline.CHRONOS, deadline.CHRONOS_MIN + wait)
+
+        flight_key = (ticker, lite_mode, gbm_only, data.index[-1].isoformat())
+        result = await asyncio.wait_for(analysis_singleflight.run(flight_key, _compute), timeout=deadline.timeout())
         
         if result is None:
             raise HTTPException(status_code=500, detail="El análisis interno falló. Revisa los logs.")
@@ -198,16 +325,21 @@ async def analyze_stock(ticker: str, lite_mode: bool = False):
 
         history = []
         if not lite_mode:
-            for i in range(len(data)):
-                # Use hysteresis verdict for chart coloring (smoother, no daily flips)
-                # Falls back to raw HMM regime if verdicts array is shorter
-                chart_regime = int(verdicts[i]) if i < len(verdicts) else int(regimes_ret[i])
-                history.append({
-                    "date": data.index[i].strftime("%Y-%m-%d"),
-                    "price": float(data[price_col].iloc[i]),
-                    "regime": chart_regime,
-                    "rvol": float(data['RVOL'].iloc[i]) if 'RVOL' in data.columns else 1.0
-                })
+            # Columnar, straight from the arrays (api.formats renders the per-day rows for json).
+            # Use hysteresis verdict for chart coloring (smoother, no daily flips)
+            # Falls back to raw HMM regime if verdicts array is shorter
+            n_bars = len(data)
+            chart_regimes = np.asarray(regimes_ret[:n_bars], dtype=np.int64).copy()
+            n_verdicts = min(len(verdicts), n_bars)
+            chart_regimes[:n_verdicts] = np.asarray(verdicts[:n_verdicts], dtype=np.int64)
+            index = data.index.tz_localize(None) if data.index.tz is not None else data.index
+            history = {
+                "date": np.datetime_as_string(index.values, unit="D").tolist(),
+                "price": formats.finite_list(data[price_col].to_numpy(dtype=np.float64)),
+                "regime": chart_regimes.tolist(),
+                "rvol": formats.finite_list(data['RVOL'].to_numpy(dtype=np.float64) if 'RVOL' in data.columns
+                                            else np.ones(n_bars)),
+            }
 
         response_data = {
             "ticker": ticker,
@@ -220,13 +352,15 @@ async def analyze_stock(ticker: str, lite_mode: bool = False):
             "recommendation": ai_rec,
             "current_regime_ret": int(regimes_ret[-1]),
             "current_regime_diff": int(regimes_diff[-1]),
-            "regime_probs_ret": probs_ret[-1].tolist(),
-            "regime_probs_diff": probs_diff[-1].tolist(),
+            "regime_probs_ret": formats.finite_list(probs_ret[-1]),
+            "regime_probs_diff": formats.finite_list(probs_diff[-1]),
             "state_stats_ret": final_ret_stats,
             "state_stats_diff": final_diff_stats,
+            "degraded": gbm_only or result.get("degraded", False),
         }
         
-        return sanitize_for_json(response_data)
+        # Non-finite floats left in the scalars and stats become null in formats.NumpyJSONResponse
+        return response_data
 
     except asyncio.TimeoutError:
         logger.error(f"Timeout analyzing {ticker}")
@@ -237,31 +371,58 @@ async def analyze_stock(ticker: str, lite_mode: bool = False):
         logger.error(f"Error analyzing {ticker}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/portfolio")
-async def analyze_portfolio(tickers: list[str]):
+async def _fit_portfolio_regimes(prefetched: dict) -> dict:
+    """
+    Fits the HMMs of every usable prefetched ticker in one batched pass.
+    Returns {} (per-ticker fitting) for small portfolios or when the batch fails.
+    """
+    datasets = {t: data for t, (data, _) in prefetched.items() if not data.empty and len(data) >= 60}
+    if len(datasets) < PORTFOLIO_BATCH_MIN:
+        return {}
+    try:
+        if regime_pool.enabled:
+            return await regime_pool.fit_batch(datasets, full_posteriors=False)
+        async with inference_scheduler.slot():
+            return await run_in_threadpool(train_hmm_batch, datasets, full_posteriors=False)
+    except Exception as e:
+        logger.warning(f"Batched HMM fit failed, falling back to per-ticker fits: {e}")
+        return {}
+
+async def _prepare_portfolio(tickers: list[str], admit: bool = True) -> tuple[list[str], dict, dict]:
+    """
+    Validated ticker list, bulk-prefetched data and batched HMM fits for a portfolio run.
+    With `admit`, sheds the run with 503 up front when the lanes are backed up (jobs queue instead).
+    """
     if not tickers:
         raise HTTPException(status_code=400, detail="Se requiere al menos un ticker")
-    
+
     if len(tickers) > 300:
         tickers = tickers[:300] # Limit increased for composite indices
-    
-    # Run analyses in parallel!
-    tasks = [analyze_stock(ticker, lite_mode=True) for ticker in tickers]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    valid_results = []
-    failed = []
-    
-    for i, res in enumerate(results):
-        if isinstance(res, Exception):
-            logger.error(f"Error in portfolio for {tickers[i]}: {res}")
-            failed.append(tickers[i])
-        else:
-            valid_results.append(res)
-            
-    if not valid_results:
-         raise HTTPException(status_code=400, detail="No se pudo analizar ningún activo del portfolio")
 
+    # Admission control before the bulk fetch: a backed-up lane would time the sweep out anyway
+    if admit:
+        priority = inference_priority.get()
+        wait, _ = _estimated_wait(None, True, priority)
+        if admission.decide(priority, wait) == REJECT:
+            _shed(wait)
+
+    # Bulk download every valid ticker in a few grouped requests before any analysis starts.
+    # Tickers missing from the batch fall back to their own fetch inside _analyze_ticker.
+    try:
+        prefetched = await data_provider.fetch_many([t for t in tickers if validate_ticker(t)])
+    except Exception as e:
+        logger.warning(f"Bulk fetch failed, falling back to per-ticker downloads: {e}")
+        prefetched = {}
+
+    batch_regimes = await _fit_portfolio_regimes(prefetched)
+    return tickers, prefetched, batch_regimes
+
+async def _portfolio_summary(valid_results: list[dict]) -> dict:
+    """
+    Portfolio-level aggregation of lite results: regime distribution, verdict buckets,
+    leaders, alerts, risk level and the Groq insight. Only reads ticker,
+    current_regime_ret/diff, change_pct and recommendation.verdict of each result.
+    """
     # Aggregation Logic (Copied from original server.py)
     reg_list = [r['current_regime_ret'] for r in valid_results]
     bullish_count = reg_list.count(1)
@@ -334,26 +495,256 @@ async def analyze_portfolio(tickers: list[str]):
     }
     ai_insight = await llm_service.evaluate_portfolio_async(portfolio_stats)
 
+    return {
+        "total_assets": total,
+        "regime_distribution": {
+            "bullish": bullish_count,
+            "stable": stable_count,
+            "volatile": volatile_count
+        },
+        "risk_level": risk_level,
+        "advice": "\n\n".join(advice_parts),
+        "bullish_ratio": bullish_ratio,
+        "risk_ratio": risk_ratio,
+        "leaders": effective_leaders,
+        "alerts": warnings,
+        "to_remove": to_sell,
+        "ai_insight": ai_insight,
+    }
+
+class _TickerShed(HTTPException):
+    """A portfolio ticker refused by admission control when its turn came"""
+    def __init__(self, wait: float):
+        super().__init__(status_code=503, detail="Servidor saturado: activo omitido.",
+                         headers={"Retry-After": admission.retry_after(wait)})
+        self.wait = wait
+
+def _portfolio_runner(prefetched: dict, batch_regimes: dict):
+    """
+    Per-ticker runner for /portfolio and its stream. At most PORTFOLIO_CONCURRENCY tickers
+    are on the lanes at once, and each is admitted on its own when it gets there: with the
+    lanes backed up past the reject level, the ticker is shed (_TickerShed) instead of
+    queueing. The decision is per ticker, not made once for the whole sweep up front.
+    """
+    in_flight = asyncio.Semaphore(PORTFOLIO_CONCURRENCY)
+
+    async def _run(ticker: str):
+        async with in_flight:
+            priority = current_priority()
+            wait, _ = _estimated_wait(ticker, True, priority)
+            if admission.decide(priority, wait) == REJECT:
+                raise _TickerShed(wait)
+            return await _analyze_ticker(ticker, lite_mode=True, prefetched=prefetched.pop(ticker, None),
+                                         regimes=batch_regimes.pop(ticker, None))
+    return _run
+
+def _record_timed_out(timed_out: list[str]):
+    if timed_out:
+        logger.warning(f"Portfolio deadline reached: {len(timed_out)} tickers left out ({', '.join(timed_out[:10])})")
+        deadline.record_expired(len(timed_out))
+
+@router.post("/portfolio", response_class=formats.NumpyJSONResponse)
+async def analyze_portfolio(tickers: list[str], request: Request = None):
+    """
+    Lite analysis of every ticker plus the aggregated summary, within PORTFOLIO_BUDGET:
+    tickers still running when the deadline (minus the summary reserve) hits are
+    cancelled and listed in `timed_out`, tickers shed by per-ticker admission control are
+    listed in `shed`, and the response covers the rest (`partial`). Every ticker shed: 503.
+    A client disconnect cancels every ticker still queued or running.
+    """
+    inference_priority.set(PORTFOLIO)
+    deadline.start(deadline.PORTFOLIO_BUDGET)
+    return formats.NumpyJSONResponse(
+        await _until_disconnect(request, "/portfolio", lambda: _run_portfolio(tickers))
+    )
+
+async def _run_portfolio(tickers: list[str]) -> dict:
+    tickers, prefetched, batch_regimes = await _prepare_portfolio(tickers)
+    run_ticker = _portfolio_runner(prefetched, batch_regimes)
+
+    # Run analyses in parallel!
+    tasks = [asyncio.ensure_future(run_ticker(ticker)) for ticker in tickers]
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=deadline.timeout(reserve=deadline.SUMMARY_RESERVE))
+    finally:
+        disconnect_watcher.cancel_tasks(tasks)
+    
+    valid_results = []
+    failed = []
+    timed_out = []
+    shed = []
+    
+    for ticker, task in zip(tickers, tasks):
+        if task in pending:
+            timed_out.append(ticker)
+        elif isinstance(task.exception(), _TickerShed):
+            shed.append(ticker)
+        elif task.exception() is not None:
+            logger.error(f"Error in portfolio for {ticker}: {task.exception()}")
+            failed.append(ticker)
+        else:
+            valid_results.append(task.result())
+    _record_timed_out(timed_out)
+            
+    if not valid_results:
+        if shed and not failed:
+            _shed(min(tasks[tickers.index(t)].exception().wait for t in shed))
+        raise HTTPException(status_code=400, detail="No se pudo analizar ningún activo del portfolio")
+
     return {
         "assets": valid_results,
-        "summary": {
-            "total_assets": total,
-            "regime_distribution": {
-                "bullish": bullish_count,
-                "stable": stable_count,
-                "volatile": volatile_count
-            },
-            "risk_level": risk_level,
-            "advice": "\n\n".join(advice_parts),
-            "bullish_ratio": bullish_ratio,
-            "risk_ratio": risk_ratio,
-            "leaders": effective_leaders,
-            "alerts": warnings,
-            "to_remove": to_sell,
-            "ai_insight": ai_insight,
-        }
+        "summary": await _portfolio_summary(valid_results),
+        "partial": bool(timed_out or shed),
+        "timed_out": timed_out,
+        "shed": shed,
+    }
+
+# Media types of the streaming portfolio formats
+PORTFOLIO_STREAM_FORMATS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+# Fields of each lite result _portfolio_summary reads; the stream keeps only these until the end
+_SUMMARY_FIELDS = ("ticker", "current_regime_ret", "current_regime_diff", "change_pct")
+
+def _stream_event(event: str, data, fmt: str) -> str:
+    payload = formats.dumps(data).decode("utf-8")
+    if fmt == "sse":
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f'{{"event": "{event}", "data": {payload}}}\n'
+
+@router.post("/portfolio/stream")
+async def stream_portfolio(tickers: list[str], format: str = "ndjson"):
+    """
+    Streaming /portfolio: one event per asset as soon as its lite analysis finishes,
+    then the aggregated summary. NDJSON lines ({"event", "data"}) or Server-Sent Events.
+    Events: start {total}, asset {lite result}, failed {ticker, detail},
+    summary {same as /portfolio's summary} or error {detail} when nothing could be analysed.
+    Tickers still running at the deadline (PORTFOLIO_BUDGET) or shed by per-ticker admission
+    control are reported as failed.
+    """
+    if format not in PORTFOLIO_STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado '{format}'. Use: ndjson, sse")
+    inference_priority.set(PORTFOLIO)
+    deadline.start(deadline.PORTFOLIO_BUDGET)
+    tickers, prefetched, batch_regimes = await _prepare_portfolio(tickers)
+    run_ticker = _portfolio_runner(prefetched, batch_regimes)
+
+    async def _one(ticker: str):
+        try:
+            return ticker, await run_ticker(ticker)
+        except Exception as e:
+            return ticker, e
+
+    async def _events():
+        yield _stream_event("start", {"total": len(tickers)}, format)
+        tasks = [asyncio.ensure_future(_one(t)) for t in tickers]
+        summary_inputs = []
+        reported = set()
+        try:
+            for next_done in asyncio.as_completed(tasks, timeout=deadline.timeout(reserve=deadline.SUMMARY_RESERVE)):
+                try:
+                    ticker, res = await next_done
+                except asyncio.TimeoutError:
+                    break
+                reported.add(ticker)
+                if isinstance(res, Exception):
+                    logger.error(f"Error in portfolio for {ticker}: {res}")
+                    detail = res.detail if isinstance(res, HTTPException) else str(res)
+                    yield _stream_event("failed", {"ticker": ticker, "detail": detail}, format)
+                    continue
+                yield _stream_event("asset", res, format)
+                summary_inputs.append(dict(
+                    {k: res[k] for k in _SUMMARY_FIELDS},
+                    recommendation={"verdict": res.get("recommendation", {}).get("verdict", "MANTENER")},
+                ))
+        finally:
+            # Deadline reached, or Starlette cancelled the response because the client left
+            disconnect_watcher.cancel_tasks(tasks)
+
+        timed_out = [t for t in tickers if t not in reported]
+        _record_timed_out(timed_out)
+        for ticker in timed_out:
+            yield _stream_event("failed", {"ticker": ticker, "detail": "Tiempo agotado para este activo."}, format)
+
+        if not summary_inputs:
+            yield _stream_event("error", {"detail": "No se pudo analizar ningún activo del portfolio"}, format)
+            return
+        yield _stream_event("summary", await _portfolio_summary(summary_inputs), format)
+
+    return StreamingResponse(
+        _events(),
+        media_type=PORTFOLIO_STREAM_FORMATS[format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _run_portfolio_job(job) -> dict:
+    """Job runner: the /portfolio pipeline with per-ticker progress and a bounded number of tickers in flight"""
+    inference_priority.set(PORTFOLIO)
+    tickers, prefetched, batch_regimes = await _prepare_portfolio(list(job.items), admit=False)
+    in_flight = asyncio.Semaphore(PORTFOLIO_JOB_CONCURRENCY)
+
+    async def _one(ticker: str):
+        async with in_flight:
+            try:
+                res = await _analyze_ticker(ticker, lite_mode=True, prefetched=prefetched.pop(ticker, None),
+                                            regimes=batch_regimes.pop(ticker, None))
+            except Exception as e:
+                logger.error(f"Error in portfolio job {job.id} for {ticker}: {e}")
+                job.mark_failed(ticker, e.detail if isinstance(e, HTTPException) else str(e))
+                return None
+            job.mark_done(ticker)
+            return res
+
+    results = await asyncio.gather(*(_one(t) for t in tickers))
+    valid_results = [r for r in results if r is not None]
+    if not valid_results:
+        raise HTTPException(status_code=400, detail="No se pudo analizar ningún activo del portfolio")
+    return {
+        "assets": valid_results,
+        "summary": await _portfolio_summary(valid_results),
     }
 
+@router.post("/portfolio/jobs", status_code=202)
+async def submit_portfolio_job(tickers: list[str]):
+    """Queues a /portfolio analysis and returns its job id at once; poll /portfolio/jobs/{job_id}"""
+    if not tickers:
+        raise HTTPException(status_code=400, detail="Se requiere al menos un ticker")
+    try:
+        job = portfolio_jobs.submit(list(dict.fromkeys(tickers[:300])), _run_portfolio_job)
+    except JobQueueFull:
+        raise HTTPException(status_code=429, detail="Demasiados análisis en cola. Inténtalo más tarde.")
+    return {"job_id": job.id, "status": job.status, "total": len(job.items)}
+
+async def _get_job(job_id: str):
+    job = await portfolio_jobs.lookup(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo '{job_id}' no encontrado o expirado.")
+    return job
+
+@router.get("/portfolio/jobs/{job_id}")
+async def portfolio_job_status(job_id: str):
+    """Progress: status, done/failed/pending counts and the state of every ticker"""
+    return (await _get_job(job_id)).progress()
+
+@router.get("/portfolio/jobs/{job_id}/result", response_class=formats.NumpyJSONResponse)
+async def portfolio_job_result(job_id: str):
+    """The /portfolio response once the job is done; 202 with the progress while it runs"""
+    job = await _get_job(job_id)
+    if job.status == "done":
+        return formats.NumpyJSONResponse(job.result)
+    if job.status == "failed":
+        raise HTTPException(status_code=400, detail=job.error)
+    if job.status == "cancelled":
+        raise HTTPException(status_code=410, detail=f"Trabajo '{job_id}' cancelado.")
+    return JSONResponse(status_code=202, content=job.progress())
+
+@router.delete("/portfolio/jobs/{job_id}")
+async def cancel_portfolio_job(job_id: str):
+    job = await _get_job(job_id)
+    if portfolio_jobs.cancel(job_id) is None and not job.finished:
+        # Only the process running a job can cancel it (see core.jobs); it runs to the end
+        raise HTTPException(status_code=409, detail=f"Trabajo '{job_id}' en ejecución en otra instancia: no se puede cancelar.")
+    return {"job_id": job.id, "status": job.status}
+
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
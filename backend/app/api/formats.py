@@ -0,0 +1,139 @@
+import logging
+import orjson
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+logger = logging.getLogger(__name__)
+
+# Binary encodings are optional: a missing library only disables its format (406)
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# --- RESPONSE FORMATS ---
+# json: the historical shape (history/forecast as one dict per day), what the React client reads.
+# The others carry history and forecast as column arrays ({"date": [...], "price": [...], ...}).
+ANALYZE_FORMATS = {
+    "json": "application/json",
+    "columnar": "application/vnd.stockai.columnar+json",
+    "msgpack": "application/msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",   # History as the record batch, the rest in schema metadata
+}
+_MEDIA_TYPE_FORMATS = {media: fmt for fmt, media in ANALYZE_FORMATS.items()}
+_MEDIA_TYPE_FORMATS["application/x-msgpack"] = "msgpack"
+ARROW_METADATA_KEY = b"stockai"
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+class NumpyJSONResponse(Response):
+    """
+    JSON encoded by orjson in one native pass: NumPy scalars and arrays are understood
+    as they are and NaN / ±Infinity become null. Return it from a route (instead of a
+    dict) so FastAPI skips its own jsonable_encoder walk too.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def finite_list(values) -> list:
+    """Float array -> list with NaN / ±Infinity masked to None, decided for the whole array at once"""
+    array = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(array)
+    if finite.all():
+        return array.tolist()
+    masked = array.astype(object)
+    masked[~finite] = None
+    return masked.tolist()
+
+
+def negotiate(format: str | None, accept: str | None) -> str:
+    """The ?format= override, else the first Accept media type we serve, else json"""
+    if format is not None:
+        if format not in ANALYZE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Formato no soportado '{format}'. Use: {', '.join(ANALYZE_FORMATS)}")
+        return format
+    for media in (accept or "").split(","):
+        fmt = _MEDIA_TYPE_FORMATS.get(media.split(";", 1)[0].strip().lower())
+        if fmt is not None:
+            return fmt
+    return "json"
+
+
+def to_rows(columns) -> list:
+    """{"date": [...], "price": [...]} -> [{"date", "price"}, ...]; row lists pass through"""
+    if isinstance(columns, list):
+        return columns
+    keys = list(columns)
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+
+def to_columns(rows) -> dict:
+    """[{"date", "price"}, ...] -> {"date": [...], "price": [...]}; column dicts pass through"""
+    if isinstance(rows, dict):
+        return rows
+    keys = list(rows[0]) if rows else []
+    return {key: [row.get(key) for row in rows] for key in keys}
+
+
+def available() -> list[str]:
+    """Formats this server can encode (the binary ones need their optional library)"""
+    missing = {"msgpack": msgpack is None, "arrow": pa is None}
+    return [fmt for fmt in ANALYZE_FORMATS if not missing.get(fmt)]
+
+
+def json_safe(content):
+    """
+    content as the JSON formats send it: NumPy values as Python ones and NaN / ±Infinity
+    as None, at every depth. One orjson round trip, so the binary formats mask exactly
+    what NumpyJSONResponse does.
+    """
+    return orjson.loads(dumps(content))
+
+
+def render(payload: dict, fmt: str):
+    """
+    Encodes an /analyze payload (history already columnar, see _analyze_ticker) in `fmt`.
+    """
+    if fmt == "json":
+        return NumpyJSONResponse(dict(payload, history=to_rows(payload["history"])))
+    columnar = dict(payload, history=to_columns(payload["history"]), forecast=to_columns(payload["forecast"]))
+    media_type = ANALYZE_FORMATS[fmt]
+    if fmt == "columnar":
+        return NumpyJSONResponse(columnar, media_type=media_type)
+    columnar = json_safe(columnar)
+    if fmt == "msgpack":
+        if msgpack is None:
+            raise HTTPException(status_code=406, detail="Formato 'msgpack' no disponible en este servidor.")
+        return Response(msgpack.packb(columnar, use_bin_type=True), media_type=media_type)
+    if pa is None:
+        raise HTTPException(status_code=406, detail="Formato 'arrow' no disponible en este servidor.")
+    return Response(_arrow_stream(columnar), media_type=media_type)
+
+
+def _arrow_stream(columnar: dict) -> bytes:
+    history = columnar["history"]
+    n = len(history.get("date", []))
+    table = pa.table({
+        "date": pa.array(history.get("date", []), type=pa.string()),
+        "price": pa.array(history.get("price", []), type=pa.float64()),
+        "regime": pa.array(history.get("regime", []), type=pa.int8()),
+        "rvol": pa.array(history.get("rvol", [None] * n), type=pa.float64()),
+    })
+    rest = {k: v for k, v in columnar.items() if k != "history"}
+    table = table.replace_schema_metadata({ARROW_METADATA_KEY: dumps(rest)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,66 @@
+import os
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- ADMISSION CONFIGURATION ---
+DEGRADE_WAIT = float(os.getenv("ADMISSION_DEGRADE_WAIT", "5"))   # Estimated wait (s) above which full analyses skip Chronos
+REJECT_WAIT = float(os.getenv("ADMISSION_REJECT_WAIT", "20"))    # Estimated wait (s) above which requests get 503 (under the 25 s timeouts)
+
+ADMIT, DEGRADE, REJECT = "admit", "degrade", "reject"
+
+
+class AdmissionController:
+    """
+    Queue-depth-aware admission for the analysis lanes. Decides from the estimated
+    queue wait before a request does any work (fetches included): admit, degrade to
+    the GBM-only forecast when a lighter path exists, or reject with a Retry-After hint.
+    """
+    def __init__(self, degrade_wait: float = DEGRADE_WAIT, reject_wait: float = REJECT_WAIT):
+        self.degrade_wait = degrade_wait
+        self.reject_wait = reject_wait
+        self.counts: dict[str, dict[str, int]] = {}
+        self.last_wait: dict[str, float] = {}
+
+    def decide(self, priority: str, wait: float, degraded_wait: float | None = None) -> str:
+        """
+        `wait`: estimated seconds before the request as asked would get its slot(s).
+        `degraded_wait`: the same for its GBM-only variant, None when there is none (lite).
+        """
+        if wait <= (self.degrade_wait if degraded_wait is not None else self.reject_wait):
+            decision = ADMIT
+        elif degraded_wait is not None and degraded_wait <= self.reject_wait:
+            decision = DEGRADE
+        else:
+            decision = REJECT
+            logger.warning(f"Admission: shedding {priority} request (estimated wait {wait:.1f}s)")
+        counts = self.counts.setdefault(priority, {ADMIT: 0, DEGRADE: 0, REJECT: 0})
+        counts[decision] += 1
+        self.last_wait[priority] = wait
+        return decision
+
+    def retry_after(self, wait: float, degraded_wait: float | None = None) -> str:
+        """
+        Retry-After for a rejected request: seconds until the estimated wait of either of
+        its paths drains below the level decide() admits it at (as asked or degraded).
+        """
+        if degraded_wait is None:
+            over = wait - self.reject_wait
+        else:
+            over = min(wait - self.degrade_wait, degraded_wait - self.reject_wait)
+        return str(max(1, math.ceil(over)))
+
+    def stats(self) -> dict:
+        return {
+            "degrade_wait_s": self.degrade_wait,
+            "reject_wait_s": self.reject_wait,
+            "classes": {
+                cls: dict(counts, last_estimated_wait_ms=round(self.last_wait.get(cls, 0.0) * 1000, 2))
+                for cls, counts in self.counts.items()
+            },
+        }
+
+
+# Global instance
+admission = AdmissionController()
@@ -0,0 +1,88 @@
+import os
+import asyncio
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# --- CANCELLATION CONFIGURATION ---
+DISCONNECT_POLL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.25"))   # Seconds between client-disconnect checks
+
+# Set once nobody waits for the current work any more (client gone, flight abandoned).
+# Tasks and run_in_threadpool calls inherit it, so blocking stages that cannot be
+# cancelled from the event loop (the Chronos batcher thread) can drop work whose
+# result would be thrown away.
+work_cancelled: ContextVar[threading.Event | None] = ContextVar("work_cancelled", default=None)
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+def cancelled() -> bool:
+    """True when the work of the current task has been abandoned"""
+    token = work_cancelled.get()
+    return token is not None and token.is_set()
+
+
+def spawn(factory: Callable[[], Awaitable[Any]]) -> tuple[asyncio.Task, threading.Event]:
+    """Starts factory() as a task carrying its own cancellation token; set the token when abandoning it"""
+    token = threading.Event()
+    reset = work_cancelled.set(token)
+    try:
+        return asyncio.ensure_future(factory()), token
+    finally:
+        work_cancelled.reset(reset)
+
+
+class DisconnectWatcher:
+    """
+    Ties request handlers to their client: the work runs as a task while the handler
+    polls request.is_disconnected(); when the client goes away the task is cancelled
+    (queued scheduler slots, executor jobs and pending tickers are dropped with it)
+    and its token is set for the stages running in threads.
+    """
+    def __init__(self, poll: float = DISCONNECT_POLL):
+        self.poll = poll
+        self.disconnects: dict[str, int] = {}
+        self.tasks_cancelled = 0
+
+    async def run(self, request, route: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """factory() until it finishes or the client disconnects (raises ClientDisconnected)"""
+        if request is None:   # Called directly (scripts), not through a route
+            return await factory()
+        task, token = spawn(factory)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.poll)
+                if done:
+                    return task.result()
+                if await request.is_disconnected():
+                    self.disconnects[route] = self.disconnects.get(route, 0) + 1
+                    logger.warning(f"Client disconnected from {route}. Cancelling its work.")
+                    raise ClientDisconnected(route)
+        finally:
+            if not task.done():
+                token.set()
+                task.cancel()
+
+    def cancel_tasks(self, tasks: list[asyncio.Task]) -> int:
+        """Cancels the unfinished tasks of an abandoned fan-out; returns how many were still running"""
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        self.tasks_cancelled += len(pending)
+        return len(pending)
+
+    def stats(self) -> dict:
+        return {
+            "poll_s": self.poll,
+            "disconnects": dict(self.disconnects),
+            "tasks_cancelled": self.tasks_cancelled,
+        }
+
+
+# Global instance
+disconnect_watcher = DisconnectWatcher()
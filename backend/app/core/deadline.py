@@ -0,0 +1,107 @@
+import os
+import math
+import time
+import logging
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# --- DEADLINE CONFIGURATION ---
+ANALYZE_BUDGET = float(os.getenv("ANALYZE_BUDGET", "25"))       # Seconds for one /analyze request, end to end
+PORTFOLIO_BUDGET = float(os.getenv("PORTFOLIO_BUDGET", "55"))   # Seconds for /portfolio and /portfolio/stream
+# Least remaining budget (s) a stage needs to take its full path instead of the cheaper one
+FETCH_MIN = float(os.getenv("DEADLINE_FETCH_MIN", "5"))         # Upstream download; below it stored bars are served
+CHRONOS_MIN = float(os.getenv("DEADLINE_CHRONOS_MIN", "4"))     # Chronos forecast; below it GBM
+LLM_MIN = float(os.getenv("DEADLINE_LLM_MIN", "4"))             # Groq portfolio insight; below it skipped
+SUMMARY_RESERVE = 1.0   # Seconds a portfolio keeps for aggregation after its tickers' deadline
+
+FETCH, CHRONOS, LLM = "fetch", "chronos", "llm"   # Stages that degrade, for stats()
+
+
+class Deadline:
+    """Absolute expiry of one request (monotonic clock)"""
+    __slots__ = ("expires_at",)
+
+    def __init__(self, budget: float):
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def allows(self, seconds: float) -> bool:
+        return self.remaining() >= seconds
+
+    def extend_to(self, other: "Deadline | None"):
+        """Pushes the expiry out to `other`'s if that is later (None: no deadline at all)"""
+        self.expires_at = max(self.expires_at, math.inf if other is None else other.expires_at)
+
+
+# Deadline of the request the current task works for. Set by the request handlers;
+# tasks spawned from them (gather, singleflight, run_in_threadpool) inherit it.
+# Unset (jobs, background refreshes, warm-up) means no budget: every stage runs its full path.
+request_deadline: ContextVar[Deadline | None] = ContextVar("request_deadline", default=None)
+
+_degraded = {FETCH: 0, CHRONOS: 0, LLM: 0}
+_expired = {"requests": 0, "tickers": 0}
+
+
+def start(budget: float) -> Deadline:
+    """Puts the current task under a `budget`-second deadline (or keeps the current one if tighter)"""
+    current = request_deadline.get()
+    deadline = Deadline(budget if current is None else min(budget, current.remaining()))
+    request_deadline.set(deadline)
+    return deadline
+
+
+def share() -> Deadline | None:
+    """
+    A copy of the current deadline for work several requests wait on (core.singleflight):
+    extend_to() it as callers join so the work runs under the most generous of them.
+    """
+    current = request_deadline.get()
+    if current is None:
+        return None
+    shared = Deadline(0.0)
+    shared.expires_at = current.expires_at
+    return shared
+
+
+def remaining() -> float:
+    """Seconds left for the current request (inf without a deadline)"""
+    deadline = request_deadline.get()
+    return math.inf if deadline is None else deadline.remaining()
+
+
+def allows(stage: str, seconds: float) -> bool:
+    """True when `stage` still fits its full path; otherwise counts the degradation"""
+    if remaining() >= seconds:
+        return True
+    _degraded[stage] += 1
+    logger.info(f"Deadline: {remaining():.1f}s left, {stage} takes its cheaper path")
+    return False
+
+
+def timeout(cap: float | None = None, reserve: float = 0.0) -> float | None:
+    """
+    A stage's wait_for timeout: its own hard cap or what is left of the budget (minus
+    `reserve` seconds kept for later stages), whichever is smaller. None when unbounded.
+    """
+    left = max(0.0, remaining() - reserve)
+    if cap is None:
+        return None if left == math.inf else left
+    return min(cap, left)
+
+
+def record_expired(tickers: int):
+    _expired["requests"] += 1
+    _expired["tickers"] += tickers
+
+
+def stats() -> dict:
+    return {
+        "analyze_budget_s": ANALYZE_BUDGET,
+        "portfolio_budget_s": PORTFOLIO_BUDGET,
+        "degraded": dict(_degraded),
+        "partial_portfolios": _expired["requests"],
+        "expired_tickers": _expired["tickers"],
+    }
@@ -0,0 +1,319 @@
+import os
+import re
+import time
+import uuid
+import asyncio
+import logging
+import orjson
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# --- JOB CONFIGURATION ---
+JOB_WORKERS = int(os.getenv("PORTFOLIO_JOB_WORKERS", "1"))        # Jobs running at once; the rest wait queued
+JOB_MAX_QUEUED = int(os.getenv("PORTFOLIO_JOB_MAX_QUEUED", "32"))  # Submissions beyond this are rejected
+JOB_RESULT_TTL = float(os.getenv("PORTFOLIO_JOB_TTL", "3600"))     # Seconds a finished job stays retrievable
+JOB_MAX_RETAINED = int(os.getenv("PORTFOLIO_JOB_MAX_RETAINED", "64"))  # Finished jobs kept, oldest dropped first
+# Jobs live in the memory of the process that runs them. Point PORTFOLIO_JOB_DIR at a directory
+# every instance mounts (and that survives restarts) so any of them can answer status/result polls.
+JOB_DIR = os.getenv("PORTFOLIO_JOB_DIR")                                # Disk tier is off unless a directory is configured
+JOB_PERSIST_INTERVAL = float(os.getenv("PORTFOLIO_JOB_PERSIST_INTERVAL", "2"))  # Min seconds between progress writes (heartbeat)
+JOB_STALE_AFTER = float(os.getenv("PORTFOLIO_JOB_STALE_AFTER", "120"))  # Unfinished job on disk not written for this long: lost
+
+PENDING, DONE, FAILED = "pending", "done", "failed"   # Per-item states
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")   # uuid4().hex, as Job assigns them
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    """One submitted batch of items (tickers): per-item progress plus the final result or error"""
+    def __init__(self, items: list[str]):
+        self.id = uuid.uuid4().hex
+        self.items: dict[str, dict] = {item: {"state": PENDING} for item in items}
+        self.status = "queued"   # queued -> running -> done | failed | cancelled
+        self.result: Any = None
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.task: asyncio.Task | None = None
+        self.on_change: Callable[["Job"], None] | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def mark_done(self, item: str):
+        self.items[item] = {"state": DONE}
+        self._changed()
+
+    def mark_failed(self, item: str, detail: str):
+        self.items[item] = {"state": FAILED, "detail": detail}
+        self._changed()
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def progress(self) -> dict:
+        counts = {PENDING: 0, DONE: 0, FAILED: 0}
+        for entry in self.items.values():
+            counts[entry["state"]] += 1
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": len(self.items),
+            "done": counts[DONE],
+            "failed": counts[FAILED],
+            "pending": counts[PENDING],
+            "items": self.items,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def to_state(self) -> dict:
+        return dict(self.progress(), result=self.result, updated_at=time.time())
+
+    @classmethod
+    def from_state(cls, state: dict) -> "Job":
+        """A job read back from the disk tier (run by another process); it has no task"""
+        job = cls([])
+        job.id = state["job_id"]
+        job.items = state["items"]
+        job.status = state["status"]
+        job.result = state.get("result")
+        job.error = state.get("error")
+        job.created_at = state["created_at"]
+        job.started_at = state.get("started_at")
+        job.finished_at = state.get("finished_at")
+        return job
+
+
+class JobManager:
+    """
+    Runs long batch analyses outside any request lifetime. Clients submit, get a job
+    id back immediately and poll progress/result. At most `workers` jobs run at once
+    (a bounded budget, so sweeps do not crowd out interactive requests); finished
+    jobs are kept for `ttl` seconds, at most `max_retained` of them.
+
+    A job runs inside the process that accepted it, so that process must stay up
+    with CPU allocated until the job finishes. With `job_dir` set, every job's state
+    and result are also written there (at most every JOB_PERSIST_INTERVAL seconds while
+    it runs, off the event loop), so an instance or worker that did not run it, or a
+    restarted one, can still answer status and result polls. An unfinished job whose
+    file has not been written for JOB_STALE_AFTER seconds is reported as failed.
+    """
+    def __init__(self, name: str, workers: int = JOB_WORKERS, max_queued: int = JOB_MAX_QUEUED,
+                 ttl: float = JOB_RESULT_TTL, max_retained: int = JOB_MAX_RETAINED,
+                 job_dir: str | None = JOB_DIR):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.max_retained = max_retained
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._slots: asyncio.Semaphore | None = None
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.lost = 0
+        self.job_dir = job_dir
+        self._writer: ThreadPoolExecutor | None = None   # One thread: a job's writes land in order
+        self._persisted_at: dict[str, float] = {}
+        if self.job_dir:
+            try:
+                os.makedirs(self.job_dir, exist_ok=True)
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"jobs-{name}")
+            except OSError as e:
+                logger.warning(f"Job[{name}] disk tier disabled ({self.job_dir}): {e}")
+                self.job_dir = None
+
+    def _active(self) -> list[Job]:
+        return [job for job in self._jobs.values() if not job.finished]
+
+    def _sweep(self):
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.finished]
+        excess = len(finished) - self.max_retained
+        for job in finished:
+            if excess > 0 or now - job.finished_at > self.ttl:
+                del self._jobs[job.id]
+                self._persisted_at.pop(job.id, None)
+                if self._writer is not None:
+                    self._writer.submit(self._remove, job.id)
+                self.expired += 1
+                excess -= 1
+
+    def submit(self, items: list[str], runner: Callable[[Job], Awaitable[Any]]) -> Job:
+        """Queues `runner(job)`; its return value becomes job.result. Raises JobQueueFull."""
+        self._sweep()
+        if sum(1 for job in self._active() if job.status == "queued") >= self.max_queued:
+            self.rejected += 1
+            raise JobQueueFull(f"{self.name}: {self.max_queued} jobs already queued")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        job = Job(items)
+        self._jobs[job.id] = job
+        job.on_change = self._persist
+        self._persist(job, force=True)
+        job.task = asyncio.ensure_future(self._run(job, runner))
+        job.task.add_done_callback(lambda _t, j=job: self._on_cancelled_early(j))
+        self.submitted += 1
+        return job
+
+    async def _run(self, job: Job, runner: Callable[[Job], Awaitable[Any]]):
+        try:
+            async with self._slots:
+                job.status = "running"
+                job.started_at = time.time()
+                self._persist(job, force=True)
+                heartbeat = asyncio.ensure_future(self._heartbeat(job)) if self.job_dir else None
+                try:
+                    job.result = await runner(job)
+                finally:
+                    if heartbeat is not None:
+                        heartbeat.cancel()
+                job.status = "done"
+                self.completed += 1
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            self.cancelled += 1
+        except Exception as e:
+            job.status = "failed"
+            job.error = getattr(e, "detail", None) or str(e)
+            self.failed += 1
+            logger.error(f"Job[{self.name}] {job.id} failed: {job.error}")
+        finally:
+            job.finished_at = time.time()
+            self._persist(job, force=True)
+
+    def _on_cancelled_early(self, job: Job):
+        # A task cancelled before its first step never enters _run's handlers
+        if not job.finished:
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            self.cancelled += 1
+            self._persist(job, force=True)
+
+    # --- Disk tier ---
+
+    def _path(self, job_id: str) -> str:
+        if not JOB_ID_PATTERN.fullmatch(job_id):   # Never join an unchecked id into a path
+            raise ValueError(f"Invalid job id {job_id!r}")
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _persist(self, job: Job, force: bool = False):
+        """Queues a write of the job's state; progress-only writes are throttled"""
+        if self._writer is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._persisted_at.get(job.id, 0.0) < JOB_PERSIST_INTERVAL:
+            return
+        self._persisted_at[job.id] = now
+        try:
+            data = orjson.dumps(job.to_state(), option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        except Exception as e:
+            logger.warning(f"Job[{self.name}] could not serialize {job.id}: {e}")
+            return
+        self._writer.submit(self._write, job.id, data)
+
+    async def _heartbeat(self, job: Job):
+        """Keeps a running job's file fresh while no ticker finishes (long fetches, batched fits)"""
+        while True:
+            await asyncio.sleep(JOB_PERSIST_INTERVAL)
+            self._persist(job)
+
+    def _write(self, job_id: str, data: bytes):
+        path = self._path(job_id)
+        try:
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(data)
+            os.replace(f"{path}.tmp", path)
+        except Exception as e:
+            logger.warning(f"Job[{self.name}] could not write {job_id}: {e}")
+
+    def _remove(self, job_id: str):
+        try:
+            os.remove(self._path(job_id))
+        except OSError:
+            pass
+
+    def _load(self, job_id: str) -> Job | None:
+        """A job another process runs (or ran) from the disk tier; None when absent or expired"""
+        try:
+            with open(self._path(job_id), "rb") as f:
+                state = orjson.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Job[{self.name}] corrupt job file {job_id}: {e}")
+            return None
+        job = Job.from_state(state)
+        now = time.time()
+        if job.finished and now - job.finished_at > self.ttl:
+            self._remove(job_id)
+            return None
+        if not job.finished and now - state.get("updated_at", 0.0) > JOB_STALE_AFTER:
+            # Its process stopped (restart, scale-in) before finishing it
+            self.lost += 1
+            job.status = "failed"
+            job.error = "Trabajo interrumpido: la instancia que lo ejecutaba se detuvo. Vuelve a enviarlo."
+            job.finished_at = now
+        return job
+
+    # --- Lookup ---
+
+    def get(self, job_id: str) -> Job | None:
+        """Jobs of this process only (see lookup for the disk tier)"""
+        self._sweep()
+        return self._jobs.get(job_id)
+
+    async def lookup(self, job_id: str) -> Job | None:
+        """
+        get(), falling back to the disk tier (read in the writer thread) for jobs of other
+        processes. Ids not in the format submit() generates are never looked up (None).
+        """
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        job = self.get(job_id)
+        if job is not None or self._writer is None:
+            return job
+        return await asyncio.get_running_loop().run_in_executor(self._writer, self._load, job_id)
+
+    def cancel(self, job_id: str) -> Job | None:
+        """Cancels a job of this process; None when this process does not run it"""
+        job = self.get(job_id)
+        if job is not None and not job.finished and job.task is not None:
+            job.task.cancel()
+        return job
+
+    def stats(self) -> dict:
+        active = self._active()
+        return {
+            "workers": self.workers,
+            "queued": sum(1 for job in active if job.status == "queued"),
+            "running": sum(1 for job in active if job.status == "running"),
+            "retained": len(self._jobs) - len(active),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "expired": self.expired,
+            "disk_tier": bool(self.job_dir),
+            "lost": self.lost,
+        }
+
+
+# Global instance
+portfolio_jobs = JobManager("portfolio")
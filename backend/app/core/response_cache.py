@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, time as dtime
+from typing import Any, Awaitable, Callable
+from zoneinfo import ZoneInfo
+from .scheduler import inference_priority, BACKGROUND
+from .deadline import request_deadline
+from .cancellation import work_cancelled
+
+logger = logging.getLogger(__name__)
+
+# --- CACHE CONFIGURATION ---
+CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_SIZE", "512"))
+CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR")          # Disk tier is off unless a directory is configured
+OPEN_MARKET_TTL = float(os.getenv("ANALYSIS_CACHE_OPEN_TTL", "300"))   # Seconds fresh while the exchange trades
+STALE_GRACE = float(os.getenv("ANALYSIS_CACHE_STALE_GRACE", "3600"))  # Seconds a stale entry may still be served
+
+# Exchange suffix -> (timezone, open, close). Holidays are not modelled: a holiday just
+# behaves like an open session with the short TTL.
+_US_SESSION = ("America/New_York", dtime(9, 30), dtime(16, 0))
+_EU_SESSION = ("Europe/Madrid", dtime(9, 0), dtime(17, 30))
+MARKET_SESSIONS = {
+    "": _US_SESSION,
+    "MC": _EU_SESSION, "DE": _EU_SESSION, "F": _EU_SESSION, "PA": _EU_SESSION,
+    "AS": _EU_SESSION, "MI": _EU_SESSION, "BR": _EU_SESSION, "LS": ("Europe/Lisbon", dtime(8, 0), dtime(16, 30)),
+    "L": ("Europe/London", dtime(8, 0), dtime(16, 30)),
+    "SW": ("Europe/Zurich", dtime(9, 0), dtime(17, 30)),
+    "TO": ("America/Toronto", dtime(9, 30), dtime(16, 0)),
+    "T": ("Asia/Tokyo", dtime(9, 0), dtime(15, 0)),
+    "HK": ("Asia/Hong_Kong", dtime(9, 30), dtime(16, 0)),
+}
+
+
+def _session_for(ticker: str):
+    suffix = ticker.rsplit(".", 1)[1] if "." in ticker else ""
+    return MARKET_SESSIONS.get(suffix)
+
+
+def fresh_until(ticker: str, now: float | None = None) -> float:
+    """
+    Epoch seconds until which a result for `ticker` is fresh.
+    Open market: OPEN_MARKET_TTL. Closed market: until the next session opens.
+    """
+    now = time.time() if now is None else now
+    session = _session_for(ticker)
+    if session is None:
+        return now + OPEN_MARKET_TTL
+    tz_name, open_t, close_t = session
+    try:
+        tz = ZoneInfo(tz_name)
+    except Exception:
+        return now + OPEN_MARKET_TTL
+
+    local = datetime.fromtimestamp(now, tz)
+    is_weekday = local.weekday() < 5
+    if is_weekday and open_t <= local.time() < close_t:
+        return now + OPEN_MARKET_TTL
+
+    # Closed: walk forward to the next weekday open
+    day = local.date() if (is_weekday and local.time() < open_t) else local.date() + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    next_open = datetime.combine(day, open_t, tzinfo=tz)
+    return next_open.timestamp()
+
+
+class _Entry:
+    __slots__ = ("value", "fresh_until", "stale_until")
+
+    def __init__(self, value, fresh_until: float, stale_until: float):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class AnalysisCache:
+    """
+    Two-tier cache for analysis responses: a bounded in-memory LRU plus an optional
+    JSON-on-disk tier (shared across workers/restarts). Entries expire with the
+    exchange session and are served stale-while-revalidate for STALE_GRACE seconds.
+    """
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, cache_dir: str | None = CACHE_DIR):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._lru: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing: set[str] = set()
+        self._background: set[asyncio.Future] = set()   # Refresh tasks and disk writes still running
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"Analysis cache disk tier disabled ({self.cache_dir}): {e}")
+                self.cache_dir = None
+
+    # --- Storage tiers ---
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _lookup(self, key: str) -> _Entry | None:
+        return self._lookup_memory(key) or self._lookup_disk(key)
+
+    async def _lookup_async(self, key: str) -> _Entry | None:
+        """_lookup with the disk read in the default executor"""
+        entry = self._lookup_memory(key)
+        if entry is not None or not self.cache_dir:
+            return entry
+        return await asyncio.get_running_loop().run_in_executor(None, self._lookup_disk, key)
+
+    def _lookup_memory(self, key: str) -> _Entry | None:
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                self._lru.move_to_end(key)
+            return entry
+
+    def _lookup_disk(self, key: str) -> _Entry | None:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            entry = _Entry(raw["value"], raw["fresh_until"], raw["stale_until"])
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Corrupt analysis cache file for {key}: {e}")
+            return None
+        self.disk_hits += 1
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: _Entry):
+        with self._lock:
+            self._lru[key] = entry
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, key: str, ticker: str, value: Any):
+        """
+        Stores the value in memory at once. The disk write runs in the default executor
+        when called from the event loop (inline otherwise).
+        """
+        until = fresh_until(ticker)
+        entry = _Entry(value, until, until + STALE_GRACE)
+        self._remember(key, entry)
+        if not self.cache_dir:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(key, entry)
+            return
+        self._track(loop.run_in_executor(None, self._write, key, entry))
+
+    def _write(self, key: str, entry: _Entry):
+        path = self._disk_path(key)
+        try:
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump({"value": entry.value, "fresh_until": entry.fresh_until, "stale_until": entry.stale_until}, f)
+            os.replace(f"{path}.tmp", path)
+        except Exception as e:
+            logger.warning(f"Could not write analysis cache for {key}: {e}")
+
+    def _track(self, future: asyncio.Future):
+        """Holds a reference to background work until it finishes (the loop only keeps weak ones)"""
+        self._background.add(future)
+        future.add_done_callback(self._background.discard)
+
+    def get_fresh(self, key: str):
+        """Synchronous lookup returning only fresh values (None otherwise)."""
+        entry = self._lookup(key)
+        if entry is not None and time.time() < entry.fresh_until:
+            self.hits += 1
+            return entry.value
+        self.misses += 1
+        return None
+
+    # --- Stale-while-revalidate ---
+
+    async def get_or_compute(self, key: str, ticker: str, compute: Callable[[], Awaitable[Any]],
+                             cacheable: Callable[[Any], bool] | None = None) -> Any:
+        """
+        Fresh entry -> returned directly. Stale entry within grace -> returned directly
+        while a single background task recomputes it. Otherwise computes inline.
+        `cacheable` can veto storing a degraded result (it is still returned).
+        """
+        entry = await self._lookup_async(key)
+        now = time.time()
+        if entry is not None and now < entry.fresh_until:
+            self.hits += 1
+            return entry.value
+        if entry is not None and now < entry.stale_until:
+            self.stale_hits += 1
+            self._schedule_refresh(key, ticker, compute, cacheable)
+            return entry.value
+
+        self.misses += 1
+        value = await compute()
+        if cacheable is None or cacheable(value):
+            self.put(key, ticker, value)
+        return value
+
+    def _schedule_refresh(self, key: str, ticker: str, compute: Callable[[], Awaitable[Any]],
+                          cacheable: Callable[[Any], bool] | None = None):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def _refresh():
+            inference_priority.set(BACKGROUND)   # Someone is already served the stale value
+            request_deadline.set(None)           # ...so the refresh is not bound by their deadline
+            work_cancelled.set(None)             # ...nor cancelled when they disconnect
+            try:
+                value = await compute()
+                if cacheable is None or cacheable(value):
+                    self.put(key, ticker, value)
+                self.refreshes += 1
+            except Exception as e:
+                self.refresh_failures += 1
+                logger.warning(f"Background refresh of {key} failed: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        self._track(asyncio.ensure_future(_refresh()))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "disk_tier": bool(self.cache_dir),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "background_pending": len(self._background),
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global instance
+analysis_cache = AnalysisCache()
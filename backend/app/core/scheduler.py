@@ -0,0 +1,217 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# --- PRIORITY CLASSES ---
+INTERACTIVE = "interactive"   # Single-ticker /analyze requests a user is waiting on
+PORTFOLIO = "portfolio"       # /portfolio sweeps, streams and jobs
+BACKGROUND = "background"     # Stale-while-revalidate refreshes and other warm-up work
+# Share of the slots each class gets while all of them are waiting (stride scheduling)
+PRIORITY_WEIGHTS = {INTERACTIVE: 8, PORTFOLIO: 2, BACKGROUND: 1}
+WAIT_SAMPLES = 1024   # Recent queue waits kept per class for the percentiles in stats()
+SERVICE_EWMA_ALPHA = 0.2   # Smoothing of the per-class slot hold time used by estimate_wait()
+DEGRADED_SLOTS = int(os.getenv("DEGRADED_LANE_SLOTS", "1"))   # GBM-only analyses run at once beside the inference lane
+
+# Priority of the inference work started from the current task. Requests default to
+# interactive; portfolio handlers and background refreshes override it, and tasks
+# spawned from them (gather, singleflight, cache refresh) inherit it.
+inference_priority: ContextVar[str] = ContextVar("inference_priority", default=INTERACTIVE)
+
+_RANK = {cls: i for i, cls in enumerate(PRIORITY_WEIGHTS)}   # Lower is more urgent
+
+
+class PriorityClaim:
+    """
+    Priority shared by every caller of one coalesced computation (core.singleflight).
+    It starts at the class of the caller that started the work and is promoted when a
+    higher class joins; slots the work is still queued for move to the new class.
+    """
+    __slots__ = ("cls", "_listeners")
+
+    def __init__(self, cls: str):
+        self.cls = cls
+        self._listeners: set = set()
+
+    def promote(self, cls: str) -> bool:
+        if _RANK[cls] >= _RANK[self.cls]:
+            return False
+        self.cls = cls
+        for listener in list(self._listeners):
+            listener()
+        return True
+
+
+# Claim of the coalesced computation the current task runs for (set by SingleFlight);
+# when present it overrides inference_priority for the slots that work acquires.
+priority_claim: ContextVar[PriorityClaim | None] = ContextVar("priority_claim", default=None)
+
+
+def current_priority() -> str:
+    """Class of the work started from the current task: its flight's claim, else inference_priority"""
+    claim = priority_claim.get()
+    return claim.cls if claim is not None else inference_priority.get()
+
+
+class PriorityScheduler:
+    """
+    Drop-in replacement for an asyncio.Semaphore with per-class queues. A free slot
+    goes to the waiting class with the lowest virtual pass; each grant advances the
+    class by 1/weight. Under contention classes interleave in proportion to their
+    weights (no class starves), and a newly arriving class joins at the current
+    virtual time, so an interactive request waits for at most the task in progress
+    and one lower-class grant instead of the whole bulk queue.
+    """
+    def __init__(self, name: str, slots: int = 1, weights: dict[str, int] = PRIORITY_WEIGHTS):
+        self.name = name
+        self.slots = slots
+        self._free = slots
+        self._order = {cls: i for i, cls in enumerate(weights)}   # Tie-break: declaration order
+        self._stride = {cls: 1.0 / w for cls, w in weights.items()}
+        self._pass = {cls: 0.0 for cls in weights}
+        self._vtime = 0.0
+        self._queues: dict[str, deque] = {cls: deque() for cls in weights}
+        self._waits: dict[str, deque] = {cls: deque(maxlen=WAIT_SAMPLES) for cls in weights}
+        self._weights = dict(weights)
+        self._service = {cls: 0.0 for cls in weights}   # EWMA seconds a slot is held, per class
+        self.granted = {cls: 0 for cls in weights}
+        self.cancelled = {cls: 0 for cls in weights}
+        self.reclaimed = {cls: 0.0 for cls in weights}   # Estimated slot seconds saved by waiters that left the queue
+
+    @asynccontextmanager
+    async def slot(self, priority: str | None = None):
+        """
+        `async with scheduler.slot():` holds one slot. Priority defaults to the current
+        flight's claim (followed while queued) or inference_priority.
+        """
+        claim = None if priority else priority_claim.get()
+        cls = await self.acquire(priority or current_priority(), claim)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            held, prev = time.perf_counter() - start, self._service[cls]
+            self._service[cls] = prev + SERVICE_EWMA_ALPHA * (held - prev) if prev else held
+            self.release()
+
+    async def acquire(self, cls: str, claim: PriorityClaim | None = None) -> str:
+        """Waits for a slot; returns the class it was granted under (a claim may promote it)"""
+        start = time.perf_counter()
+        if self._free > 0 and not any(self._queues.values()):
+            self._free -= 1
+            self._grant(cls, start)
+            return cls
+        waiter = asyncio.get_running_loop().create_future()
+        self._enqueue(cls, waiter)
+        queued = [cls]
+
+        def _promote():
+            if waiter.done() or claim.cls == queued[0]:
+                return
+            try:
+                self._queues[queued[0]].remove(waiter)
+            except ValueError:
+                return
+            queued[0] = claim.cls
+            self._enqueue(claim.cls, waiter)
+
+        if claim is not None:
+            claim._listeners.add(_promote)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            cls = queued[0]
+            self.cancelled[cls] += 1
+            if waiter.done() and not waiter.cancelled():
+                self.release()   # Granted just before the cancellation landed: hand the slot on
+            else:
+                self.reclaimed[cls] += self._service[cls]
+                try:
+                    self._queues[cls].remove(waiter)
+                except ValueError:
+                    pass
+            raise
+        finally:
+            if claim is not None:
+                claim._listeners.discard(_promote)
+        self._grant(queued[0], start)
+        return queued[0]
+
+    def _enqueue(self, cls: str, waiter: asyncio.Future):
+        queue = self._queues[cls]
+        if not queue:
+            self._pass[cls] = max(self._pass[cls], self._vtime)
+        queue.append(waiter)
+
+    def _grant(self, cls: str, start: float):
+        self.granted[cls] += 1
+        self._waits[cls].append(time.perf_counter() - start)
+
+    def release(self):
+        self._free += 1
+        while self._free > 0:
+            waiting = [cls for cls, queue in self._queues.items() if queue]
+            if not waiting:
+                return
+            cls = min(waiting, key=lambda c: (self._pass[c], self._order[c]))
+            waiter = self._queues[cls].popleft()
+            if waiter.done():
+                continue
+            self._free -= 1
+            self._vtime = self._pass[cls]
+            self._pass[cls] += self._stride[cls]
+            waiter.set_result(None)
+
+    def locked(self) -> bool:
+        return self._free == 0
+
+    def queued(self) -> dict[str, int]:
+        return {cls: sum(1 for w in queue if not w.done()) for cls, queue in self._queues.items()}
+
+    def estimate_wait(self, cls: str) -> float:
+        """
+        Seconds a new `cls` request would wait for a slot: the queued work of every class
+        that stride scheduling serves before it (each class gets weight-proportional
+        grants until this one's turn) times that class's mean hold time, plus half a
+        hold for each busy slot.
+        """
+        queued = self.queued()
+        turns = (queued[cls] + 1) / self._weights[cls]
+        work = sum(min(queued[c], turns * w) * self._service[c] for c, w in self._weights.items() if c != cls)
+        work += queued[cls] * self._service[cls]
+        busy = self.slots - self._free
+        if busy:
+            held = [t for t in self._service.values() if t]
+            work += busy * 0.5 * (sum(held) / len(held) if held else 0.0)
+        return work / self.slots
+
+    def stats(self) -> dict:
+        classes = {}
+        queued = self.queued()
+        for cls, waits in self._waits.items():
+            samples = sorted(waits)
+            pct = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 2) if samples else 0.0
+            classes[cls] = {
+                "waiting": queued[cls],
+                "granted": self.granted[cls],
+                "cancelled": self.cancelled[cls],
+                "reclaimed_ms_est": round(self.reclaimed[cls] * 1000, 2),
+                "wait_ms_p50": pct(0.50),
+                "wait_ms_p99": pct(0.99),
+                "wait_ms_max": round(samples[-1] * 1000, 2) if samples else 0.0,
+                "service_ms": round(self._service[cls] * 1000, 2),
+                "estimated_wait_ms": round(self.estimate_wait(cls) * 1000, 2),
+            }
+        return {"slots": self.slots, "busy": self.slots - self._free, "classes": classes}
+
+
+# Global instance: the serialized inference lane (Chronos/PyTorch, and HMM work without regime workers)
+inference_scheduler = PriorityScheduler("inference", slots=1)
+# Global instance: GBM-only (degraded) analyses without regime workers. Pure NumPy work, so it
+# does not need the PyTorch lane; a request downgraded because that lane is backed up must not queue on it
+degraded_scheduler = PriorityScheduler("degraded", slots=DEGRADED_SLOTS)
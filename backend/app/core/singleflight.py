@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable
+from .cancellation import spawn
+from .scheduler import PriorityClaim, priority_claim, current_priority
+from . import deadline
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    __slots__ = ("task", "token", "claim", "deadline", "waiters")
+
+    def __init__(self, task: asyncio.Task, token, claim: PriorityClaim, shared_deadline):
+        self.task = task
+        self.token = token
+        self.claim = claim
+        self.deadline = shared_deadline
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight async computations.
+    The first caller for a key starts the work; callers arriving while it runs
+    await the same task and receive the same result (or the same exception).
+    The shared task is shielded, so a caller that gives up does not cancel it
+    for the others; once the last caller gives up the work is cancelled.
+
+    The work runs at the best priority class among its callers and under the most
+    generous of their deadlines: an interactive request joining a portfolio flight
+    promotes it (see scheduler.PriorityClaim) instead of waiting at portfolio priority.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: dict[Hashable, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.abandoned = 0
+        self.promoted = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            logger.info(f"SingleFlight[{self.name}]: joined in-flight computation for {key}")
+            if flight.claim.promote(current_priority()):
+                self.promoted += 1
+                logger.info(f"SingleFlight[{self.name}]: {key} promoted to {flight.claim.cls}")
+            if flight.deadline is not None:
+                flight.deadline.extend_to(deadline.request_deadline.get())
+        else:
+            self.started += 1
+            # The flight owns its cancellation token, priority and deadline: the caller that
+            # started it neither cancels it for the rest nor bounds it by its own budget
+            claim, shared = PriorityClaim(current_priority()), deadline.share()
+            claim_reset, deadline_reset = priority_claim.set(claim), deadline.request_deadline.set(shared)
+            try:
+                flight = _Flight(*spawn(factory), claim, shared)
+            finally:
+                priority_claim.reset(claim_reset)
+                deadline.request_deadline.reset(deadline_reset)
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda _t, k=key, f=flight: self._forget(k, f))
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                self.abandoned += 1
+                logger.info(f"SingleFlight[{self.name}]: every caller left, cancelling {key}")
+                # Unregister first: a caller arriving before the task finishes unwinding
+                # must start a fresh flight, not join (and inherit) the cancellation
+                self._forget(key, flight)
+                flight.token.set()
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        total = self.started + self.coalesced
+        return {
+            "in_flight": len(self._inflight),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "promoted": self.promoted,
+            "coalesce_ratio": round(self.coalesced / total, 4) if total else 0.0,
+        }
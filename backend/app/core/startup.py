@@ -0,0 +1,43 @@
+import time
+import threading
+from contextlib import contextmanager
+
+_PROCESS_T0 = time.perf_counter()
+
+
+class StartupReport:
+    """
+    Records how long each startup component (imports, model loads) took so cold
+    starts can be broken down per component. Durations are in milliseconds.
+    """
+    def __init__(self):
+        self.components = {}
+        self.warm_up_started = None
+        self.warm_up_finished = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.components[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            components = dict(self.components)
+        warm_up_ms = None
+        if self.warm_up_started is not None and self.warm_up_finished is not None:
+            warm_up_ms = round((self.warm_up_finished - self.warm_up_started) * 1000, 1)
+        return {
+            "uptime_ms": round((time.perf_counter() - _PROCESS_T0) * 1000, 1),
+            "warm_up_ms": warm_up_ms,
+            "warm_up_done": self.warm_up_finished is not None,
+            "components": components,
+        }
+
+
+# Global instance
+startup_report = StartupReport()
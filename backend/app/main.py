@@ -1,4 +1,7 @@
 import os
+import time
+import asyncio
+from .core.startup import startup_report
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -11,8 +14,22 @@ backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 env_path = os.path.join(backend_dir, ".env")
 load_dotenv(env_path)
 
-from .api.endpoints import router
-from .services.llm import llm_service
+with startup_report.measure("import:api"):
+    from .api.endpoints import router, analysis_singleflight
+    from .services.llm import llm_service
+    from .core.response_cache import analysis_cache
+    from .core.jobs import portfolio_jobs
+    from .core.scheduler import inference_scheduler, degraded_scheduler
+    from .core.admission import admission
+    from .core import deadline
+    from .core.cancellation import disconnect_watcher
+    from .services.chronos import chronos_service
+    from .services.model_registry import model_registry
+    from .services.regime_pool import regime_pool
+    from .api import formats
+
+# Inside the app the model loads only in the background warm-up, never on a request's path
+chronos_service.load_on_demand = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -32,6 +49,40 @@ app.add_middleware(
 # API Router
 app.include_router(router, prefix="/api")
 
+
+def warm_up():
+    """
+    Background warm-up: heavy libraries and the Chronos model load here instead of at
+    import time, so Cloud Run answers /health immediately. Until Chronos is ready,
+    forecasts use the GBM fallback.
+    """
+    startup_report.warm_up_started = time.perf_counter()
+    try:
+        with startup_report.measure("import:yfinance"):
+            import yfinance  # noqa: F401
+        with startup_report.measure("import:hmmlearn"):
+            from hmmlearn import hmm  # noqa: F401
+        with startup_report.measure("import:torch"):
+            import torch  # noqa: F401
+        if regime_pool.enabled:
+            with startup_report.measure("start:regime_workers"):
+                regime_pool.warm_up()
+        with startup_report.measure("load:chronos"):
+            chronos_service.warm_up()
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}", exc_info=True)
+    finally:
+        startup_report.warm_up_finished = time.perf_counter()
+        logger.info(f"Warm-up finished: {startup_report.as_dict()}")
+
+
+@app.on_event("startup")
+async def start_warm_up():
+    # Flip Chronos to "loading" before the executor picks the job up: requests arriving
+    # while the libraries import and the regime workers spawn go straight to GBM
+    chronos_service.mark_loading()
+    asyncio.get_running_loop().run_in_executor(None, warm_up)
+
 # Static Files (Frontend)
 # Assumes 'static' folder is at the root level relative to where python is run
 static_dir = os.path.join(os.getcwd(), "static")
@@ -39,9 +90,37 @@ static_dir = os.path.join(os.getcwd(), "static")
 if os.path.exists(static_dir):
     app.mount("/assets", StaticFiles(directory=os.path.join(static_dir, "assets")), name="assets")
 
+@app.get("/ready")
+async def readiness():
+    """Serving is possible from the first request; this tells which forecast engine is live"""
+    chronos = chronos_service.readiness()
+    return {
+        "ready": True,
+        "forecast_engine": "chronos" if chronos["state"] == "ready" else "gbm_fallback",
+        "chronos": chronos,
+        "startup": startup_report.as_dict(),
+    }
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "llm_enabled": llm_service.enabled}
+    return {
+        "status": "healthy",
+        "llm_enabled": llm_service.enabled,
+        "analysis_coalescing": analysis_singleflight.stats(),
+        "inference_scheduler": inference_scheduler.stats(),
+        "degraded_scheduler": degraded_scheduler.stats(),
+        "admission": admission.stats(),
+        "deadlines": deadline.stats(),
+        "cancellation": disconnect_watcher.stats(),
+        "analysis_cache": analysis_cache.stats(),
+        "chronos_batching": chronos_service.batching_stats(),
+        "chronos_cache": chronos_service.cache.stats(),
+        "chronos_workers": chronos_service.pool_stats(),
+        "hmm_registry": await regime_pool.registry_stats(model_registry.stats()),
+        "regime_workers": regime_pool.stats(),
+        "portfolio_jobs": portfolio_jobs.stats(),
+        "analyze_formats": formats.available(),
+    }
 
 # Serving Root (SPA Entry Point)
 @app.get("/", response_class=HTMLResponse)
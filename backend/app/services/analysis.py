@@ -1,7 +1,8 @@
+import os
 import numpy as np
 import pandas as pd
-from hmmlearn import hmm
 import logging
+from .model_registry import model_registry
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +11,20 @@ HMM_COMPONENTS = 3
 HMM_COVARIANCE = "diag"
 HMM_ITERATIONS = 100  # 100 iterations is sufficient for convergence with 3 components
 HMM_RANDOM_STATE = 42
+HMM_ENGINE = os.getenv("HMM_ENGINE", "native")  # "native" (regime_engine) or "hmmlearn"
+
+# --- WARM START CONFIGURATION (native engine only) ---
+HMM_WARM_START = os.getenv("HMM_WARM_START", "1") == "1"
+WARM_START_ITERATIONS = 10       # EM budget for a refit seeded from the model registry
+WARM_START_LL_TOLERANCE = 0.02   # Per-bar log-likelihood a warm fit may lose vs the last cold fit
+WARM_START_MAX_STREAK = 20       # Warm refits in a row before a cold fit re-explores from scratch
+
+# --- ONLINE REGIME UPDATES (need warm starts) ---
+# Between full fits a revised last bar (intraday refresh) only advances the forward filter.
+# HMM_ONLINE_REFIT_BARS new bars trigger the scheduled full fit: with daily bars the
+# default refits once per closed session.
+HMM_ONLINE = os.getenv("HMM_ONLINE", "1") == "1"
+HMM_ONLINE_REFIT_BARS = int(os.getenv("HMM_ONLINE_REFIT_BARS", "1"))
 
 # --- SCORING THRESHOLDS ---
 RR_OPTIMAL = 0.15
@@ -28,61 +43,110 @@ SHORT_TERM_WINDOW = 10   # Ventana para tendencia rápida
 
 # --- HMM TRAINING LOGIC ---
 
-def train_hmm_returns(data: pd.DataFrame):
-    """Train HMM on Returns data"""
-    returns_data = data[['Returns']].values.astype(np.float64)
-    # Emergency sanitization: enforce finiteness before HMM fit
-    if not np.isfinite(returns_data).all():
-        returns_data = np.nan_to_num(returns_data, nan=0.0, posinf=0.0, neginf=0.0)
-    
-    model_ret = hmm.GaussianHMM(
+def _build_hmm():
+    """Regime model for one 1-D feature. Both engines share the fit/predict/predict_proba API."""
+    if HMM_ENGINE == "native":
+        from .regime_engine import UnivariateGaussianHMM
+        return UnivariateGaussianHMM(
+            n_components=HMM_COMPONENTS,
+            n_iter=HMM_ITERATIONS,
+            random_state=HMM_RANDOM_STATE,
+            min_covar=1e-3
+        )
+    from hmmlearn import hmm  # Deferred: keeps API import/cold start cheap (see main.warm_up)
+    return hmm.GaussianHMM(
         n_components=HMM_COMPONENTS, 
         covariance_type=HMM_COVARIANCE, 
         n_iter=HMM_ITERATIONS, 
         random_state=HMM_RANDOM_STATE,
         min_covar=1e-3
     )
-    try:
-        model_ret.fit(returns_data)
-    except ValueError as e:
-        logger.error(f"HMM_ERROR_DEBUG: {e}")
-        logger.error(f"DATA_SAMPLES FIRST: {returns_data[:5].tolist()}")
-        logger.error(f"DATA_SAMPLES LAST: {returns_data[-5:].tolist()}")
-        logger.error(f"IS_FINITE: {np.isfinite(returns_data).all()}")
-        raise e
-    
-    raw_regimes_ret = model_ret.predict(returns_data)
-    raw_probs_ret = model_ret.predict_proba(returns_data)
-    
-    ret_stats_raw = []
+
+def _rolling_mode(labels: np.ndarray, window: int = 5) -> np.ndarray:
+    """
+    Centered rolling majority of small non-negative integer labels. Same result as
+    pd.Series(labels).rolling(window, center=True).apply(lambda x: x.mode().iloc[0])
+    .ffill().bfill().astype(int): ties go to the smallest label (pandas sorts modes) and
+    the half-window edges take the nearest full window's value.
+    """
+    if window % 2 == 0:
+        raise ValueError("Only odd (centered) windows are supported")
+    labels = np.asarray(labels, dtype=np.int64)
+    n = labels.shape[0]
+    if n < window:
+        raise ValueError(f"Need at least {window} labels to smooth, got {n}")
+    one_hot = np.zeros((n + 1, int(labels.max()) + 1), dtype=np.int64)
+    one_hot[np.arange(1, n + 1), labels] = 1
+    counts = np.cumsum(one_hot, axis=0)
+    counts = counts[window:] - counts[:-window]       # Label counts of every full window
+    modes = counts.argmax(axis=1)                    # First maximum = smallest label on ties
+    half = window // 2
+    return np.concatenate([np.full(half, modes[0]), modes, np.full(half, modes[-1])])
+
+def _group_mean_std(values: np.ndarray, groups: np.ndarray, n_groups: int = 3):
+    """
+    Per-group (count, mean, std with ddof=1) of `values`, matching Series.mean()/.std()
+    on each group bit for bit: NaNs are skipped and every group is summed in its
+    original order (pandas' NaN-zeroed pairwise sums), so the groups are gathered
+    with one stable sort instead of a boolean slice each.
+    """
+    counts = np.bincount(groups, minlength=n_groups)
+    order = np.argsort(groups, kind="stable")
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    v = values[order]
+    missing = np.isnan(v)
+    v = np.where(missing, 0.0, v)
+    means = np.full(n_groups, np.nan)
+    stds = np.full(n_groups, np.nan)
+    for i in range(n_groups):
+        lo, hi = bounds[i], bounds[i + 1]
+        valid = (hi - lo) - int(missing[lo:hi].sum())
+        if valid == 0:
+            continue
+        seg = v[lo:hi]
+        means[i] = seg.sum() / valid
+        if valid > 1:
+            sqr = (means[i] - seg) ** 2
+            sqr[missing[lo:hi]] = 0.0
+            stds[i] = np.sqrt(sqr.sum() / (valid - 1))
+    return counts, means, stds
+
+def _regime_mapping(data: pd.DataFrame, column: str, raw_regimes: np.ndarray) -> tuple:
+    """Raw HMM state ids of the (stable, bull, volatile) regimes, by the mean/std of `column` in each state"""
+    counts, means, stds = _group_mean_std(data[column].to_numpy(dtype=np.float64), raw_regimes)
+    stats_raw = []
     for i in range(3):
-        r = data.iloc[raw_regimes_ret == i]['Returns']
-        ret_stats_raw.append({'id': i, 'mean': r.mean() if not r.empty else -999, 'std': r.std() if not r.empty else 999})
-    
-    bull_id_ret = sorted(ret_stats_raw, key=lambda x: x['mean'], reverse=True)[0]['id']
-    rem_ret = [s for s in ret_stats_raw if s['id'] != bull_id_ret]
-    vol_id_ret = sorted(rem_ret, key=lambda x: x['std'], reverse=True)[0]['id']
-    stab_id_ret = [s['id'] for s in ret_stats_raw if s['id'] not in [bull_id_ret, vol_id_ret]][0]
+        stats_raw.append({'id': i, 'mean': means[i] if counts[i] else -999, 'std': stds[i] if counts[i] else 999})
     
-    map_ret = {stab_id_ret: 0, bull_id_ret: 1, vol_id_ret: 2}
-    regimes_ret_raw = np.array([map_ret[r] for r in raw_regimes_ret])
+    bull_id = sorted(stats_raw, key=lambda x: x['mean'], reverse=True)[0]['id']
+    rem = [s for s in stats_raw if s['id'] != bull_id]
+    vol_id = sorted(rem, key=lambda x: x['std'], reverse=True)[0]['id']
+    stab_id = [s['id'] for s in stats_raw if s['id'] not in [bull_id, vol_id]][0]
+    return stab_id, bull_id, vol_id
+
+def _relabel_regimes(raw_regimes: np.ndarray, raw_probs: np.ndarray, order: tuple):
+    """
+    Maps raw HMM states to 0 = stable, 1 = bull, 2 = volatile (`order`, see _regime_mapping),
+    smooths the path and reorders the posterior columns to match.
+    """
+    lookup = np.empty(len(order), dtype=np.int64)
+    lookup[list(order)] = np.arange(len(order))
+    regimes_raw = lookup[raw_regimes]
     
     # POST-PROCESSING: Smoothing regimes to avoid daily noise/oscillation
     # We use a rolling mode with window 5 to consolidate states
-    regimes_series = pd.Series(regimes_ret_raw)
-    regimes_ret = regimes_series.rolling(window=5, center=True).apply(lambda x: x.mode().iloc[0]).fillna(method='ffill').fillna(method='bfill').astype(int).values
-    
-    probs_ret = np.zeros_like(raw_probs_ret)
-    probs_ret[:, 0] = raw_probs_ret[:, stab_id_ret]
-    probs_ret[:, 1] = raw_probs_ret[:, bull_id_ret]
-    probs_ret[:, 2] = raw_probs_ret[:, vol_id_ret]
+    regimes = _rolling_mode(regimes_raw, window=5)
     
+    probs = raw_probs[:, list(order)]
+    return regimes, probs
+
+def _returns_stats(data: pd.DataFrame, regimes_ret: np.ndarray) -> list:
+    counts, means, stds = _group_mean_std(data['Returns'].to_numpy(dtype=np.float64), regimes_ret)
     final_ret_stats = []
     for i in range(3):
-        r = data.iloc[regimes_ret == i]['Returns']
-        if not r.empty:
-            m = float(r.mean() * 100)
-            s = float(r.std() * 100)
+        if counts[i]:
+            m = float(means[i] * 100)
+            s = float(stds[i] * 100)
             # Safe ratio calculation (avoid Inf/NaN)
             if np.isnan(s) or s == 0:
                 ratio = 0.0
@@ -95,70 +159,250 @@ def train_hmm_returns(data: pd.DataFrame):
             final_ret_stats.append({"regime": i, "mean": m, "std": s, "ratio_rr": ratio})
         else:
             final_ret_stats.append({"regime": i, "mean": 0.0, "std": 0.0, "ratio_rr": 0.0})
-    
-    return regimes_ret, probs_ret, final_ret_stats
-
-def train_hmm_diff(data: pd.DataFrame):
-    """Train HMM on Diff_Returns data"""
-    diff_data = data[['Diff_Returns']].values.astype(np.float64)
-    # Emergency sanitization: enforce finiteness before HMM fit
-    if not np.isfinite(diff_data).all():
-        diff_data = np.nan_to_num(diff_data, nan=0.0, posinf=0.0, neginf=0.0)
-
-    # Added min_covar for mathematical stability
-    model_diff = hmm.GaussianHMM(
-        n_components=HMM_COMPONENTS, 
-        covariance_type=HMM_COVARIANCE, 
-        n_iter=HMM_ITERATIONS, 
-        random_state=HMM_RANDOM_STATE,
-        min_covar=1e-3
-    )
-    try:
-        model_diff.fit(diff_data)
-    except ValueError as e:
-        logger.error(f"HMM_DIFF_ERROR_DEBUG: {e}")
-        logger.error(f"DIFF_DATA_SAMPLES FIRST: {diff_data[:5].tolist()}")
-        logger.error(f"DIFF_DATA_SAMPLES LAST: {diff_data[-5:].tolist()}")
-        logger.error(f"IS_DIFF_FINITE: {np.isfinite(diff_data).all()}")
-        raise e
-    
-    raw_regimes_diff = model_diff.predict(diff_data)
+    return final_ret_stats
 
-    raw_probs_diff = model_diff.predict_proba(diff_data)
-    
-    diff_stats_raw = []
-    for i in range(3):
-        r = data.iloc[raw_regimes_diff == i]['Diff_Returns']
-        diff_stats_raw.append({'id': i, 'mean': r.mean() if not r.empty else -999, 'std': r.std() if not r.empty else 999})
-    
-    bull_id_diff = sorted(diff_stats_raw, key=lambda x: x['mean'], reverse=True)[0]['id']
-    rem_diff = [s for s in diff_stats_raw if s['id'] != bull_id_diff]
-    vol_id_diff = sorted(rem_diff, key=lambda x: x['std'], reverse=True)[0]['id']
-    stab_id_diff = [s['id'] for s in diff_stats_raw if s['id'] not in [bull_id_diff, vol_id_diff]][0]
-    
-    map_diff = {stab_id_diff: 0, bull_id_diff: 1, vol_id_diff: 2}
-    regimes_diff_raw = np.array([map_diff[r] for r in raw_regimes_diff])
-    
-    # POST-PROCESSING: Smoothing regimes
-    reg_series_diff = pd.Series(regimes_diff_raw)
-    regimes_diff = reg_series_diff.rolling(window=5, center=True).apply(lambda x: x.mode().iloc[0]).fillna(method='ffill').fillna(method='bfill').astype(int).values
-    
-    probs_diff = np.zeros_like(raw_probs_diff)
-    probs_diff[:, 0] = raw_probs_diff[:, stab_id_diff]
-    probs_diff[:, 1] = raw_probs_diff[:, bull_id_diff]
-    probs_diff[:, 2] = raw_probs_diff[:, vol_id_diff]
-    
+def _diff_stats(data: pd.DataFrame, regimes_diff: np.ndarray) -> list:
+    counts, means, stds = _group_mean_std(data['Diff_Returns'].to_numpy(dtype=np.float64), regimes_diff)
     final_diff_stats = []
     for i in range(3):
-        r = data.iloc[regimes_diff == i]['Diff_Returns']
-        if not r.empty:
-            m = float(r.mean() * 100)
-            s = float(r.std() * 100)
+        if counts[i]:
+            m = float(means[i] * 100)
+            s = float(stds[i] * 100)
             final_diff_stats.append({"regime": i, "mean": m, "std": s})
         else:
             final_diff_stats.append({"regime": i, "mean": 0.0, "std": 0.0})
-    
-    return regimes_diff, probs_diff, final_diff_stats
+    return final_diff_stats
+
+def _feature_matrix(data: pd.DataFrame, column: str) -> np.ndarray:
+    values = data[[column]].values.astype(np.float64)
+    # Emergency sanitization: enforce finiteness before HMM fit
+    if not np.isfinite(values).all():
+        values = np.nan_to_num(values, nan=0.0, posinf=0.0, neginf=0.0)
+    return values
+
+def _fit_regime_model(values: np.ndarray, ticker: str | None, feature: str):
+    """
+    Fits the HMM for one feature. With a registry entry for `ticker` the fit starts from
+    the stored parameters with a bounded EM budget. A cold fit runs when there is no
+    entry, when the warm fit's per-bar log-likelihood falls more than
+    WARM_START_LL_TOLERANCE below the last cold fit's, or after WARM_START_MAX_STREAK
+    warm fits in a row; the warm model is still kept if the cold one scores worse, so a
+    refit never swaps in a poorer optimum.
+    Returns (model, registry_record) - the record is None when warm starts are off.
+    """
+    use_registry = bool(ticker) and HMM_WARM_START and HMM_ENGINE == "native"
+    entry = model_registry.get(ticker, feature) if use_registry else None
+    n = len(values)
+
+    warm = None
+    if entry is not None:
+        try:
+            warm = _build_hmm().warm_fit(values, entry["params"], WARM_START_ITERATIONS)
+            streak = entry.get("warm_streak", 0)
+            if streak < WARM_START_MAX_STREAK:
+                if warm.log_prob_ / n >= entry["ll_per_bar"] - WARM_START_LL_TOLERANCE:
+                    model_registry.warm_fits += 1
+                    model_registry.iterations_saved += max(entry["cold_iterations"] - warm.n_iter_, 0)
+                    return warm, {
+                        "ll_per_bar": entry["ll_per_bar"],
+                        "cold_iterations": entry["cold_iterations"],
+                        "warm_streak": streak + 1,
+                    }
+                model_registry.warm_rejected += 1
+                logger.info(f"Warm-started {feature} HMM for {ticker} degraded, refitting from scratch")
+        except (KeyError, ValueError) as e:
+            warm = None
+            logger.warning(f"Unusable registry entry for {ticker}:{feature}, refitting from scratch: {e}")
+
+    model = _build_hmm().fit(values)
+    if not use_registry:
+        return model, None
+    model_registry.cold_fits += 1
+    record = {"ll_per_bar": model.log_prob_ / n, "cold_iterations": model.n_iter_, "warm_streak": 0}
+    if warm is not None and warm.log_prob_ > model.log_prob_:
+        return warm, dict(record, ll_per_bar=warm.log_prob_ / n)
+    return model, record
+
+def _register_model(ticker: str, feature: str, data: pd.DataFrame, params: dict, order: tuple, record: dict):
+    labels = [0] * len(order)
+    for label, state in enumerate(order):
+        labels[state] = label
+    model_registry.put(ticker, feature, dict(
+        record, params=params, labels=labels, n_obs=len(data), last_bar=data.index[-1].isoformat()
+    ))
+
+def _start_track(ticker: str, feature: str, data: pd.DataFrame, values: np.ndarray, model,
+                 raw_regimes: np.ndarray, raw_probs: np.ndarray | None, order: tuple):
+    from .regime_engine import OnlineRegimeFilter
+    model_registry.put_track(ticker, feature, {
+        "filter": OnlineRegimeFilter(model, values),
+        "index": data.index.asi8.copy(),   # int64 ns: cheap numpy comparisons on every refresh
+        "values": values[:, 0].copy(),
+        "states": raw_regimes,
+        "probs": raw_probs,
+        "order": order,
+        "new_bars": 0,
+    })
+
+def _track_update(ticker: str | None, feature: str, data: pd.DataFrame, values: np.ndarray,
+                  full_posteriors: bool = True):
+    """
+    (raw_regimes, raw_probs, order) for `data` from the ticker's live track, advancing
+    the forward filter over the revised last bar and any new bars (O(K^2) each).
+    Earlier bars keep the states/posteriors of the last full fit. Returns None when a
+    full fit is due: no track, HMM_ONLINE_REFIT_BARS new bars reached, history that
+    no longer matches the tracked window (gaps, re-adjusted bars), or full posteriors
+    requested from a track started by a verdict-only fit.
+    """
+    if not (ticker and HMM_ONLINE and HMM_WARM_START and HMM_ENGINE == "native"):
+        return None
+    track = model_registry.get_track(ticker, feature)
+    if track is None or (full_posteriors and track["probs"] is None):
+        return None
+
+    index, x = data.index.asi8, values[:, 0]
+    old_index, old_x = track["index"], track["values"]
+    start = old_index.searchsorted(index[0])        # First tracked bar still in the window
+    last = index.searchsorted(old_index[-1])        # Position of the tracked last bar in `data`
+    if start >= len(old_index) or old_index[start] != index[0] or last >= len(index) \
+            or index[last] != old_index[-1] or last != len(old_index) - 1 - start:
+        return None
+    new_bars = len(index) - 1 - last
+    if new_bars and track["new_bars"] + new_bars >= HMM_ONLINE_REFIT_BARS:
+        model_registry.scheduled_refits += 1
+        return None
+    if not np.array_equal(old_x[start:-1], x[:last]):
+        return None
+
+    filt = track["filter"].revise(x[last])
+    states, probs = [filt.state], [filt.probs]
+    for value in x[last + 1:]:
+        filt = filt.advance(value)
+        states.append(filt.state)
+        probs.append(filt.probs)
+    raw_regimes = np.concatenate([track["states"][start:-1], states])
+    tracked_probs = None if track["probs"] is None else np.concatenate([track["probs"][start:-1], probs])
+
+    model_registry.put_track(ticker, feature, dict(
+        track, filter=filt, index=index.copy(), values=x.copy(), states=raw_regimes, probs=tracked_probs,
+        new_bars=track["new_bars"] + new_bars,
+    ))
+    model_registry.online_updates += 1
+    raw_probs = tracked_probs if tracked_probs is not None else filt.probs[None, :]
+    return raw_regimes, raw_probs, track["order"]
+
+def _posteriors(model, values: np.ndarray, full_posteriors: bool) -> np.ndarray:
+    """Every bar's state posteriors, or just the last bar's row (1, K) for verdict-only callers"""
+    if full_posteriors:
+        return model.predict_proba(values)
+    if hasattr(model, "predict_last_proba"):
+        return model.predict_last_proba(values)
+    return model.predict_proba(values)[-1:]
+
+def train_hmm_returns(data: pd.DataFrame, ticker: str | None = None, full_posteriors: bool = True):
+    """
+    Train HMM on Returns data. With a `ticker` the fit is warm-started from the model
+    registry, and refreshes between scheduled fits only run the online filter.
+    With full_posteriors=False the returned probs hold only the last bar's row.
+    """
+    returns_data = _feature_matrix(data, 'Returns')
+
+    tracked = _track_update(ticker, 'Returns', data, returns_data, full_posteriors)
+    if tracked is not None:
+        raw_regimes_ret, raw_probs_ret, order = tracked
+    else:
+        try:
+            model_ret, record = _fit_regime_model(returns_data, ticker, 'Returns')
+        except ValueError as e:
+            logger.error(f"HMM_ERROR_DEBUG: {e}")
+            logger.error(f"DATA_SAMPLES FIRST: {returns_data[:5].tolist()}")
+            logger.error(f"DATA_SAMPLES LAST: {returns_data[-5:].tolist()}")
+            logger.error(f"IS_FINITE: {np.isfinite(returns_data).all()}")
+            raise e
+
+        raw_regimes_ret = model_ret.predict(returns_data)
+        raw_probs_ret = _posteriors(model_ret, returns_data, full_posteriors)
+
+        order = _regime_mapping(data, 'Returns', raw_regimes_ret)
+        if record is not None:
+            _register_model(ticker, 'Returns', data, model_ret.get_params(), order, record)
+            _start_track(ticker, 'Returns', data, returns_data, model_ret, raw_regimes_ret,
+                         raw_probs_ret if full_posteriors else None, order)
+    regimes_ret, probs_ret = _relabel_regimes(raw_regimes_ret, raw_probs_ret, order)
+    return regimes_ret, probs_ret, _returns_stats(data, regimes_ret)
+
+def train_hmm_diff(data: pd.DataFrame, ticker: str | None = None, full_posteriors: bool = True):
+    """Train HMM on Diff_Returns data (registry warm starts and online updates as train_hmm_returns)"""
+    diff_data = _feature_matrix(data, 'Diff_Returns')
+
+    tracked = _track_update(ticker, 'Diff_Returns', data, diff_data, full_posteriors)
+    if tracked is not None:
+        raw_regimes_diff, raw_probs_diff, order = tracked
+    else:
+        try:
+            model_diff, record = _fit_regime_model(diff_data, ticker, 'Diff_Returns')
+        except ValueError as e:
+            logger.error(f"HMM_DIFF_ERROR_DEBUG: {e}")
+            logger.error(f"DIFF_DATA_SAMPLES FIRST: {diff_data[:5].tolist()}")
+            logger.error(f"DIFF_DATA_SAMPLES LAST: {diff_data[-5:].tolist()}")
+            logger.error(f"IS_DIFF_FINITE: {np.isfinite(diff_data).all()}")
+            raise e
+
+        raw_regimes_diff = model_diff.predict(diff_data)
+        raw_probs_diff = _posteriors(model_diff, diff_data, full_posteriors)
+
+        order = _regime_mapping(data, 'Diff_Returns', raw_regimes_diff)
+        if record is not None:
+            _register_model(ticker, 'Diff_Returns', data, model_diff.get_params(), order, record)
+            _start_track(ticker, 'Diff_Returns', data, diff_data, model_diff, raw_regimes_diff,
+                         raw_probs_diff if full_posteriors else None, order)
+    regimes_diff, probs_diff = _relabel_regimes(raw_regimes_diff, raw_probs_diff, order)
+    return regimes_diff, probs_diff, _diff_stats(data, regimes_diff)
+
+def train_hmm_batch(datasets: dict, full_posteriors: bool = True) -> dict:
+    """
+    Fits the Returns and Diff_Returns HMMs of many tickers at once with the batched
+    engine. Returns {ticker: ((regimes_ret, probs_ret, ret_stats),
+    (regimes_diff, probs_diff, diff_stats))}, the same tuples as train_hmm_returns /
+    train_hmm_diff (including full_posteriors). Batched fits are always cold; they
+    seed the model registry for later warm-started refits.
+    """
+    from .regime_engine import BatchedGaussianHMM
+    tickers = list(datasets)
+    series = [_feature_matrix(datasets[t], 'Returns')[:, 0] for t in tickers]
+    series += [_feature_matrix(datasets[t], 'Diff_Returns')[:, 0] for t in tickers]
+
+    model = BatchedGaussianHMM(
+        n_components=HMM_COMPONENTS,
+        n_iter=HMM_ITERATIONS,
+        random_state=HMM_RANDOM_STATE,
+        min_covar=1e-3
+    ).fit(series)
+    raw = model.decode(series, posteriors="all" if full_posteriors else "last")
+    if HMM_WARM_START:
+        model_registry.cold_fits += len(series)
+
+    results = {}
+    for i, ticker in enumerate(tickers):
+        data = datasets[ticker]
+        (states_ret, post_ret), (states_diff, post_diff) = raw[i], raw[len(tickers) + i]
+        order_ret = _regime_mapping(data, 'Returns', states_ret)
+        order_diff = _regime_mapping(data, 'Diff_Returns', states_diff)
+        if HMM_WARM_START:
+            for b, feature, order in ((i, 'Returns', order_ret), (len(tickers) + i, 'Diff_Returns', order_diff)):
+                record = {
+                    "ll_per_bar": float(model.log_prob_[b]) / len(data),
+                    "cold_iterations": int(model.n_iter_[b]),
+                    "warm_streak": 0,
+                }
+                _register_model(ticker, feature, data, model.params_for(b), order, record)
+        regimes_ret, probs_ret = _relabel_regimes(states_ret, post_ret, order_ret)
+        regimes_diff, probs_diff = _relabel_regimes(states_diff, post_diff, order_diff)
+        results[ticker] = (
+            (regimes_ret, probs_ret, _returns_stats(data, regimes_ret)),
+            (regimes_diff, probs_diff, _diff_stats(data, regimes_diff)),
+        )
+    return results
 
 
 # --- TRIPLE-PILLAR RECOMMENDATION ENGINE ---
@@ -271,18 +515,92 @@ def generate_ai_recommendation(data, reg_ret, reg_diff, probs_ret, probs_diff, f
         }
     }
 
-def get_historical_verdicts(data, reg_ret, reg_diff, ret_stats, diff_stats):
-    """Calculates historical recommendation states (0-4) for matching the 5-tier AI verdicts"""
-    raw_scores = []
-    for i in range(len(data)):
-        if i < 5:
-            raw_scores.append(50.0)
-            continue
-        data_slice = data.iloc[:i+1]
-        score, _, _, _, _ = _calculate_score(
-            data_slice, int(reg_ret[i]), int(reg_diff[i]), ret_stats, diff_stats
-        )
-        raw_scores.append(score)
+def _calculate_score_series(data, reg_ret, reg_diff, ret_stats, diff_stats):
+    """Column-wise version of _calculate_score: scores every day of `data` at once.
+
+    Day i is scored exactly as _calculate_score(data.iloc[:i+1], ...) would score it
+    (without forecast), but each indicator is computed once over the whole frame
+    instead of once per growing prefix. The first 5 days are neutral (50.0).
+    """
+    n = len(data)
+    scores = np.full(n, 50.0)
+    if n <= 5:
+        return scores
+
+    rvol = data['RVOL'].to_numpy(dtype=np.float64)
+    rets = data['Returns'].to_numpy(dtype=np.float64)
+    close = data['Close'].to_numpy(dtype=np.float64)
+    # EWM is causal: the value at day i over the full series equals the last value over data[:i+1]
+    ema_short = data['Close'].ewm(span=SHORT_TERM_WINDOW).mean().to_numpy(dtype=np.float64)
+    reg_ret = np.asarray(reg_ret, dtype=np.int64)
+    reg_diff = np.asarray(reg_diff, dtype=np.int64)
+
+    # Regime -> stat lookup tables (missing regimes fall back like the scalar version)
+    rr_by_regime = {s['regime']: s.get("ratio_rr", 0) for s in reversed(ret_stats)}
+    impulse_by_regime = {s['regime']: s.get("mean", 0) for s in reversed(diff_stats)}
+    rr_ratio = np.array([rr_by_regime.get(r, 0) for r in range(HMM_COMPONENTS)], dtype=np.float64)[reg_ret]
+    impulse_mean = np.array([impulse_by_regime.get(r, 0) for r in range(HMM_COMPONENTS)], dtype=np.float64)[reg_diff]
+
+    idx = np.arange(5, n)
+    last_rvol = rvol[idx]
+    last_ret = rets[idx]
+
+    # VOLUME METRICS: NaN-skipping 3-day means, matching pandas' Series.mean()
+    def _window_mean(offset):
+        total = np.zeros(len(idx))
+        count = np.zeros(len(idx))
+        for k in (2, 1, 0):
+            v = rvol[idx - offset - k]
+            ok = ~np.isnan(v)
+            total = total + np.where(ok, v, 0.0)
+            count += ok
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(count > 0, total / count, np.nan)
+    vol_trend = _window_mean(0) - _window_mean(2)
+
+    # PILLAR 1: Structural Efficiency
+    rr = rr_ratio[idx]
+    structure_score = np.select(
+        [rr > RR_OPTIMAL, rr > RR_GOOD, rr >= RR_MINIMAL], [100.0, 70.0, 40.0], default=10.0
+    )
+    struct_multiplier = np.select(
+        [(last_rvol > 1.5) & (last_ret > 0), last_rvol > 1.5,
+         (last_rvol < 0.7) & (last_ret > 0), last_rvol < 0.7],
+        [1.25, 0.5, 0.8, 1.1], default=1.0
+    )
+    structure_score = np.minimum(100.0, structure_score * struct_multiplier)
+
+    # PILLAR 2: Dynamic Momentum
+    impulse = impulse_mean[idx]
+    momentum_score = np.select(
+        [impulse > MOMENTUM_HIGH, impulse > MOMENTUM_MODERATE, impulse > MOMENTUM_SLOWING, impulse <= MOMENTUM_SLOWING],
+        [100.0, 75.0, 30.0, 0.0], default=50.0
+    )
+    price_trend = close[idx] / close[idx - 4] - 1
+    weakening = (price_trend > 0) & (vol_trend < -0.1)
+    confirming = (price_trend > 0) & (vol_trend > 0.1) & ~weakening
+    momentum_score = np.where(weakening, momentum_score * 0.7, momentum_score)
+    momentum_score = np.where(confirming, np.minimum(100.0, momentum_score * 1.1), momentum_score)
+
+    # PILLAR 3: no forecast for historical points
+    projection_score = 50.0
+
+    # FLASH CORRECTION
+    panic_penalty = np.ones(len(idx))
+    crash = (last_ret <= CRASH_THRESHOLD) & (last_rvol >= PANIC_RVOL)
+    panic_penalty = np.where(crash, panic_penalty * 0.5, panic_penalty)
+    structure_score = np.where(crash, np.minimum(30.0, structure_score), structure_score)
+    ema_break = (idx + 1 >= SHORT_TERM_WINDOW) & (close[idx] < ema_short[idx])
+    panic_penalty = np.where(ema_break, panic_penalty * 0.85, panic_penalty)
+
+    final_score = (structure_score * 0.6) + (momentum_score * 0.2) + (projection_score * 0.2)
+    final_score = final_score * panic_penalty
+    scores[5:] = np.where(np.isfinite(final_score), final_score, 50.0)
+    return scores
+
+
+def _smoothed_scores(data, reg_ret, reg_diff, ret_stats, diff_stats) -> np.ndarray:
+    raw_scores = _calculate_score_series(data, reg_ret, reg_diff, ret_stats, diff_stats)
     
     # Smooth scores (3-day rolling mean) for stability while maintaining category accuracy
     scores = pd.Series(raw_scores).rolling(window=3, center=False).mean().fillna(method='bfill').values
@@ -290,12 +608,41 @@ def get_historical_verdicts(data, reg_ret, reg_diff, ret_stats, diff_stats):
     # FORCE SYNC: The very last point must match the raw score to avoid contradiction with the dashboard
     if len(scores) > 0:
         scores[-1] = raw_scores[-1]
+    return scores
+
+def latest_verdict(data, reg_ret, reg_diff, ret_stats, diff_stats) -> tuple[int, float]:
+    """
+    (stable_state, smoothed_score) of the last day: the same values as the last entries of
+    get_historical_verdicts, without walking the state machine day by day.
+
+    A score >= 65 always lands in COMPRA and a score <= 30 always in VENTA, whatever the
+    previous state. In between, COMPRA only decays to MANTENER (first score < 50) and
+    VENTA only recovers to MANTENER (first score > 45); MANTENER stays put. So the last
+    state follows from the last decisive score and the scores after it.
+    """
+    scores = _smoothed_scores(data, reg_ret, reg_diff, ret_stats, diff_stats)
+    if len(scores) == 0:
+        return 0, 50.0
+    decisive = np.flatnonzero((scores >= 65) | (scores <= 30))
+    if decisive.size == 0:
+        return 0, float(scores[-1])
+    last = decisive[-1]
+    tail = scores[last + 1:]
+    if scores[last] >= 65:
+        state = 0 if (tail < 50).any() else 1
+    else:
+        state = 0 if (tail > 45).any() else 2
+    return state, float(scores[-1])
+
+def get_historical_verdicts(data, reg_ret, reg_diff, ret_stats, diff_stats):
+    """Calculates historical recommendation states (0-4) for matching the 5-tier AI verdicts"""
+    scores = _smoothed_scores(data, reg_ret, reg_diff, ret_stats, diff_stats)
     
     # Apply Hysteresis State Machine to the smoothed scores
     verdicts = []
     current_state = 0 # 0: Mantener, 1: Compra, 2: Venta
     
-    for score in scores:
+    for score in scores.tolist():
         if current_state == 1: # Previamente en COMPRA
             if score < 50: # Salida de Compra (buffer de 15ptos)
                 if score <= 30: current_state = 2 # Salto directo a Venta
@@ -311,3 +658,42 @@ def get_historical_verdicts(data, reg_ret, reg_diff, ret_stats, diff_stats):
         verdicts.append(current_state)
         
     return verdicts, scores
+
+def analyze_regimes(data: pd.DataFrame, ticker: str | None = None, verdict_only: bool = False,
+                    regimes: tuple | None = None) -> dict:
+    """
+    Every pure-NumPy stage of an analysis: both HMMs (unless `regimes` carries the
+    results of a batched fit) and the hysteresis verdicts. Runs in-process or in a
+    regime worker (see regime_pool); the forecast is left to the caller.
+    verdict_only keeps only the last bar's posteriors and hysteresis state (verdicts is empty).
+    """
+    if regimes is not None:
+        (regimes_ret, probs_ret, final_ret_stats), (regimes_diff, probs_diff, final_diff_stats) = regimes
+    else:
+        full_posteriors = not verdict_only
+        regimes_ret, probs_ret, final_ret_stats = train_hmm_returns(data, ticker, full_posteriors)
+        regimes_diff, probs_diff, final_diff_stats = train_hmm_diff(data, ticker, full_posteriors)
+
+    if verdict_only:
+        verdicts = []
+        stable_state, smoothed_score = latest_verdict(
+            data, regimes_ret, regimes_diff, final_ret_stats, final_diff_stats
+        )
+    else:
+        verdicts, scores = get_historical_verdicts(
+            data, regimes_ret, regimes_diff, final_ret_stats, final_diff_stats
+        )
+        stable_state = int(verdicts[-1]) if len(verdicts) > 0 else 0
+        smoothed_score = float(scores[-1]) if len(scores) > 0 else 50.0
+
+    return {
+        "regimes_ret": regimes_ret,
+        "probs_ret": probs_ret,
+        "final_ret_stats": final_ret_stats,
+        "regimes_diff": regimes_diff,
+        "probs_diff": probs_diff,
+        "final_diff_stats": final_diff_stats,
+        "stable_state": stable_state,
+        "smoothed_score": smoothed_score,
+        "verdicts": verdicts,
+    }
@@ -1,77 +1,422 @@
+import os
+import json
+import time
+import queue
+import atexit
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, CancelledError
 import numpy as np
-import torch
-from chronos import ChronosPipeline
+from ..core import cancellation
+
+# torch / chronos are imported lazily by warm_up(): importing this module must stay cheap
+# so the API can answer /health while the model loads in the background.
 
 logger = logging.getLogger(__name__)
 
+# --- MICRO-BATCHING CONFIGURATION ---
+# Up to CHRONOS_BATCH_MAX queued forecasts (collected for at most CHRONOS_BATCH_WAIT_MS)
+# share one pipeline.predict call. 1 disables batching: every forecast runs alone, which
+# is the only mode bit-identical to the historical unbatched output, because ancestral
+# sampling draws from one global RNG stream shared by all rows of a batch.
+CHRONOS_BATCH_MAX = int(os.getenv("CHRONOS_BATCH_MAX", "1"))
+CHRONOS_BATCH_WAIT_MS = float(os.getenv("CHRONOS_BATCH_WAIT_MS", "20"))
+CHRONOS_SEED = 42
+# Number of out-of-process Chronos workers. 0 runs the model inside the API process.
+CHRONOS_WORKERS = int(os.getenv("CHRONOS_WORKERS", "1"))
+CHRONOS_MODEL_ID = "amazon/chronos-t5-tiny"
+# Inference precision: "float32" (reference), "bfloat16" (CPUs with native bf16 support)
+# or "int8" (dynamic quantization of the Linear layers). See chronos_bench to choose one.
+CHRONOS_PRECISION = os.getenv("CHRONOS_PRECISION", "float32").lower()
+PRECISIONS = ("float32", "bfloat16", "int8")
+
+# --- FORECAST CACHE CONFIGURATION ---
+FORECAST_CACHE_SIZE = int(os.getenv("CHRONOS_CACHE_SIZE", "2048"))
+FORECAST_CACHE_DIR = os.getenv("CHRONOS_CACHE_DIR")  # Persistent tier is off unless configured
+
+
+def bf16_supported() -> bool:
+    """True when the CPU runs bfloat16 matmuls natively (otherwise bf16 is emulated and slow)"""
+    import torch
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+
+def load_pipeline(precision: str = "float32"):
+    """
+    Loads the Chronos pipeline on CPU in the requested precision.
+    Unsupported or unknown precisions fall back to float32 with a warning.
+    Returns (pipeline, effective_precision).
+    """
+    import torch
+    from chronos import ChronosPipeline
+
+    if precision not in PRECISIONS:
+        logger.warning(f"Unknown CHRONOS_PRECISION '{precision}', using float32")
+        precision = "float32"
+    if precision == "bfloat16" and not bf16_supported():
+        logger.warning("CPU lacks native bfloat16 support, using float32")
+        precision = "float32"
+
+    # Load the smallest Chronos model to conserve memory in Cloud Run
+    pipeline = ChronosPipeline.from_pretrained(
+        CHRONOS_MODEL_ID,
+        device_map="cpu",
+        torch_dtype=torch.bfloat16 if precision == "bfloat16" else torch.float32,
+    )
+    if precision == "int8":
+        pipeline.model = torch.quantization.quantize_dynamic(pipeline.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipeline, precision
+
+
+def _clean_context(data_series) -> np.ndarray:
+    # FORCE FINITE: extreme safety for tickers like EOAN.DE
+    return np.nan_to_num(np.asarray(data_series).astype(np.float32), nan=0.0, posinf=0.0, neginf=0.0)
+
+
+class ForecastCache:
+    """
+    Content-addressed forecast cache: the key hashes the exact (cleaned) context
+    window together with model id, horizon and seed, so an unchanged series never
+    reaches the model twice. In-memory LRU with an optional JSON-file backing store.
+    """
+    def __init__(self, max_entries: int = FORECAST_CACHE_SIZE, cache_dir: str | None = FORECAST_CACHE_DIR):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"Chronos forecast cache disk tier disabled ({self.cache_dir}): {e}")
+                self.cache_dir = None
+
+    @staticmethod
+    def key(context: np.ndarray, model_id: str, prediction_length: int, seed: int) -> str:
+        h = hashlib.sha256(context.tobytes())
+        h.update(f"|{context.shape}|{model_id}|{prediction_length}|{seed}".encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.cache_dir:
+            try:
+                with open(os.path.join(self.cache_dir, f"{key}.json"), "r", encoding="utf-8") as f:
+                    value = json.load(f)
+                self._remember(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Corrupt Chronos cache entry {key}: {e}")
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: dict):
+        self._remember(key, value)
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, f"{key}.json")
+            try:
+                with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                    json.dump(value, f)
+                os.replace(f"{path}.tmp", path)
+            except Exception as e:
+                logger.warning(f"Could not persist Chronos forecast {key}: {e}")
+
+    def _remember(self, key: str, value: dict):
+        with self._lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._lru),
+            "max_entries": self.max_entries,
+            "persistent": bool(self.cache_dir),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class _ChronosBatcher:
+    """
+    Collects concurrent forecast requests on a queue and runs them as batched
+    pipeline.predict calls from a single worker thread, then scatters the results
+    back to each caller's Future. Requests whose caller has gone (cancellation
+    token set) are dropped from the batch before inference.
+    """
+    def __init__(self, service, max_batch: int, wait_ms: float):
+        self.service = service
+        self.max_batch = max_batch
+        self.wait = wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.skipped = 0
+
+    def submit(self, context: np.ndarray, prediction_length: int, cancelled=None) -> Future:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="chronos-batcher", daemon=True)
+                self._thread.start()
+        fut = Future()
+        self._queue.put((context, prediction_length, fut, cancelled))
+        return fut
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Only requests with the same horizon can share a call
+            by_length = {}
+            for context, prediction_length, fut, cancelled in batch:
+                if cancelled is not None and cancelled.is_set():
+                    self.skipped += 1
+                    fut.cancel()
+                    continue
+                by_length.setdefault(prediction_length, []).append((context, prediction_length, fut))
+            for prediction_length, items in by_length.items():
+                self.batches += 1
+                self.items += len(items)
+                try:
+                    results = self.service._predict_batch([c for c, _, _ in items], prediction_length)
+                except Exception as e:
+                    logger.error(f"Chronos batch of {len(items)} failed: {e}")
+                    results = [None] * len(items)
+                for (_, _, fut), res in zip(items, results):
+                    fut.set_result(res)
+
+
 class ChronosService:
-    def __init__(self):
-        # Limit torch threads to prevent deadlocks and contention on Windows/Cloud Run
-        torch.set_num_threads(1)
-        if torch.get_num_interop_threads() > 1:
-            torch.set_num_interop_threads(1)
-        
+    def __init__(self, max_batch: int = CHRONOS_BATCH_MAX, batch_wait_ms: float = CHRONOS_BATCH_WAIT_MS,
+                 workers: int | None = None):
         self.pipeline = None
         self.enabled = False
-        self._load_model()
+        # Lifecycle: cold -> loading -> ready | failed (see warm_up); ready <-> degraded while
+        # no worker process is alive (the pool supervisor restarts them)
+        self.state = "cold"
+        self.load_seconds = None
+        self._state_lock = threading.Lock()
+        # Serializes direct (unbatched) access to the pipeline
+        self._lock = threading.Lock()
+        self._batcher = _ChronosBatcher(self, max_batch, batch_wait_ms) if max_batch > 1 else None
+        self.cache = ForecastCache()
+        # Out-of-process workers isolate native crashes (SIGSEGV) from the API server
+        if workers is None:
+            from .chronos_pool import in_worker_process
+            workers = 0 if in_worker_process() else CHRONOS_WORKERS
+        self.workers = workers
+        self.pool = None
+        self.precision = CHRONOS_PRECISION
+        # Scripts load the model on first predict; the app turns this off and loads it only in
+        # its background warm-up, so a request never holds the inference lane for a model load
+        self.load_on_demand = True
+
+    @property
+    def available(self) -> bool:
+        """False once loading has failed or while every worker is down; a cold service loads lazily on first predict"""
+        return self.state not in ("failed", "degraded")
+
+    @property
+    def isolated(self) -> bool:
+        """True when inference runs in supervised worker processes"""
+        return self.pool is not None
+
+    def mark_loading(self):
+        """Announces a background warm-up before it starts: until it ends, predict returns None"""
+        with self._state_lock:
+            if self.state == "cold":
+                self.state = "loading"
+
+    def warm_up(self) -> bool:
+        """
+        Loads the model (or starts the worker pool) once. Safe to call from several
+        threads; later callers wait for the first load. Returns True when Chronos is ready.
+        """
+        with self._state_lock:
+            if self.state in ("ready", "failed", "degraded"):
+                return self.enabled
+            self.state = "loading"
+            start = time.perf_counter()
+            self._load_model()
+            self.load_seconds = round(time.perf_counter() - start, 3)
+            self.state = "ready" if self.enabled else "failed"
+            if self.pool is not None and not self.pool.healthy:
+                self.state = "degraded"   # Every worker died while the others were still loading
+            return self.enabled
 
     def _load_model(self):
+        if self.workers > 0:
+            try:
+                from .chronos_pool import ChronosWorkerPool
+                pool = ChronosWorkerPool(self.workers, max_items=max(1, self._batcher.max_batch if self._batcher else 1))
+                if pool.start():
+                    pool.on_health_change = self._on_pool_health
+                    self.pool = pool
+                    self.enabled = True
+                    atexit.register(pool.shutdown)
+                    logger.info(f"Chronos running in {self.workers} isolated worker process(es)")
+                    return
+                pool.shutdown()
+            except Exception as e:
+                logger.warning(f"Chronos worker pool unavailable ({e}). Loading the model in-process.")
+
         try:
-            # Force thread limit again during model load
+            import torch
+
+            # Limit torch threads to prevent deadlocks and contention on Windows/Cloud Run
             torch.set_num_threads(1)
+            if torch.get_num_interop_threads() > 1:
+                torch.set_num_interop_threads(1)
             
-            # Load the smallest Chronos model to conserve memory in Cloud Run
             device = "cpu" 
-            self.pipeline = ChronosPipeline.from_pretrained(
-                "amazon/chronos-t5-tiny",
-                device_map=device,
-                torch_dtype=torch.float32,
-            )
+            self.pipeline, self.precision = load_pipeline(self.precision)
             self.enabled = True
-            logger.info(f"Chronos (Local LLM) initialized successfully on {device} (threads limited to 1)")
+            logger.info(f"Chronos (Local LLM) initialized successfully on {device} ({self.precision}, threads limited to 1)")
         except Exception as e:
             logger.warning(f"Chronos model failed to load: {e}. High-fidelity fallback disabled.")
             self.enabled = False
 
+    def _on_pool_health(self, healthy: bool):
+        with self._state_lock:
+            if self.state in ("ready", "degraded"):
+                self.state = "ready" if healthy else "degraded"
+
     def predict(self, data_series: np.ndarray, prediction_length: int = 10):
-        if not self.enabled or self.pipeline is None:
+        # Outside the app (scripts, workers) nothing warmed the model up: load it on first use.
+        # While a background warm-up is running, callers get None and use the GBM fallback.
+        if self.state == "cold":
+            if not self.load_on_demand:
+                return None
+            self.warm_up()
+        if not self.enabled or self.state == "degraded" or (self.pipeline is None and self.pool is None):
             return None
+
+        context = _clean_context(data_series)
+        cache_key = ForecastCache.key(context, f"{CHRONOS_MODEL_ID}@{self.precision}", prediction_length, CHRONOS_SEED)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        if cancellation.cancelled():
+            return None   # Nobody waits for this forecast any more
+        if self._batcher is not None:
+            try:
+                result = self._batcher.submit(context, prediction_length, cancellation.work_cancelled.get()).result()
+            except CancelledError:
+                return None
+        else:
+            try:
+                if self.pool is not None:
+                    # Workers are independent processes: no need to serialize callers here
+                    result = self._predict_batch([context], prediction_length)[0]
+                else:
+                    with self._lock:
+                        result = self._predict_batch([context], prediction_length)[0]
+            except Exception as e:
+                logger.error(f"Chronos prediction failed: {e}")
+                return None
+
+        if result is not None:
+            self.cache.put(cache_key, result)
+        return result
+
+    def _predict_batch(self, series_list: list, prediction_length: int) -> list:
+        """
+        Runs a single pipeline.predict call for one or more context windows.
+        A single series is passed as a 1-D tensor exactly like the unbatched path;
+        several series are passed as a list so the pipeline left-pads them.
+        """
+        if self.pool is not None:
+            return self.pool.predict(series_list, prediction_length)
+
+        import torch
+
+        # Prepare context for Chronos (needs a tensor)
+        contexts = [torch.tensor(_clean_context(s)) for s in series_list]
+        context = contexts[0] if len(contexts) == 1 else contexts
         
-        try:
-            # Prepare context for Chronos (needs a tensor)
-            # FORCE FINITE: extreme safety for tickers like EOAN.DE
-            clean_data = np.nan_to_num(data_series.astype(np.float32), nan=0.0, posinf=0.0, neginf=0.0)
-            context = torch.tensor(clean_data)
-            
-            # Generate forecast
-            # IMPORTANT: Ensure no threading conflicts during prediction
-            torch.set_num_threads(1)
-            torch.manual_seed(42) # FORCE ULTIMATE DETERMINISM in ancestral sampling
-            with torch.no_grad():
-                forecast = self.pipeline.predict(context, prediction_length)
-            
-            logger.info(f"CHRONOSDEBUG: Forecast shape: {forecast.shape}, Requested: {prediction_length}")
-            
+        # Generate forecast
+        # IMPORTANT: Ensure no threading conflicts during prediction
+        torch.set_num_threads(1)
+        torch.manual_seed(CHRONOS_SEED) # FORCE ULTIMATE DETERMINISM in ancestral sampling
+        with torch.no_grad():
+            forecast = self.pipeline.predict(context, prediction_length).float()  # bf16 -> fp32 for numpy
+        
+        logger.info(f"CHRONOSDEBUG: Forecast shape: {forecast.shape}, Requested: {prediction_length}")
+        
+        results = []
+        for i in range(len(contexts)):
             # forecast shape is [num_series, prediction_length, num_samples/percentiles]
-            median = forecast[0, :, 1].numpy()
-            low = forecast[0, :, 0].numpy()
-            high = forecast[0, :, 2].numpy()
+            median = forecast[i, :, 1].numpy()
+            low = forecast[i, :, 0].numpy()
+            high = forecast[i, :, 2].numpy()
             
             # Ensure we only return the requested length exactly
             # Some model versions or configurations might return more steps
-            res_prices = [float(p) for p in median][:prediction_length]
-            res_lows = [float(p) for p in low][:prediction_length]
-            res_highs = [float(p) for p in high][:prediction_length]
-            
-            return {
-                "prices": res_prices,
-                "lows": res_lows,
-                "highs": res_highs
-            }
-        except Exception as e:
-            logger.error(f"Chronos prediction failed: {e}")
-            return None
+            results.append({
+                "prices": [float(p) for p in median][:prediction_length],
+                "lows": [float(p) for p in low][:prediction_length],
+                "highs": [float(p) for p in high][:prediction_length]
+            })
+        return results
+
+    def readiness(self) -> dict:
+        return {
+            "state": self.state,
+            "isolated": self.isolated,
+            "precision": self.precision,
+            "load_seconds": self.load_seconds,
+        }
+
+    def pool_stats(self) -> dict:
+        if self.pool is None:
+            return {"isolated": False}
+        return dict(self.pool.stats(), isolated=True)
+
+    def batching_stats(self) -> dict:
+        if self._batcher is None:
+            return {"enabled": False}
+        b = self._batcher
+        return {
+            "enabled": True,
+            "max_batch": b.max_batch,
+            "wait_ms": b.wait * 1000.0,
+            "batches": b.batches,
+            "items": b.items,
+            "avg_batch_size": round(b.items / b.batches, 2) if b.batches else 0.0,
+            "skipped_cancelled": b.skipped,
+        }
 
 # Singleton instance
 chronos_service = ChronosService()
@@ -0,0 +1,112 @@
+"""
+Precision benchmark for Chronos inference.
+
+Compares every precision mode against the float32 baseline on a fixed set of
+synthetic price series and reports latency, model memory footprint and forecast
+deviation, then recommends the fastest mode within tolerance.
+
+Usage: python -m backend.app.services.chronos_bench [--tolerance 0.01] [--runs 3]
+"""
+import io
+import time
+import json
+import argparse
+import logging
+import numpy as np
+
+from .chronos import PRECISIONS, CHRONOS_SEED, load_pipeline, _clean_context
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_LENGTH = 30      # Same window the API forecasts from
+PREDICTION_LENGTH = 10
+
+
+def synthetic_series(n_series: int = 12, length: int = CONTEXT_LENGTH, seed: int = 7) -> list:
+    """Deterministic GBM-like price paths mixing calm, trending and volatile regimes"""
+    rng = np.random.default_rng(seed)
+    series = []
+    for i in range(n_series):
+        mu = (-0.002, 0.0, 0.002)[i % 3]
+        sigma = (0.005, 0.015, 0.04)[(i // 3) % 3]
+        returns = rng.normal(mu, sigma, length)
+        series.append(100.0 * np.exp(np.cumsum(returns)))
+    return series
+
+
+def model_footprint_bytes(pipeline) -> int:
+    """Serialized size of the model weights (covers packed int8 parameters too)"""
+    import torch
+    buf = io.BytesIO()
+    torch.save(pipeline.model.state_dict(), buf)
+    return buf.tell()
+
+
+def _forecast_medians(pipeline, series: list) -> tuple[np.ndarray, list]:
+    """Forecasts each series alone (as the API does) and returns (medians, latencies)"""
+    import torch
+    medians, latencies = [], []
+    for s in series:
+        context = torch.tensor(_clean_context(s))
+        torch.manual_seed(CHRONOS_SEED)
+        start = time.perf_counter()
+        with torch.no_grad():
+            forecast = pipeline.predict(context, PREDICTION_LENGTH).float()
+        latencies.append(time.perf_counter() - start)
+        medians.append(forecast[0, :, 1].numpy()[:PREDICTION_LENGTH])
+    return np.array(medians), latencies
+
+
+def run_benchmark(precisions=PRECISIONS, runs: int = 3, tolerance: float = 0.01) -> dict:
+    """
+    Returns a report per precision: median latency per forecast (ms), model footprint
+    (MB) and mean/max relative deviation of the median forecast vs float32.
+    `recommended` is the fastest precision whose mean deviation stays within tolerance.
+    """
+    import torch
+    torch.set_num_threads(1)
+    series = synthetic_series()
+    report = {}
+    baseline = None
+
+    for precision in ("float32",) + tuple(p for p in precisions if p != "float32"):
+        pipeline, effective = load_pipeline(precision)
+        if effective != precision:
+            report[precision] = {"skipped": f"not supported here (loaded as {effective})"}
+            continue
+        _forecast_medians(pipeline, series[:1])  # warm-up run (lazy init, allocator)
+        all_latencies = []
+        for _ in range(runs):
+            medians, latencies = _forecast_medians(pipeline, series)
+            all_latencies.extend(latencies)
+        if baseline is None:
+            baseline = medians
+        rel = np.abs(medians - baseline) / np.abs(baseline)
+        report[precision] = {
+            "latency_ms": round(float(np.median(all_latencies)) * 1000, 2),
+            "footprint_mb": round(model_footprint_bytes(pipeline) / 2**20, 2),
+            "mean_rel_deviation": round(float(rel.mean()), 6),
+            "max_rel_deviation": round(float(rel.max()), 6),
+        }
+        del pipeline
+
+    eligible = [
+        (r["latency_ms"], p) for p, r in report.items()
+        if "latency_ms" in r and r["mean_rel_deviation"] <= tolerance
+    ]
+    return {
+        "tolerance": tolerance,
+        "series": len(series),
+        "runs": runs,
+        "results": report,
+        "recommended": min(eligible)[1] if eligible else "float32",
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Chronos precision modes")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="Max mean relative deviation vs float32")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(json.dumps(run_benchmark(runs=args.runs, tolerance=args.tolerance), indent=2))
@@ -0,0 +1,334 @@
+import os
+import time
+import queue
+import logging
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- WORKER POOL CONFIGURATION ---
+WORKER_TIMEOUT = float(os.getenv("CHRONOS_WORKER_TIMEOUT", "60"))        # Seconds before a forecast counts as hung
+WORKER_START_TIMEOUT = float(os.getenv("CHRONOS_WORKER_START_TIMEOUT", "180"))  # Model load budget per worker
+RESTART_BACKOFF = float(os.getenv("CHRONOS_RESTART_BACKOFF", "5"))       # First retry delay (s) for a dead worker
+RESTART_BACKOFF_MAX = float(os.getenv("CHRONOS_RESTART_BACKOFF_MAX", "300"))  # Retry delay cap, doubled per failure
+CONTEXT_LIMIT = 512   # chronos-t5 only reads the last 512 points, so longer contexts are trimmed for free
+MAX_HORIZON = 64      # Largest prediction_length the output block can hold
+WORKER_NAME_PREFIX = "chronos-worker"
+
+
+def in_worker_process() -> bool:
+    """True inside a pool worker (the name is set before any module is imported on spawn)"""
+    return mp.current_process().name.startswith(WORKER_NAME_PREFIX)
+
+
+def _worker_main(conn, in_name: str, out_name: str, max_items: int):
+    """
+    Worker process entry point: loads Chronos once (in-process, see in_worker_process) and serves
+    forecasts. Contexts are read from / quantiles written to shared memory blocks
+    owned by the parent; the pipe only carries small control messages.
+    """
+    shm_in = shm_out = None
+    try:
+        shm_in = shared_memory.SharedMemory(name=in_name)
+        shm_out = shared_memory.SharedMemory(name=out_name)
+        ctx_buf = np.ndarray((max_items * CONTEXT_LIMIT,), dtype=np.float32, buffer=shm_in.buf)
+        out_buf = np.ndarray((max_items, 3, MAX_HORIZON), dtype=np.float32, buffer=shm_out.buf)
+
+        from .chronos import chronos_service as local_service
+        local_service.warm_up()
+        conn.send(("ready", local_service.enabled, None))
+        if not local_service.enabled:
+            return
+
+        while True:
+            msg = conn.recv()
+            if msg[0] == "stop":
+                return
+            _, lengths, prediction_length = msg
+            try:
+                contexts, offset = [], 0
+                for n in lengths:
+                    contexts.append(ctx_buf[offset:offset + n].copy())
+                    offset += n
+                results = local_service._predict_batch(contexts, prediction_length)
+                for i, res in enumerate(results):
+                    out_buf[i, 0, :prediction_length] = res["lows"]
+                    out_buf[i, 1, :prediction_length] = res["prices"]
+                    out_buf[i, 2, :prediction_length] = res["highs"]
+                conn.send(("ok", len(results), None))
+            except Exception as e:
+                conn.send(("err", 0, repr(e)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        for shm in (shm_in, shm_out):
+            if shm is not None:
+                shm.close()
+
+
+class _Worker:
+    """Parent-side handle: process, control pipe and its two shared memory blocks."""
+    def __init__(self, ctx, index: int, max_items: int):
+        self.index = index
+        self.max_items = max_items
+        self.shm_in = shared_memory.SharedMemory(create=True, size=max_items * CONTEXT_LIMIT * 4)
+        self.shm_out = shared_memory.SharedMemory(create=True, size=max_items * 3 * MAX_HORIZON * 4)
+        self.ctx_buf = np.ndarray((max_items * CONTEXT_LIMIT,), dtype=np.float32, buffer=self.shm_in.buf)
+        self.out_buf = np.ndarray((max_items, 3, MAX_HORIZON), dtype=np.float32, buffer=self.shm_out.buf)
+        self._ctx = ctx
+        self.process = None
+        self.conn = None
+        self.backoff = RESTART_BACKOFF
+        self.retry_at = 0.0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def start(self) -> bool:
+        parent_conn, child_conn = self._ctx.Pipe()
+        self.process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.shm_in.name, self.shm_out.name, self.max_items),
+            name=f"{WORKER_NAME_PREFIX}-{self.index}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        if not self.conn.poll(WORKER_START_TIMEOUT):
+            logger.error(f"Chronos worker {self.index} did not become ready in {WORKER_START_TIMEOUT}s")
+            self.kill()
+            return False
+        try:
+            _, ok, _ = self.conn.recv()
+        except EOFError:
+            ok = False
+        return bool(ok)
+
+    def kill(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+        if self.conn is not None:
+            self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def stop(self):
+        try:
+            if self.conn is not None:
+                self.conn.send(("stop",))
+            if self.process is not None:
+                self.process.join(timeout=5)
+        except Exception:
+            pass
+        self.kill()
+        for shm in (self.shm_in, self.shm_out):
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class ChronosWorkerPool:
+    """
+    Supervised pool of Chronos worker processes. A native crash or hang inside a
+    worker costs only the forecasts in flight on it (callers get None and fall back
+    to GBM). Dead workers leave the rotation and a supervisor thread restarts them
+    with exponential backoff, off the request path. `on_health_change(healthy)`
+    fires when the last live worker dies and when the first one comes back.
+    """
+    def __init__(self, num_workers: int, max_items: int = 1):
+        self.num_workers = num_workers
+        self.max_items = max(1, max_items)
+        # spawn: never fork a process that already holds torch/BLAS thread pools
+        self._ctx = mp.get_context("spawn")
+        self._workers = []
+        self._idle = queue.Queue()
+        self._dead: list[_Worker] = []
+        self._healthy = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._supervisor = None
+        self.on_health_change = None
+        self.crashes = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.restart_failures = 0
+        self.errors = 0
+
+    def start(self) -> bool:
+        """Starts all workers; True when at least one loaded the model (the rest are retried in background)."""
+        workers = [_Worker(self._ctx, i, self.max_items) for i in range(self.num_workers)]
+        for worker in workers:
+            if worker.start():
+                self._healthy += 1
+                self._idle.put(worker)
+            else:
+                worker.kill()
+                self._dead.append(worker)
+        logger.info(f"Chronos worker pool: {self._healthy}/{self.num_workers} workers ready")
+        if self._healthy == 0:
+            for worker in workers:
+                worker.stop()
+            return False
+        self._workers = workers
+        self._supervisor = threading.Thread(target=self._supervise, name="chronos-supervisor", daemon=True)
+        self._supervisor.start()
+        self._wake.set()
+        return True
+
+    @property
+    def healthy(self) -> bool:
+        return self._healthy > 0
+
+    def _take_worker(self) -> _Worker | None:
+        """An idle live worker; None as soon as no live worker is left"""
+        while self._healthy > 0:
+            try:
+                worker = self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if worker.alive:
+                return worker
+            self.crashes += 1
+            logger.error(f"Chronos worker {worker.index} found dead. Handing it to the supervisor.")
+            self._retire(worker)
+        return None
+
+    def _retire(self, worker: _Worker):
+        """Takes a dead or hung worker out of rotation; the supervisor restarts it"""
+        worker.kill()
+        with self._lock:
+            self._healthy -= 1
+            worker.backoff = RESTART_BACKOFF
+            worker.retry_at = time.monotonic()
+            self._dead.append(worker)
+            became_unhealthy = self._healthy == 0
+        self._wake.set()
+        if became_unhealthy:
+            logger.error("Chronos worker pool: no live workers left, forecasts degrade to GBM")
+            self._notify(False)
+
+    def _notify(self, healthy: bool):
+        if self.on_health_change is not None:
+            try:
+                self.on_health_change(healthy)
+            except Exception as e:
+                logger.warning(f"Chronos pool health callback failed: {e}")
+
+    def _supervise(self):
+        """Restarts dead workers, each on its own doubling backoff (model loads block only this thread)"""
+        while not self._stopping:
+            self._wake.clear()
+            with self._lock:
+                now = time.monotonic()
+                due = [w for w in self._dead if w.retry_at <= now]
+                pending = [w.retry_at - now for w in self._dead if w.retry_at > now]
+            if not due:
+                self._wake.wait(timeout=min(pending) if pending else None)
+                continue
+            for worker in due:
+                if self._stopping:
+                    return
+                self.restarts += 1
+                if worker.start():
+                    logger.info(f"Chronos worker {worker.index} restarted")
+                    with self._lock:
+                        self._dead.remove(worker)
+                        self._healthy += 1
+                        recovered = self._healthy == 1
+                    self._idle.put(worker)
+                    if recovered:
+                        self._notify(True)
+                else:
+                    worker.kill()
+                    self.restart_failures += 1
+                    worker.retry_at = time.monotonic() + worker.backoff
+                    logger.error(f"Chronos worker {worker.index} could not be restarted; retrying in {worker.backoff:.0f}s")
+                    worker.backoff = min(worker.backoff * 2, RESTART_BACKOFF_MAX)
+
+    def predict(self, contexts: list, prediction_length: int) -> list:
+        """Forecasts a batch on one idle worker. Returns one result dict (or None) per context."""
+        if prediction_length > MAX_HORIZON or len(contexts) > self.max_items:
+            raise ValueError(f"Request exceeds worker capacity ({len(contexts)} series, horizon {prediction_length})")
+
+        worker = self._take_worker()
+        if worker is None:
+            # No live worker: degrade to the GBM fallback while the supervisor restarts them
+            return [None] * len(contexts)
+        retired = False
+        try:
+            lengths, offset = [], 0
+            for c in contexts:
+                c = np.asarray(c, dtype=np.float32)[-CONTEXT_LIMIT:]
+                worker.ctx_buf[offset:offset + len(c)] = c
+                lengths.append(len(c))
+                offset += len(c)
+            worker.conn.send(("predict", lengths, prediction_length))
+
+            if not worker.conn.poll(WORKER_TIMEOUT):
+                self.timeouts += 1
+                logger.error(f"Chronos worker {worker.index} hung for {WORKER_TIMEOUT}s. Restarting it.")
+                self._retire(worker)
+                retired = True
+                return [None] * len(contexts)
+
+            status, count, err = worker.conn.recv()
+            if status != "ok":
+                self.errors += 1
+                logger.error(f"Chronos worker {worker.index} failed: {err}")
+                return [None] * len(contexts)
+
+            out = worker.out_buf[:count, :, :prediction_length].copy()
+            return [
+                {
+                    "prices": [float(p) for p in out[i, 1]],
+                    "lows": [float(p) for p in out[i, 0]],
+                    "highs": [float(p) for p in out[i, 2]],
+                }
+                for i in range(count)
+            ]
+        except (EOFError, BrokenPipeError, ConnectionResetError, OSError) as e:
+            self.crashes += 1
+            code = None
+            if worker.process is not None:
+                worker.process.join(timeout=1)
+                code = worker.process.exitcode
+            logger.error(f"Chronos worker {worker.index} died (exit code {code}): {e!r}. Restarting it.")
+            self._retire(worker)
+            retired = True
+            return [None] * len(contexts)
+        finally:
+            if not retired:
+                self._idle.put(worker)
+
+    def shutdown(self):
+        self._stopping = True
+        self._wake.set()
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+
+    def stats(self) -> dict:
+        alive = sum(1 for w in self._workers if w.alive)
+        with self._lock:
+            retrying = [{"worker": w.index, "retry_in_s": round(max(0.0, w.retry_at - time.monotonic()), 1)}
+                        for w in self._dead]
+        return {
+            "workers": self.num_workers,
+            "alive": alive,
+            "healthy": self.healthy,
+            "crashes": self.crashes,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "restarts": self.restarts,
+            "restart_failures": self.restart_failures,
+            "restarting": retrying,
+        }
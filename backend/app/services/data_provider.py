@@ -1,13 +1,26 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import logging
+from .ohlcv_store import ohlcv_store, normalize_bars, needs_full_refresh, merge_bars, OVERLAP_DAYS
+from ..core import deadline
 
 logger = logging.getLogger(__name__)
 
+FETCH_TIMEOUT = 25.0          # Seconds before an upstream download is abandoned (capped by the request deadline)
+STORE_START_SLACK_DAYS = 7    # Stored history may start a few (non-trading) days after the requested start
+BATCH_SIZE = 50               # Tickers per grouped yfinance download
+BATCH_FETCH_TIMEOUT = 60.0    # Seconds before a grouped download is abandoned
+
+# Exchange suffix -> trading currency, so bulk fetches skip the per-ticker fast_info round trip
+SUFFIX_CURRENCIES = {
+    "": "USD", "MC": "EUR", "DE": "EUR", "F": "EUR", "PA": "EUR", "AS": "EUR", "MI": "EUR",
+    "BR": "EUR", "LS": "EUR", "HE": "EUR", "VI": "EUR", "IR": "EUR",
+    "L": "GBp", "SW": "CHF", "TO": "CAD", "T": "JPY", "HK": "HKD", "AX": "AUD",
+}
+
 class DataProvider:
     def __init__(self):
         self.executor = ThreadPoolExecutor(max_workers=5)
@@ -15,90 +28,299 @@ class DataProvider:
     async def fetch_ticker_data(self, ticker: str, days: int = 365) -> tuple[pd.DataFrame, str]:
         """
         Fetch data asynchronously using a thread pool to avoid blocking the main event loop.
+        Reads the local OHLCV store first and only downloads the missing tail.
         Returns: (DataFrame, currency_string)
         """
-        loop = asyncio.get_event_loop()
         end_date = datetime.now() + timedelta(days=1)
         start_date = datetime.now() - timedelta(days=days)
         
         try:
-            # Run blocking yfinance call in a separate thread
-            data, currency = await loop.run_in_executor(
-                self.executor,
-                self._fetch_sync,
-                ticker,
-                start_date,
-                end_date
-            )
+            data, currency = await self._load_bars(ticker, start_date, end_date)
             
             if data.empty:
                 logger.warning(f"No data found for {ticker}")
                 return pd.DataFrame(), "USD"
 
-            # Process data
-            if isinstance(data.columns, pd.MultiIndex):
-                data.columns = data.columns.get_level_values(0)
-            
-            # 1. Clean Index: ensure it is a simple datetime index without TZs if possible
-            if data.index.tz is not None:
-                data.index = data.index.tz_localize(None)
-            
-            # 2. Basic cleaning: drop rows with all NaNs or empty
-            data = data.dropna(how='all')
-            if data.empty: return pd.DataFrame(), "USD"
-            
-            # 3. Handle Prices: ensure 'Close' exists and is numeric
-            price_col = 'Close'
-            if price_col not in data.columns:
-                # Try to find it case-insensitive
-                matches = [c for c in data.columns if c.lower() == 'close']
-                if matches: price_col = matches[0]
-                else: return pd.DataFrame(), "USD"
-            
-            data[price_col] = pd.to_numeric(data[price_col], errors='coerce')
-            data = data[data[price_col] > 0.01].copy() # Ignore pennies/zero prices
-            
-            # 4. Calculate technical columns
-            data['Returns'] = np.log(data[price_col] / data[price_col].shift(1))
-            data['Diff_Returns'] = data['Returns'].diff()
-            
-            # 5. Vol_SMA and RVOL
-            data['Vol_SMA'] = data['Volume'].rolling(window=20).mean()
-            # Safe RVOL calculation
-            data['RVOL'] = (data['Volume'] / data['Vol_SMA'])
-            
-            # 6. EMA 10
-            data['EMA_10'] = data[price_col].ewm(span=10, adjust=False).mean()
-            
-            # 7. FINAL ULTRA-CLEANUP: Replace all non-finite (Inf, NaN) with a safe default or drop
-            # We target specific numeric columns that models use
-            numeric_cols = ['Close', 'Returns', 'Diff_Returns', 'Volume', 'RVOL', 'EMA_10']
-            for col in numeric_cols:
-                if col in data.columns:
-                    data[col] = data[col].replace([np.inf, -np.inf], np.nan)
-            
-            data = data.dropna(subset=['Returns', 'Diff_Returns', 'RVOL']).copy()
-            
-            # Fill remaining with neutral values
-            if 'RVOL' in data.columns: data['RVOL'] = data['RVOL'].fillna(1.0)
-            
-            logger.info(f"DATADEBUG: {ticker} final shape: {data.shape}")
-            return data, currency
+            data = data[data.index >= pd.Timestamp(start_date).normalize()]
+            return self._prepare_frame(data, ticker), currency
             
         except Exception as e:
             logger.error(f"Error fetching data for {ticker}: {e}")
             raise
 
-    def _fetch_sync(self, ticker, start, end):
+    async def fetch_many(self, tickers: list[str], days: int = 365) -> dict[str, tuple[pd.DataFrame, str]]:
+        """
+        Batched counterpart of fetch_ticker_data for portfolios and index sweeps.
+        Tickers are downloaded together in groups of BATCH_SIZE (tail-only for stored
+        tickers, full history for the rest) and split into per-ticker frames.
+        Tickers that could not be resolved are left out of the result so callers can
+        fall back to fetch_ticker_data. With too little of the request deadline left,
+        stored tickers are served from the store without downloading.
+        Returns: {ticker: (DataFrame, currency_string)}
+        """
+        loop = asyncio.get_event_loop()
+        end_date = datetime.now() + timedelta(days=1)
+        start_date = datetime.now() - timedelta(days=days)
+        tickers = list(dict.fromkeys(tickers))
+
+        stored = await loop.run_in_executor(
+            self.executor, lambda: {t: ohlcv_store.load(t) for t in tickers}
+        )
+        bars = {}
+        full, tails = [], {}
+        to_download = tickers
+        if any(not frame.empty for frame, _ in stored.values()) and not deadline.allows(deadline.FETCH, deadline.FETCH_MIN):
+            kept = [t for t in tickers if not stored[t][0].empty]
+            currencies = await self._currencies(kept, stored)
+            for t in kept:
+                bars[t] = (stored[t][0], currencies[t])
+            to_download = []
+        for t in to_download:
+            frame, meta = stored[t]
+            if self._store_covers(frame, meta, start_date):
+                tail_start = (frame.index[-1] - timedelta(days=OVERLAP_DAYS)).normalize()
+                tails.setdefault(tail_start, []).append(t)
+            else:
+                full.append(t)
+
+        # 1. Tail deltas, grouped by the date they start from (usually a single group)
+        for tail_start, group in tails.items():
+            frames = await self._download_batches(group, tail_start, end_date)
+            currencies = await self._currencies(group, stored)
+            for t in group:
+                frame, meta = stored[t]
+                currency = currencies[t]
+                delta = frames.get(t)
+                if delta is None or delta.empty:
+                    bars[t] = (frame, currency)
+                elif needs_full_refresh(frame, delta):
+                    logger.info(f"OHLCV store: adjustment detected for {t}, refetching full history")
+                    full.append(t)
+                else:
+                    merged = merge_bars(frame, delta)
+                    await loop.run_in_executor(
+                        self.executor, ohlcv_store.save, t, merged, dict(meta, currency=currency)
+                    )
+                    bars[t] = (merged, currency)
+
+        # 2. Full histories for new, under-covered or re-adjusted tickers
+        if full:
+            frames = await self._download_batches(full, start_date, end_date)
+            currencies = await self._currencies([t for t in full if t in frames], stored)
+            for t in full:
+                frame, meta = stored[t]
+                data = frames.get(t)
+                if data is not None and not data.empty:
+                    currency = currencies[t]
+                    await loop.run_in_executor(
+                        self.executor, ohlcv_store.save, t, data,
+                        {"currency": currency, "requested_start": start_date.isoformat()}
+                    )
+                    bars[t] = (data, currency)
+                elif not frame.empty:
+                    logger.warning(f"Bulk fetch missed {t}. Serving {len(frame)} stored bars.")
+                    bars[t] = (frame, meta.get("currency", "USD"))
+
+        results = {}
+        for t, (data, currency) in bars.items():
+            data = data[data.index >= pd.Timestamp(start_date).normalize()]
+            if data.empty:
+                continue
+            prepared = self._prepare_frame(data, t)
+            if not prepared.empty:
+                results[t] = (prepared, currency)
+        logger.info(f"Bulk fetch resolved {len(results)}/{len(tickers)} tickers")
+        return results
+
+    async def _download_batches(self, tickers: list[str], start, end) -> dict[str, pd.DataFrame]:
+        """Downloads tickers in groups of BATCH_SIZE. A failed group only loses its own tickers."""
+        loop = asyncio.get_event_loop()
+        frames = {}
+        for i in range(0, len(tickers), BATCH_SIZE):
+            chunk = tickers[i:i + BATCH_SIZE]
+            try:
+                frames.update(await asyncio.wait_for(
+                    loop.run_in_executor(self.executor, self._fetch_batch_sync, chunk, start, end),
+                    timeout=deadline.timeout(BATCH_FETCH_TIMEOUT)
+                ))
+            except Exception as e:
+                logger.warning(f"Grouped download of {len(chunk)} tickers failed: {e!r}")
+        return frames
+
+    def _store_covers(self, stored: pd.DataFrame, meta: dict, start_date: datetime) -> bool:
+        """True when the stored bars reach back far enough to only need a tail delta"""
+        return (
+            not stored.empty
+            and "requested_start" in meta
+            and datetime.fromisoformat(meta["requested_start"]) <= start_date + timedelta(days=STORE_START_SLACK_DAYS)
+        )
+
+    async def _currencies(self, tickers: list[str], stored: dict) -> dict[str, str]:
+        """
+        Currency per ticker: the stored one, else from the exchange suffix. Unknown
+        suffixes pay a fast_info network lookup, so those run in the executor.
+        """
+        currencies, lookups = {}, []
+        for t in tickers:
+            currency = stored[t][1].get("currency") or SUFFIX_CURRENCIES.get(self._suffix(t))
+            if currency:
+                currencies[t] = currency
+            else:
+                lookups.append(t)
+        if lookups:
+            loop = asyncio.get_event_loop()
+            currencies.update(await loop.run_in_executor(
+                self.executor, lambda: {t: self._currency_sync(t) for t in lookups}
+            ))
+        return currencies
+
+    @staticmethod
+    def _suffix(ticker: str) -> str:
+        return ticker.rsplit(".", 1)[1] if "." in ticker else ""
+
+    def _currency_sync(self, ticker: str) -> str:
+        """Internal synchronous fast_info currency lookup"""
+        import yfinance as yf
+        try:
+            return yf.Ticker(ticker).fast_info.get('currency', 'USD')
+        except Exception:
+            return 'USD'
+
+    async def _load_bars(self, ticker: str, start_date: datetime, end_date: datetime) -> tuple[pd.DataFrame, str]:
+        """
+        Incremental fetch against the OHLCV store:
+        - nothing stored (or not enough history) -> full download
+        - stored history -> download only the tail (plus a small overlap)
+        - overlap mismatch / new split or dividend -> stored history is stale, full download
+        - upstream failure or timeout -> serve the stored bars as they are
+        - request deadline nearly spent -> serve the stored bars without downloading
+        Download timeouts are capped by what is left of the request deadline.
+        """
+        loop = asyncio.get_event_loop()
+        stored, meta = await loop.run_in_executor(self.executor, ohlcv_store.load, ticker)
+        if not stored.empty and not deadline.allows(deadline.FETCH, deadline.FETCH_MIN):
+            return stored, meta.get("currency", "USD")
+
+        try:
+            if self._store_covers(stored, meta, start_date):
+                delta_start = stored.index[-1] - timedelta(days=OVERLAP_DAYS)
+                delta, _ = await asyncio.wait_for(
+                    loop.run_in_executor(self.executor, self._fetch_sync, ticker, delta_start, end_date, False),
+                    timeout=deadline.timeout(FETCH_TIMEOUT)
+                )
+                delta = normalize_bars(delta)
+                currency = meta.get("currency", "USD")
+
+                if delta.empty:
+                    return stored, currency
+                if not needs_full_refresh(stored, delta):
+                    merged = merge_bars(stored, delta)
+                    await loop.run_in_executor(
+                        self.executor, ohlcv_store.save, ticker, merged, dict(meta, currency=currency)
+                    )
+                    logger.info(f"OHLCV store: {ticker} updated with {len(delta)} bars")
+                    return merged, currency
+                logger.info(f"OHLCV store: adjustment detected for {ticker}, refetching full history")
+
+            data, currency = await asyncio.wait_for(
+                loop.run_in_executor(self.executor, self._fetch_sync, ticker, start_date, end_date),
+                timeout=deadline.timeout(FETCH_TIMEOUT)
+            )
+            data = normalize_bars(data)
+            if not data.empty:
+                await loop.run_in_executor(
+                    self.executor, ohlcv_store.save, ticker, data,
+                    {"currency": currency, "requested_start": start_date.isoformat()}
+                )
+            return data, currency
+
+        except Exception as e:
+            if stored.empty:
+                raise
+            logger.warning(f"Upstream fetch failed for {ticker} ({e!r}). Serving {len(stored)} stored bars.")
+            return stored, meta.get("currency", "USD")
+
+    def _prepare_frame(self, data: pd.DataFrame, ticker: str) -> pd.DataFrame:
+        """Cleans raw bars and derives the technical columns the models use"""
+        # 1. Basic cleaning: drop rows with all NaNs or empty
+        data = data.dropna(how='all')
+        if data.empty: return pd.DataFrame()
+        
+        # 2. Handle Prices: ensure 'Close' exists and is numeric
+        price_col = 'Close'
+        if price_col not in data.columns:
+            # Try to find it case-insensitive
+            matches = [c for c in data.columns if c.lower() == 'close']
+            if matches: price_col = matches[0]
+            else: return pd.DataFrame()
+        
+        data = data.copy()
+        data[price_col] = pd.to_numeric(data[price_col], errors='coerce')
+        data = data[data[price_col] > 0.01].copy() # Ignore pennies/zero prices
+        
+        # 3. Calculate technical columns
+        data['Returns'] = np.log(data[price_col] / data[price_col].shift(1))
+        data['Diff_Returns'] = data['Returns'].diff()
+        
+        # 4. Vol_SMA and RVOL
+        data['Vol_SMA'] = data['Volume'].rolling(window=20).mean()
+        # Safe RVOL calculation
+        data['RVOL'] = (data['Volume'] / data['Vol_SMA'])
+        
+        # 5. EMA 10
+        data['EMA_10'] = data[price_col].ewm(span=10, adjust=False).mean()
+        
+        # 6. FINAL ULTRA-CLEANUP: Replace all non-finite (Inf, NaN) with a safe default or drop
+        # We target specific numeric columns that models use
+        numeric_cols = ['Close', 'Returns', 'Diff_Returns', 'Volume', 'RVOL', 'EMA_10']
+        for col in numeric_cols:
+            if col in data.columns:
+                data[col] = data[col].replace([np.inf, -np.inf], np.nan)
+        
+        data = data.dropna(subset=['Returns', 'Diff_Returns', 'RVOL']).copy()
+        
+        # Fill remaining with neutral values
+        if 'RVOL' in data.columns: data['RVOL'] = data['RVOL'].fillna(1.0)
+        
+        logger.info(f"DATADEBUG: {ticker} final shape: {data.shape}")
+        return data
+
+    def _fetch_sync(self, ticker, start, end, with_currency=True):
         """Internal synchronous method for yfinance"""
+        import yfinance as yf  # Deferred: heavy import, warmed up at startup (see main.warm_up)
         ticker_obj = yf.Ticker(ticker)
         df = ticker_obj.history(start=start, end=end, auto_adjust=True)
+        if not with_currency:
+            return df, None
         try:
             # Use fast_info to avoid the slow/hanging .info call
             currency = ticker_obj.fast_info.get('currency', 'USD')
-        except:
+        except Exception:
             currency = 'USD'
         return df, currency
 
+    def _fetch_batch_sync(self, tickers, start, end):
+        """Internal synchronous grouped download; returns normalized bars per ticker"""
+        import yfinance as yf
+        df = yf.download(
+            tickers, start=start, end=end, auto_adjust=True, actions=True,
+            group_by='ticker', threads=True, progress=False
+        )
+        frames = {}
+        if df is None or df.empty:
+            return frames
+        if not isinstance(df.columns, pd.MultiIndex):
+            # Older yfinance versions return flat columns for a single ticker
+            if len(tickers) == 1:
+                frames[tickers[0]] = normalize_bars(df.dropna(how='all'))
+            return frames
+        available = set(df.columns.get_level_values(0))
+        for t in tickers:
+            if t in available:
+                frame = normalize_bars(df[t].dropna(how='all'))
+                if not frame.empty:
+                    frames[t] = frame
+        return frames
+
 # Global instance
 data_provider = DataProvider()
@@ -0,0 +1,119 @@
+"""
+Warm-start benchmark for the regime HMMs.
+
+Replays a daily refresh on synthetic price histories: every day the 365-bar window
+moves forward one bar and both HMMs are refitted, once from scratch (random_state=42)
+and once warm-started from the previous day's registry entry. Reports EM iterations,
+fit wall time, warm fits rejected for degraded log-likelihood, how often both fits
+agree on the labelled regime and how stable each path's labels are from one day to
+the next on the bars both windows share.
+
+Usage: python -m backend.app.services.hmm_warm_bench [--days 60] [--tickers 5]
+"""
+import time
+import json
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+
+from . import analysis
+from .model_registry import model_registry
+
+WINDOW = 365
+BENCH_PREFIX = "__warm_bench"
+
+
+def synthetic_history(seed: int, n: int) -> pd.DataFrame:
+    """Log returns with persistent calm/trending/volatile regimes and a few crash days"""
+    rng = np.random.default_rng(seed)
+    regimes = np.zeros(n, dtype=int)
+    for t in range(1, n):
+        regimes[t] = regimes[t - 1] if rng.random() < 0.97 else rng.integers(0, 3)
+    mu = np.array([0.0002, 0.0015, -0.001])[regimes]
+    sigma = np.array([0.008, 0.012, 0.03])[regimes]
+    returns = rng.normal(mu, sigma)
+    returns[rng.integers(0, n, max(n // 100, 1))] -= 0.05
+    data = pd.DataFrame({"Returns": returns}, index=pd.bdate_range("2020-01-01", periods=n))
+    data["Diff_Returns"] = data["Returns"].diff().fillna(0.0)
+    return data
+
+
+def _labels(data: pd.DataFrame, feature: str, model) -> tuple:
+    states = model.predict(analysis._feature_matrix(data, feature))
+    order = analysis._regime_mapping(data, feature, states)
+    lookup = np.empty(len(order), dtype=int)
+    lookup[list(order)] = np.arange(len(order))
+    return lookup[states], order
+
+
+def run_benchmark(days: int = 60, n_tickers: int = 5) -> dict:
+    if analysis.HMM_ENGINE != "native":
+        raise RuntimeError("Warm starts need HMM_ENGINE=native")
+    analysis.HMM_WARM_START = True
+    start_stats = model_registry.stats()
+    cold_iters, warm_iters, cold_time, warm_time = [], [], 0.0, 0.0
+    agreement, last_agreement = [], []
+    stability = {"cold": [], "warm": []}
+
+    for i in range(n_tickers):
+        ticker = f"{BENCH_PREFIX}{i}"
+        model_registry.invalidate(ticker)
+        history = synthetic_history(seed=i, n=WINDOW + days)
+        previous = {}
+        for day in range(days + 1):
+            window = history.iloc[day:day + WINDOW]
+            for feature in ("Returns", "Diff_Returns"):
+                values = analysis._feature_matrix(window, feature)
+
+                start = time.perf_counter()
+                cold = analysis._build_hmm().fit(values)
+                cold_time += time.perf_counter() - start
+
+                start = time.perf_counter()
+                warm, record = analysis._fit_regime_model(values, ticker, feature)
+                elapsed = time.perf_counter() - start
+
+                warm_labels, order = _labels(window, feature, warm)
+                analysis._register_model(ticker, feature, window, warm.get_params(), order, record)
+                cold_labels, _ = _labels(window, feature, cold)
+                if day > 0:
+                    for path, labels in (("cold", cold_labels), ("warm", warm_labels)):
+                        stability[path].append(float((previous[feature, path][1:] == labels[:-1]).mean()))
+                previous[feature, "cold"], previous[feature, "warm"] = cold_labels, warm_labels
+                if day == 0:
+                    continue  # First day only seeds the registry (a cold fit on both sides)
+                cold_iters.append(cold.n_iter_)
+                warm_iters.append(warm.n_iter_)
+                warm_time += elapsed
+                agreement.append(float((cold_labels == warm_labels).mean()))
+                last_agreement.append(bool(cold_labels[-1] == warm_labels[-1]))
+        model_registry.invalidate(ticker)
+
+    end_stats = model_registry.stats()
+    fits = len(cold_iters)
+    return {
+        "window": WINDOW,
+        "days": days,
+        "tickers": n_tickers,
+        "refits": fits,
+        "cold": {"mean_iterations": round(float(np.mean(cold_iters)), 2),
+                 "ms_per_fit": round(cold_time / fits * 1000, 2)},
+        "warm": {"mean_iterations": round(float(np.mean(warm_iters)), 2),
+                 "ms_per_fit": round(warm_time / fits * 1000, 2),
+                 "rejected": end_stats["warm_rejected"] - start_stats["warm_rejected"]},
+        "iterations_saved_pct": round(100 * (1 - sum(warm_iters) / sum(cold_iters)), 1),
+        "time_saved_pct": round(100 * (1 - warm_time / cold_time), 1),
+        "bar_regime_agreement": round(float(np.mean(agreement)), 4),
+        "last_regime_agreement": round(float(np.mean(last_agreement)), 4),
+        "day_to_day_label_stability": {path: round(float(np.mean(v)), 4) for path, v in stability.items()},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark warm-started vs cold HMM refits")
+    parser.add_argument("--days", type=int, default=60, help="Daily refreshes replayed per ticker")
+    parser.add_argument("--tickers", type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(json.dumps(run_benchmark(days=args.days, n_tickers=args.tickers), indent=2))
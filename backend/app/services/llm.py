@@ -10,6 +10,7 @@ from groq import AsyncGroq
 
 from datetime import timedelta
 from .chronos import chronos_service
+from ..core import deadline
 
 logger = logging.getLogger(__name__)
 
@@ -70,7 +71,7 @@ class LLMService:
         # IMPORTANT: chronos_service.predict() is SYNCHRONOUS (PyTorch CPU inference).
         # We MUST run it in an executor to avoid blocking the asyncio event loop,
         # which would cause deadlocks when concurrent requests arrive.
-        if chronos_service.enabled:
+        if chronos_service.available:
             logger.info("Using Chronos as high-fidelity fallback (via executor).")
             loop = asyncio.get_running_loop()
             from concurrent.futures import ThreadPoolExecutor
@@ -148,6 +149,10 @@ class LLMService:
             logger.info("Retrieved Portfolio Groq analysis from deterministic MD5 Cache.")
             return self._portfolio_cache[cache_key]
 
+        # Not enough of the request deadline left for a Groq round trip: skip the insight
+        if not deadline.allows(deadline.LLM, deadline.LLM_MIN):
+            return dict(fallback_response, reason="Análisis global omitido: se agotó el tiempo de la petición.")
+
         # Build prompt using the stats
         prompt = f"""
         Actúa como un Gestor de Fondos de Inversión Senior especializado en regímenes de mercado. 
@@ -178,7 +183,7 @@ class LLMService:
                     temperature=0.0,
                     response_format={"type": "json_object"}
                 ),
-                timeout=25.0
+                timeout=deadline.timeout(25.0)
             )
             
             logger.info("Portfolio Groq analysis generated successfully.")
@@ -251,7 +256,7 @@ class LLMService:
                     temperature=0.3,
                     top_p=0.8
                 ),
-                timeout=20.0
+                timeout=deadline.timeout(20.0)
             )
 
             return response.choices[0].message.content
@@ -0,0 +1,133 @@
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# --- REGISTRY CONFIGURATION ---
+REGISTRY_MAX_ENTRIES = int(os.getenv("HMM_REGISTRY_SIZE", "2048"))   # Two entries (returns + diff) per ticker
+REGISTRY_DIR = os.getenv("HMM_REGISTRY_DIR")   # Disk tier is off unless a directory is configured
+
+
+class ModelRegistry:
+    """
+    Fitted HMM parameters per (ticker, feature): startprob, transmat, means, covars,
+    the raw-state -> regime label mapping and the per-bar log-likelihood of the fit.
+    Used to warm-start the next refit (see analysis.train_hmm_returns). Bounded
+    in-memory LRU plus an optional JSON-on-disk tier that survives restarts.
+
+    Also holds the live regime track of each model (online filter, raw states and
+    posteriors of the last analysed window). Tracks are in-memory only.
+    """
+    def __init__(self, max_entries: int = REGISTRY_MAX_ENTRIES, registry_dir: str | None = REGISTRY_DIR):
+        self.max_entries = max_entries
+        self.registry_dir = registry_dir
+        self._models: OrderedDict[str, dict] = OrderedDict()
+        self._tracks: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self.cold_fits = 0
+        self.warm_fits = 0
+        self.warm_rejected = 0
+        self.iterations_saved = 0
+        self.online_updates = 0
+        self.scheduled_refits = 0
+        if self.registry_dir:
+            try:
+                os.makedirs(self.registry_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"HMM registry disk tier disabled ({self.registry_dir}): {e}")
+                self.registry_dir = None
+
+    @staticmethod
+    def _key(ticker: str, feature: str) -> str:
+        return f"{ticker}:{feature}"
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.registry_dir, key.replace(":", "__") + ".json")
+
+    def get(self, ticker: str, feature: str) -> dict | None:
+        key = self._key(ticker, feature)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                return entry
+        if not self.registry_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Corrupt HMM registry file for {key}: {e}")
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: dict):
+        with self._lock:
+            self._models[key] = entry
+            self._models.move_to_end(key)
+            while len(self._models) > self.max_entries:
+                self._models.popitem(last=False)
+
+    def put(self, ticker: str, feature: str, entry: dict):
+        key = self._key(ticker, feature)
+        entry = dict(entry, updated_at=datetime.now().isoformat())
+        self._remember(key, entry)
+        if self.registry_dir:
+            path = self._disk_path(key)
+            try:
+                with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                    json.dump(entry, f)
+                os.replace(f"{path}.tmp", path)
+            except Exception as e:
+                logger.warning(f"Could not persist HMM registry entry for {key}: {e}")
+
+    def get_track(self, ticker: str, feature: str) -> dict | None:
+        with self._lock:
+            return self._tracks.get(self._key(ticker, feature))
+
+    def put_track(self, ticker: str, feature: str, track: dict):
+        key = self._key(ticker, feature)
+        with self._lock:
+            self._tracks[key] = track
+            self._tracks.move_to_end(key)
+            while len(self._tracks) > self.max_entries:
+                self._tracks.popitem(last=False)
+
+    def invalidate(self, ticker: str):
+        for feature in ("Returns", "Diff_Returns"):
+            key = self._key(ticker, feature)
+            with self._lock:
+                self._models.pop(key, None)
+                self._tracks.pop(key, None)
+            if self.registry_dir:
+                try:
+                    os.remove(self._disk_path(key))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Could not invalidate HMM registry entry for {key}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._models),
+            "tracks": len(self._tracks),
+            "max_entries": self.max_entries,
+            "disk_tier": bool(self.registry_dir),
+            "cold_fits": self.cold_fits,
+            "warm_fits": self.warm_fits,
+            "warm_rejected": self.warm_rejected,
+            "iterations_saved": self.iterations_saved,
+            "online_updates": self.online_updates,
+            "scheduled_refits": self.scheduled_refits,
+        }
+
+
+# Global instance
+model_registry = ModelRegistry()
@@ -0,0 +1,143 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Parquet (columnar) when pyarrow is available, pickle otherwise so the store never blocks a deploy
+try:
+    import pyarrow  # noqa: F401
+    _FORMAT = "parquet"
+except ImportError as e:
+    # Also raised by a pyarrow built for another NumPy major (see the pin in requirements.txt)
+    logger.warning(f"pyarrow unavailable ({e}). OHLCV store falls back to pickle files.")
+    _FORMAT = "pkl"
+
+# --- STORE CONFIGURATION ---
+STORE_DIR = os.getenv(
+    "OHLCV_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".cache", "ohlcv")
+)
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"]
+OVERLAP_DAYS = 5          # Stored bars re-downloaded with every delta to detect adjustments
+ADJUSTMENT_RTOL = 1e-4    # Relative tolerance before an overlap mismatch counts as a re-adjustment
+
+
+class OHLCVStore:
+    """
+    Local on-disk OHLCV store, one file per ticker (+ a small JSON sidecar with metadata).
+    Holds raw auto-adjusted bars as yfinance returns them (tz-naive index); technical
+    columns are always recomputed by DataProvider.
+    """
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            self.enabled = True
+        except OSError as e:
+            logger.warning(f"OHLCV store disabled, cannot create {self.root}: {e}")
+            self.enabled = False
+
+    def _path(self, ticker: str, ext: str) -> str:
+        return os.path.join(self.root, f"{ticker}.{ext}")
+
+    def load(self, ticker: str) -> tuple[pd.DataFrame, dict]:
+        """Returns (bars, meta). Empty frame and {} when nothing usable is stored."""
+        if not self.enabled:
+            return pd.DataFrame(), {}
+        data_path = self._path(ticker, _FORMAT)
+        meta_path = self._path(ticker, "json")
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return pd.DataFrame(), {}
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if _FORMAT == "parquet":
+                data = pd.read_parquet(data_path)
+            else:
+                data = pd.read_pickle(data_path)
+            return data, meta
+        except Exception as e:
+            logger.warning(f"Corrupt OHLCV store entry for {ticker}, ignoring: {e}")
+            return pd.DataFrame(), {}
+
+    def save(self, ticker: str, data: pd.DataFrame, meta: dict):
+        """Atomically replaces the stored bars and metadata for a ticker."""
+        if not self.enabled or data.empty:
+            return
+        data_path = self._path(ticker, _FORMAT)
+        meta_path = self._path(ticker, "json")
+        meta = dict(meta, updated_at=datetime.now().isoformat())
+        try:
+            with self._lock:
+                tmp_data = f"{data_path}.tmp"
+                tmp_meta = f"{meta_path}.tmp"
+                if _FORMAT == "parquet":
+                    data.to_parquet(tmp_data)
+                else:
+                    data.to_pickle(tmp_data)
+                with open(tmp_meta, "w", encoding="utf-8") as f:
+                    json.dump(meta, f)
+                os.replace(tmp_data, data_path)
+                os.replace(tmp_meta, meta_path)
+        except Exception as e:
+            logger.warning(f"Could not persist OHLCV for {ticker}: {e}")
+
+    def invalidate(self, ticker: str):
+        for ext in (_FORMAT, "json"):
+            try:
+                os.remove(self._path(ticker, ext))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not invalidate OHLCV store for {ticker}: {e}")
+
+
+def normalize_bars(data: pd.DataFrame) -> pd.DataFrame:
+    """Flattens yfinance columns, strips the timezone and keeps only the stored OHLCV columns."""
+    if data.empty:
+        return data
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    if data.index.tz is not None:
+        data.index = data.index.tz_localize(None)
+    cols = [c for c in OHLCV_COLUMNS if c in data.columns]
+    data = data[cols].copy()
+    data.index.name = "Date"
+    return data[~data.index.duplicated(keep="last")].sort_index()
+
+
+def needs_full_refresh(stored: pd.DataFrame, delta: pd.DataFrame) -> bool:
+    """
+    True when the delta proves the stored history was re-adjusted upstream:
+    a split/dividend inside the new bars, or overlapping closes that no longer match.
+    """
+    last_stored = stored.index[-1]
+    new_bars = delta[delta.index > last_stored]
+    for action in ("Stock Splits", "Dividends"):
+        if action in new_bars.columns and (new_bars[action].fillna(0) != 0).any():
+            return True
+
+    overlap = stored.index.intersection(delta.index)
+    # The last stored bar may have been an intraday snapshot; compare only closed bars
+    overlap = overlap[overlap < last_stored]
+    if len(overlap) == 0:
+        return False
+    old = stored.loc[overlap, "Close"].astype(float)
+    new = delta.loc[overlap, "Close"].astype(float)
+    rel = ((old - new).abs() / old.abs().clip(lower=1e-12))
+    return bool((rel > ADJUSTMENT_RTOL).any())
+
+
+def merge_bars(stored: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """Appends the delta, letting re-downloaded bars replace their stored versions."""
+    merged = pd.concat([stored[~stored.index.isin(delta.index)], delta])
+    return merged.sort_index()
+
+
+# Global instance
+ohlcv_store = OHLCVStore()
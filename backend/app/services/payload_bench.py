@@ -0,0 +1,141 @@
+"""
+Cost of the /analyze history block: building it and putting it on the wire.
+
+Builds the history of a synthetic ticker (portfolio_bench frames) two ways:
+
+  row_loop  the per-day loop with strftime / .iloc that _analyze_ticker used to run
+  columnar  the column arrays built straight from NumPy (current _analyze_ticker)
+
+and reports the build time of each plus the encoded size of a history + forecast
+payload in every api.formats format available here (json rows, columnar json,
+msgpack, arrow).
+
+Also times serializing a /portfolio response of `assets` lite results: the old
+recursive sanitize_for_json + jsonable_encoder + json.dumps path against
+api.formats.NumpyJSONResponse (orjson).
+
+Usage: python -m backend.app.services.payload_bench [--bars 1260] [--repeat 200] [--assets 300]
+"""
+import time
+import json
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+from .portfolio_bench import synthetic_portfolio
+from ..api import formats
+
+
+def _row_loop(data: pd.DataFrame, regimes: np.ndarray) -> list:
+    history = []
+    for i in range(len(data)):
+        history.append({
+            "date": data.index[i].strftime("%Y-%m-%d"),
+            "price": float(data['Close'].iloc[i]),
+            "regime": int(regimes[i]),
+            "rvol": float(data['RVOL'].iloc[i]) if 'RVOL' in data.columns else 1.0
+        })
+    return history
+
+
+def _columnar(data: pd.DataFrame, regimes: np.ndarray) -> dict:
+    return {
+        "date": np.datetime_as_string(data.index.values, unit="D").tolist(),
+        "price": data['Close'].to_numpy(dtype=np.float64).tolist(),
+        "regime": np.asarray(regimes, dtype=np.int64).tolist(),
+        "rvol": data['RVOL'].to_numpy(dtype=np.float64).tolist(),
+    }
+
+
+def _sanitize(obj):
+    """The recursive NaN/Infinity walk every response used to go through"""
+    if isinstance(obj, float):
+        if np.isnan(obj) or np.isinf(obj):
+            return None
+        return obj
+    elif isinstance(obj, dict):
+        return {k: _sanitize(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [_sanitize(item) for item in obj]
+    return obj
+
+
+def _lite_result(rng, i: int) -> dict:
+    """Shape and sizes of one /portfolio asset (lite _analyze_ticker result)"""
+    stats = lambda: {str(s): {"mean": float(rng.normal()), "std": float(rng.random()), "count": int(rng.integers(200))}
+                     for s in range(3)}
+    return {
+        "ticker": f"SYN{i}", "currency": "USD", "current_price": float(rng.uniform(10, 500)),
+        "change_pct": float(rng.normal()), "risk_reward_ratio": float("nan") if i % 50 == 0 else float(rng.normal()),
+        "history": [], "forecast": [],
+        "recommendation": {"verdict": "MANTENER", "score": float(rng.random()), "reasons": ["a" * 40] * 4,
+                           "signals": {k: float(rng.normal()) for k in "abcdefgh"}},
+        "current_regime_ret": int(rng.integers(3)), "current_regime_diff": int(rng.integers(3)),
+        "regime_probs_ret": rng.random(3).tolist(), "regime_probs_diff": rng.random(3).tolist(),
+        "state_stats_ret": stats(), "state_stats_diff": stats(), "degraded": False,
+    }
+
+
+def _timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run_benchmark(bars: int = 1260, repeat: int = 200, n_assets: int = 300) -> dict:
+    frame = next(iter(synthetic_portfolio(1).values()))
+    # Tile the year of synthetic bars out to `bars` business days
+    reps = -(-bars // len(frame))
+    data = pd.concat([frame] * reps).iloc[:bars]
+    data.index = pd.bdate_range("2020-01-02", periods=len(data))
+    data['RVOL'] = data['RVOL'].fillna(1.0)
+    regimes = np.random.default_rng(3).integers(0, 3, len(data))
+
+    rows, columns = _row_loop(data, regimes), _columnar(data, regimes)
+    assert formats.to_rows(columns) == rows
+    forecast = [{"date": f"2026-01-{i + 1:02d}", "price": 100.0 + i, "price_low": 95.0, "price_high": 105.0,
+                 "type": "forecast", "source": "gbm"} for i in range(10)]
+    payload = {"ticker": "SYN", "history": columns, "forecast": forecast}
+
+    sizes = {}
+    for fmt in formats.ANALYZE_FORMATS:
+        try:
+            rendered = formats.render(payload, fmt)
+        except Exception as e:
+            sizes[fmt] = f"unavailable ({getattr(e, 'detail', e)})"
+            continue
+        sizes[fmt] = len(rendered.body)
+
+    rng = np.random.default_rng(5)
+    portfolio = {"assets": [_lite_result(rng, i) for i in range(n_assets)], "summary": {"total_assets": n_assets}}
+    old_path = lambda: json.dumps(jsonable_encoder(_sanitize(portfolio)), ensure_ascii=False, allow_nan=False,
+                                  separators=(",", ":")).encode("utf-8")
+    assert json.loads(old_path()) == json.loads(formats.NumpyJSONResponse(portfolio).body)
+    serialize_repeat = max(1, repeat // 10)
+
+    return {
+        "bars": len(data),
+        "build_ms": {
+            "row_loop": round(_timed(lambda: _row_loop(data, regimes), max(1, repeat // 20)), 3),
+            "columnar": round(_timed(lambda: _columnar(data, regimes), repeat), 3),
+        },
+        "payload_bytes": sizes,
+        "portfolio_assets": n_assets,
+        "serialize_ms": {
+            "sanitize_jsonable_json": round(_timed(old_path, serialize_repeat), 3),
+            "numpy_orjson": round(_timed(lambda: formats.NumpyJSONResponse(portfolio), serialize_repeat), 3),
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark building and encoding the /analyze history")
+    parser.add_argument("--bars", type=int, default=1260)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--assets", type=int, default=300)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(json.dumps(run_benchmark(args.bars, args.repeat, args.assets), indent=2))
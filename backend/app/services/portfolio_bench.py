@@ -0,0 +1,99 @@
+"""
+Per-ticker cost of the lite (verdict-only) pipeline behind /api/portfolio.
+
+Builds a synthetic portfolio (OHLCV run through DataProvider._prepare_frame, like the
+API) and times the CPU work per ticker three ways:
+
+  before       full posteriors + the day-by-day hysteresis walk, one ticker at a time
+               (what lite_mode computed before the verdict-only pipeline)
+  verdict_only last-bar posteriors + latest_verdict, one ticker at a time
+  batched      verdict_only on top of one batched HMM fit for the whole portfolio
+
+All fits are cold (no model registry), as on a first portfolio run. Also reports how
+many tickers get a different verdict state or current regimes than `before`.
+
+Usage: python -m backend.app.services.portfolio_bench [--tickers 300]
+"""
+import time
+import json
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+
+from . import analysis
+from .data_provider import data_provider
+
+BARS = 252   # One year of daily bars, as fetch_many downloads
+
+
+def synthetic_portfolio(n_tickers: int, seed: int = 11) -> dict:
+    """{ticker: prepared frame} of regime-switching GBM prices with lognormal volume"""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range("2024-01-02", periods=BARS)
+    frames = {}
+    for i in range(n_tickers):
+        regimes = np.cumsum(rng.random(BARS) < 0.03) % 3
+        mu = np.array([0.0003, 0.0012, -0.0008])[regimes]
+        sigma = np.array([0.009, 0.014, 0.028])[regimes] * rng.uniform(0.7, 1.5)
+        close = 50 * np.exp(np.cumsum(rng.normal(mu, sigma)))
+        bars = pd.DataFrame({
+            "Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+            "Volume": rng.lognormal(13, 0.4, BARS) * (1 + (regimes == 2)),
+        }, index=index)
+        frames[f"SYN{i}"] = data_provider._prepare_frame(bars, f"SYN{i}")
+    return frames
+
+
+def _before(data):
+    regimes_ret, _, ret_stats = analysis.train_hmm_returns(data)
+    regimes_diff, _, diff_stats = analysis.train_hmm_diff(data)
+    verdicts, scores = analysis.get_historical_verdicts(data, regimes_ret, regimes_diff, ret_stats, diff_stats)
+    return int(verdicts[-1]), int(regimes_ret[-1]), int(regimes_diff[-1])
+
+
+def _verdict_only(data, fitted=None):
+    if fitted is None:
+        fitted = (analysis.train_hmm_returns(data, full_posteriors=False),
+                  analysis.train_hmm_diff(data, full_posteriors=False))
+    (regimes_ret, _, ret_stats), (regimes_diff, _, diff_stats) = fitted
+    state, _ = analysis.latest_verdict(data, regimes_ret, regimes_diff, ret_stats, diff_stats)
+    return state, int(regimes_ret[-1]), int(regimes_diff[-1])
+
+
+def run_benchmark(n_tickers: int = 300) -> dict:
+    analysis.HMM_WARM_START = False   # Cold fits only: the registry would turn later runs into warm ones
+    portfolio = synthetic_portfolio(n_tickers)
+    results, timings = {}, {}
+
+    start = time.perf_counter()
+    results["before"] = {t: _before(d) for t, d in portfolio.items()}
+    timings["before"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results["verdict_only"] = {t: _verdict_only(d) for t, d in portfolio.items()}
+    timings["verdict_only"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fitted = analysis.train_hmm_batch(portfolio, full_posteriors=False)
+    results["batched"] = {t: _verdict_only(d, fitted[t]) for t, d in portfolio.items()}
+    timings["batched"] = time.perf_counter() - start
+
+    baseline = results["before"]
+    return {
+        "tickers": n_tickers,
+        "bars": BARS,
+        "ms_per_ticker": {k: round(v / n_tickers * 1000, 2) for k, v in timings.items()},
+        "speedup_vs_before": {k: round(timings["before"] / v, 2) for k, v in timings.items() if k != "before"},
+        "mismatches_vs_before": {
+            k: sum(r[t] != baseline[t] for t in portfolio) for k, r in results.items() if k != "before"
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the lite portfolio pipeline")
+    parser.add_argument("--tickers", type=int, default=300)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(json.dumps(run_benchmark(args.tickers), indent=2))
@@ -0,0 +1,786 @@
+import os
+import sys
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- ENGINE CONFIGURATION ---
+# "numpy": this module's vectorized kernels. "compiled": hmmlearn's private C++ _hmmc module,
+# an opt-in tied to hmmlearn internals (checked against hmmlearn 0.3.3 by test_hmm_parity.py)
+HMM_KERNELS = os.getenv("HMM_KERNELS", "numpy")
+# Defaults mirror hmmlearn.hmm.GaussianHMM so both engines are interchangeable
+DEFAULT_TOL = 1e-2
+COVARS_PRIOR = 1e-2
+_TINY = np.finfo(float).tiny
+_LOG_2PI = np.log(2 * np.pi)
+
+
+def _log_emissions(x: np.ndarray, means: np.ndarray, covars: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """Univariate Gaussian log-density of every sample under every state, written into `out` (n, K)."""
+    covars = np.maximum(covars, _TINY)
+    np.subtract(x[:, None], means[None, :], out=out)
+    np.square(out, out=out)
+    out /= covars
+    out += _LOG_2PI + np.log(covars)
+    out *= -0.5
+    return out
+
+
+def _logsumexp(a: np.ndarray, axis=None, keepdims: bool = False):
+    top = np.max(a, axis=axis, keepdims=True)
+    top[~np.isfinite(top)] = 0.0
+    with np.errstate(under="ignore", divide="ignore"):
+        out = np.log(np.exp(a - top).sum(axis=axis, keepdims=True)) + top
+    return out if keepdims else np.squeeze(out, axis=axis)
+
+
+# --- VECTORIZED KERNELS ---
+# Same signatures as hmmlearn's compiled _hmmc module, which HMM_KERNELS="compiled" uses instead.
+# The recursions are evaluated as log(n)-step product scans over the time axis.
+
+def _scaled_scan(mats: np.ndarray, log_scale: np.ndarray):
+    """
+    Inclusive product scan P[t] = M[0] @ ... @ M[t] over axis -3 of non-negative (K, K)
+    matrices in log(n) vectorized steps (Hillis-Steele). Every product is renormalised to
+    max 1 and its log scale carried in `log_scale`, so long sequences never under/overflow.
+    Works in place on both arguments.
+    """
+    P, S = mats, log_scale
+    n = P.shape[-3]
+    d = 1
+    while d < n:
+        prod = P[..., :-d, :, :] @ P[..., d:, :, :]
+        c = prod.max(axis=(-2, -1))
+        c[c <= 0] = 1.0
+        prod /= c[..., None, None]
+        S[..., d:] = S[..., :-d] + S[..., d:] + np.log(c)
+        P[..., d:, :, :] = prod
+        d *= 2
+    return P, S
+
+
+def _transition_emission_mats(transmat: np.ndarray, log_frameprob: np.ndarray):
+    """M_t = T * diag(b_t) for t = 1..n-1, with b_t scaled to max 1 (scale returned in log space)."""
+    frame_max = log_frameprob[1:].max(axis=1)
+    frame_max[~np.isfinite(frame_max)] = 0.0
+    emit = np.exp(log_frameprob[1:] - frame_max[:, None])
+    return transmat[None, :, :] * emit[:, None, :], frame_max
+
+
+def forward_log(startprob: np.ndarray, transmat: np.ndarray, log_frameprob: np.ndarray):
+    """Returns (log_prob, fwdlattice)"""
+    n, K = log_frameprob.shape
+    fwd = np.empty((n, K))
+    with np.errstate(divide="ignore"):
+        fwd[0] = np.log(startprob) + log_frameprob[0]
+    if n > 1:
+        mats, scale = _transition_emission_mats(transmat, log_frameprob)
+        prefix, scale = _scaled_scan(mats, scale)
+        a0_max = fwd[0].max()
+        a0 = np.exp(fwd[0] - a0_max)
+        with np.errstate(divide="ignore"):
+            fwd[1:] = np.log(a0 @ prefix) + (scale + a0_max)[:, None]
+    return float(_logsumexp(fwd[-1])), fwd
+
+
+def backward_log(startprob: np.ndarray, transmat: np.ndarray, log_frameprob: np.ndarray):
+    """Returns bwdlattice"""
+    n, K = log_frameprob.shape
+    bwd = np.zeros((n, K))
+    if n > 1:
+        # Suffix products M_t @ ... @ M_{n-1} are the transposed prefix products of the reversed,
+        # transposed sequence
+        mats, scale = _transition_emission_mats(transmat, log_frameprob)
+        rev, scale = _scaled_scan(np.ascontiguousarray(mats[::-1].swapaxes(1, 2)), scale[::-1].copy())
+        with np.errstate(divide="ignore"):
+            bwd[:-1] = (np.log(rev.sum(axis=1)) + scale[:, None])[::-1]
+    return bwd
+
+
+def compute_log_xi_sum(fwdlattice: np.ndarray, transmat: np.ndarray, bwdlattice: np.ndarray,
+                       log_frameprob: np.ndarray) -> np.ndarray:
+    """log of the expected transition counts summed over time"""
+    log_prob = _logsumexp(fwdlattice[-1])
+    with np.errstate(divide="ignore"):
+        log_trans = np.log(transmat)
+    log_xi = (fwdlattice[:-1, :, None] + log_trans[None, :, :]
+              + (log_frameprob[1:] + bwdlattice[1:])[:, None, :] - log_prob)
+    return _logsumexp(log_xi, axis=0)
+
+
+def viterbi(startprob: np.ndarray, transmat: np.ndarray, log_frameprob: np.ndarray):
+    """Returns (log_prob, state_sequence)"""
+    n, K = log_frameprob.shape
+    with np.errstate(divide="ignore"):
+        log_start = np.log(startprob)
+        log_trans = np.log(transmat)
+    delta = np.empty((n, K))
+    delta[0] = log_start + log_frameprob[0]
+    if n > 1:
+        # (max, +) prefix scan of W_t[i, j] = log T[i, j] + log b_t[j]
+        P = log_trans[None, :, :] + log_frameprob[1:, None, :]
+        d = 1
+        while d < n - 1:
+            P[d:] = (P[:-d, :, :, None] + P[d:, None, :, :]).max(axis=-2)
+            d *= 2
+        delta[1:] = (delta[0][None, :, None] + P).max(axis=1)
+
+    states = np.empty(n, dtype=np.int64)
+    states[-1] = int(np.argmax(delta[-1]))
+    log_prob = float(delta[-1, states[-1]])
+    # Backtracking is inherently sequential; plain Python floats keep it cheap
+    delta_rows = delta.tolist()
+    trans_cols = log_trans.T.tolist()
+    nxt = states[-1]
+    for t in range(n - 2, -1, -1):
+        row, col = delta_rows[t], trans_cols[nxt]
+        best, best_i = row[0] + col[0], 0
+        for i in range(1, K):
+            if row[i] + col[i] > best:
+                best, best_i = row[i] + col[i], i
+        states[t] = nxt = best_i
+    return log_prob, states
+
+
+_KERNELS = {}
+
+
+def get_kernels(name: str = HMM_KERNELS):
+    """
+    'numpy' (this module) or 'compiled' (hmmlearn's C++ lattice kernels). 'compiled'
+    falls back to 'numpy' with a warning when the private module cannot be imported.
+    """
+    if name not in ("numpy", "compiled"):
+        raise ValueError(f"Unknown HMM kernels '{name}'. Use 'numpy' or 'compiled'.")
+    if name not in _KERNELS:
+        _KERNELS[name] = sys.modules[__name__]
+        if name == "compiled":
+            try:
+                from hmmlearn import _hmmc
+                _KERNELS[name] = _hmmc
+            except ImportError as e:
+                logger.warning(f"hmmlearn compiled kernels unavailable ({e}). Using the NumPy kernels.")
+    return _KERNELS[name]
+
+
+class UnivariateGaussianHMM:
+    """
+    Gaussian HMM specialised for one feature and a handful of states (diagonal covariance
+    is implied). Reproduces hmmlearn.hmm.GaussianHMM(covariance_type="diag") fit/predict/
+    predict_proba - same k-means + Dirichlet initialisation, same priors and the same
+    convergence rule - without the generic estimator's per-iteration overhead (input
+    validation, scipy logsumexp, multi-sequence bookkeeping).
+
+    Parameters use hmmlearn names; `means_` and `covars_` are (K,) vectors.
+    """
+    def __init__(self, n_components: int = 3, n_iter: int = 100, tol: float = DEFAULT_TOL,
+                 random_state=None, min_covar: float = 1e-3, covars_prior: float = COVARS_PRIOR,
+                 kernels: str = HMM_KERNELS):
+        self.n_components = n_components
+        self.n_iter = n_iter
+        self.tol = tol
+        self.random_state = random_state
+        self.min_covar = min_covar
+        self.covars_prior = covars_prior
+        self.kernels = kernels
+        self.history = []
+        self.converged_ = False
+        self._buffers = None
+
+    @staticmethod
+    def _as_series(X) -> np.ndarray:
+        x = np.asarray(X, dtype=np.float64)
+        if x.ndim == 2:
+            if x.shape[1] != 1:
+                raise ValueError(f"Expected a single feature, got shape {x.shape}")
+            x = x[:, 0]
+        if x.ndim != 1 or x.shape[0] == 0:
+            raise ValueError(f"Expected a non-empty 1-D series, got shape {np.shape(X)}")
+        if not np.isfinite(x).all():
+            raise ValueError("Input contains NaN or infinity.")
+        return np.ascontiguousarray(x)
+
+    def _workspace(self, n: int):
+        """(log_frameprob, posteriors) buffers, reused across EM iterations and calls."""
+        if self._buffers is None or self._buffers[0].shape[0] != n:
+            self._buffers = (np.empty((n, self.n_components)), np.empty((n, self.n_components)))
+        return self._buffers
+
+    def _init_params(self, x: np.ndarray):
+        K = self.n_components
+        rs = self.random_state
+        if not isinstance(rs, np.random.RandomState):
+            rs = np.random.RandomState(rs)
+        self.startprob_ = rs.dirichlet(np.full(K, 1.0 / K))
+        self.transmat_ = rs.dirichlet(np.full(K, 1.0 / K), size=K)
+        # Same centers as hmmlearn's KMeans(n_init=10) initialiser, see batched_kmeans_1d
+        self.means_ = batched_kmeans_1d(x[None, :], np.ones((1, x.shape[0]), dtype=bool), np.array([x.shape[0]]),
+                                        K, random_state=self.random_state)[0]
+        self.covars_ = np.full(K, np.var(x, ddof=1) + self.min_covar)
+
+    def _e_step(self, x: np.ndarray, compute_xi: bool = True):
+        """Returns (log_prob, posteriors, xi_sum) under the current parameters."""
+        k = get_kernels(self.kernels)
+        log_frameprob, posteriors = self._workspace(x.shape[0])
+        _log_emissions(x, self.means_, self.covars_, out=log_frameprob)
+        log_prob, fwd = k.forward_log(self.startprob_, self.transmat_, log_frameprob)
+        bwd = k.backward_log(self.startprob_, self.transmat_, log_frameprob)
+
+        np.add(fwd, bwd, out=posteriors)
+        posteriors -= _logsumexp(posteriors, axis=1, keepdims=True)
+        with np.errstate(under="ignore"):
+            np.exp(posteriors, out=posteriors)
+
+        xi_sum = None
+        if compute_xi and x.shape[0] > 1:
+            with np.errstate(under="ignore"):
+                xi_sum = np.exp(k.compute_log_xi_sum(fwd, self.transmat_, bwd, log_frameprob))
+        return log_prob, posteriors, xi_sum
+
+    def _m_step(self, x: np.ndarray, posteriors: np.ndarray, xi_sum):
+        startprob = np.where(self.startprob_ == 0, 0, np.maximum(posteriors[0], 0))
+        self.startprob_ = startprob / startprob.sum()
+        if xi_sum is not None:
+            transmat = np.where(self.transmat_ == 0, 0, np.maximum(xi_sum, 0))
+            row_sums = transmat.sum(axis=1, keepdims=True)
+            row_sums[row_sums == 0] = 1
+            self.transmat_ = transmat / row_sums
+
+        post = posteriors.sum(axis=0)
+        obs = posteriors.T @ x
+        obs_sq = posteriors.T @ (x * x)
+        self.means_ = obs / post
+        c_n = obs_sq - 2 * self.means_ * obs + self.means_ ** 2 * post
+        self.covars_ = (self.covars_prior + c_n) / np.maximum(post, 1e-5)
+
+    def _run_em(self, x: np.ndarray, n_iter: int):
+        """Up to `n_iter` EM iterations from the current parameters, appending to `history`."""
+        for _ in range(n_iter):
+            log_prob, posteriors, xi_sum = self._e_step(x)
+            self._m_step(x, posteriors, xi_sum)
+            self.history.append(log_prob)
+            if len(self.history) >= 2 and self.history[-1] - self.history[-2] < self.tol:
+                self.converged_ = True
+                break
+
+    def fit(self, X):
+        x = self._as_series(X)
+        self._init_params(x)
+        self.history = []
+        self.converged_ = False
+        self._run_em(x, self.n_iter)
+        return self
+
+    def warm_fit(self, X, params: dict, n_iter: int | None = None):
+        """
+        EM started from previously fitted `params` (see get_params) instead of the
+        k-means initialisation, for at most `n_iter` iterations (default self.n_iter).
+        """
+        x = self._as_series(X)
+        self.set_params(params)
+        self.history = []
+        self.converged_ = False
+        self._run_em(x, self.n_iter if n_iter is None else n_iter)
+        return self
+
+    def get_params(self) -> dict:
+        """Fitted parameters as plain lists (JSON friendly)"""
+        return {
+            "startprob": self.startprob_.tolist(),
+            "transmat": self.transmat_.tolist(),
+            "means": self.means_.tolist(),
+            "covars": self.covars_.tolist(),
+        }
+
+    def set_params(self, params: dict):
+        K = self.n_components
+        self.startprob_ = np.asarray(params["startprob"], dtype=np.float64).reshape(K)
+        self.transmat_ = np.asarray(params["transmat"], dtype=np.float64).reshape(K, K)
+        self.means_ = np.asarray(params["means"], dtype=np.float64).reshape(K)
+        self.covars_ = np.asarray(params["covars"], dtype=np.float64).reshape(K)
+        return self
+
+    @property
+    def n_iter_(self) -> int:
+        return len(self.history)
+
+    @property
+    def log_prob_(self) -> float:
+        """Log-likelihood of the training series at the last EM iteration"""
+        return self.history[-1] if self.history else -np.inf
+
+    def predict(self, X) -> np.ndarray:
+        x = self._as_series(X)
+        log_frameprob = _log_emissions(x, self.means_, self.covars_, out=np.empty((x.shape[0], self.n_components)))
+        return get_kernels(self.kernels).viterbi(self.startprob_, self.transmat_, log_frameprob)[1]
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self._e_step(self._as_series(X), compute_xi=False)[1].copy()
+
+    def predict_last_proba(self, X) -> np.ndarray:
+        """
+        Posterior of the last observation only, shape (1, K). It equals the last row of
+        predict_proba (the backward variable is 1 there), so only the forward pass runs.
+        """
+        x = self._as_series(X)
+        log_frameprob = _log_emissions(x, self.means_, self.covars_, out=np.empty((x.shape[0], self.n_components)))
+        fwd = get_kernels(self.kernels).forward_log(self.startprob_, self.transmat_, log_frameprob)[1]
+        last = fwd[-1:]
+        return np.exp(last - _logsumexp(last, axis=1, keepdims=True))
+
+    def score(self, X) -> float:
+        return self._e_step(self._as_series(X), compute_xi=False)[0]
+
+
+# --- ONLINE FILTER ---
+
+class OnlineRegimeFilter:
+    """
+    Forward filter plus online Viterbi recursion for a fitted UnivariateGaussianHMM.
+    Every new observation costs one K x K step. The filter also keeps its state before
+    the last observation, so a revised last bar (an intraday refresh) replaces that step
+    instead of appending one. Instances are immutable: advance/revise return new ones.
+
+    `probs` is the filtered distribution of the last bar, which equals its smoothed
+    posterior (predict_proba) under the same parameters; `state` is the last state of
+    the Viterbi path.
+    """
+    __slots__ = ("means", "covars", "transmat", "log_transmat", "alpha", "delta", "prev_alpha", "prev_delta")
+
+    def __init__(self, model: UnivariateGaussianHMM, X):
+        x = model._as_series(X)
+        if x.shape[0] < 2:
+            raise ValueError("The online filter needs at least two observations")
+        K = model.n_components
+        self.means = model.means_.copy()
+        self.covars = np.maximum(model.covars_, _TINY)
+        self.transmat = model.transmat_.copy()
+        with np.errstate(divide="ignore"):
+            self.log_transmat = np.log(self.transmat)
+            log_start = np.log(model.startprob_)
+
+        lf = _log_emissions(x, self.means, self.covars, out=np.empty((x.shape[0], K)))
+        fwd = get_kernels(model.kernels).forward_log(model.startprob_, model.transmat_, lf)[1]
+        tail = np.exp(fwd[-2:] - _logsumexp(fwd[-2:], axis=1, keepdims=True))
+        self.prev_alpha, self.alpha = tail[0], tail[1]
+
+        # Viterbi scores up to the second-to-last bar; plain Python floats beat numpy on K x K steps
+        delta = (log_start + lf[0]).tolist()
+        trans_cols = self.log_transmat.T.tolist()
+        for row in lf[1:-1].tolist():
+            delta = [max(d + c for d, c in zip(delta, col)) + e for col, e in zip(trans_cols, row)]
+            top = max(delta)
+            delta = [d - top for d in delta]  # Only differences matter; keeps the recursion bounded
+        self.prev_delta = delta = np.array(delta)
+        self.delta = (delta[:, None] + self.log_transmat).max(axis=0) + lf[-1]
+        self.delta -= self.delta.max()
+
+    def _step(self, alpha: np.ndarray, delta: np.ndarray, value: float) -> "OnlineRegimeFilter":
+        lf = -0.5 * (_LOG_2PI + np.log(self.covars) + (value - self.means) ** 2 / self.covars)
+        a = (alpha @ self.transmat) * np.exp(lf - lf.max())
+        d = (delta[:, None] + self.log_transmat).max(axis=0) + lf
+        out = object.__new__(OnlineRegimeFilter)
+        out.means, out.covars = self.means, self.covars
+        out.transmat, out.log_transmat = self.transmat, self.log_transmat
+        out.prev_alpha, out.prev_delta = alpha, delta
+        out.alpha = a / max(a.sum(), _TINY)
+        out.delta = d - d.max()
+        return out
+
+    def advance(self, value: float) -> "OnlineRegimeFilter":
+        """Filter after appending a new observation"""
+        return self._step(self.alpha, self.delta, float(value))
+
+    def revise(self, value: float) -> "OnlineRegimeFilter":
+        """Filter with the last observation replaced by `value`"""
+        return self._step(self.prev_alpha, self.prev_delta, float(value))
+
+    @property
+    def probs(self) -> np.ndarray:
+        return self.alpha
+
+    @property
+    def state(self) -> int:
+        return int(self.delta.argmax())
+
+
+# --- BATCHED ENGINE ---
+
+BATCH_TAIL_SIZE = 32     # Below this many running series a batched EM step costs more than per-series steps
+KMEANS_N_INIT = 10       # As hmmlearn configures sklearn's KMeans
+KMEANS_MAX_ITER = 300
+KMEANS_TOL = 1e-4
+
+
+def _pad(series: list):
+    """Stacks variable-length 1-D series into (B, N) values (zero padded) and a validity mask."""
+    lengths = np.array([len(s) for s in series])
+    x = np.zeros((len(series), int(lengths.max())))
+    mask = np.arange(x.shape[1])[None, :] < lengths[:, None]
+    for b, s in enumerate(series):
+        x[b, :lengths[b]] = s
+    return x, mask, lengths
+
+
+def _sq_dist(c: np.ndarray, x: np.ndarray, x_sq: np.ndarray) -> np.ndarray:
+    """Squared distances in sklearn's expanded form (-2xc + c^2 + x^2), so ties resolve alike."""
+    d = -2 * (c * x)
+    d += c * c
+    d += x_sq
+    return np.maximum(d, 0)
+
+
+def _cluster_ranges(xs: np.ndarray, series: np.ndarray, n: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """
+    Nearest-center assignment of sorted 1-D series as [lo, hi) position ranges per center,
+    shape (R, K, 2). Distances use sklearn's c^2 - 2xc form with its lowest-index tie rule.
+    """
+    R, K = centers.shape
+    order = np.argsort(centers, axis=1, kind="stable")
+    sc = np.take_along_axis(centers, order, axis=1)
+    c_lo, c_hi = sc[:, :-1], sc[:, 1:]
+    i_lo, i_hi = order[:, :-1], order[:, 1:]
+    # Binary search for the first position whose point belongs to the upper center of each pair
+    lo = np.zeros((R, K - 1), dtype=int)
+    hi = np.repeat(n[:, None], K - 1, axis=1)
+    s = series[:, None]
+    while True:
+        open_ = lo < hi
+        if not open_.any():
+            break
+        mid = (lo + hi) // 2
+        xm = xs[s, np.minimum(mid, xs.shape[1] - 1)]
+        d_lo = c_lo * c_lo - 2 * (xm * c_lo)
+        d_hi = c_hi * c_hi - 2 * (xm * c_hi)
+        upper = (d_hi < d_lo) | ((d_hi == d_lo) & (i_hi < i_lo))
+        hi = np.where(open_ & upper, mid, hi)
+        lo = np.where(open_ & ~upper, mid + 1, lo)
+    cuts = np.maximum.accumulate(lo, axis=1)
+    starts = np.concatenate([np.zeros((R, 1), dtype=int), cuts], axis=1)
+    ends = np.concatenate([cuts, n[:, None]], axis=1)
+    ranges = np.empty((R, K, 2), dtype=int)
+    ranges[np.arange(R)[:, None], order, 0] = starts
+    ranges[np.arange(R)[:, None], order, 1] = ends
+    return ranges
+
+
+def batched_kmeans_1d(x: np.ndarray, mask: np.ndarray, lengths: np.ndarray, n_clusters: int,
+                      random_state=None, n_init: int = KMEANS_N_INIT) -> np.ndarray:
+    """
+    k-means++ / Lloyd k-means for many 1-D series at once, following
+    sklearn.cluster.KMeans(n_init=n_init, random_state=random_state) step by step: the
+    RNG stream k-means++ consumes does not depend on the data, so every series uses
+    the same draws and only the data-dependent index lookups are per series.
+    Returns (B, K) centers matching sklearn's cluster_centers_ up to rounding.
+    """
+    B, N = x.shape
+    K = n_clusters
+    rs = random_state if isinstance(random_state, np.random.RandomState) else np.random.RandomState(random_state)
+    n_trials = 2 + int(np.log(K))
+    draws = rs.random_sample(n_init * (1 + (K - 1) * n_trials)).reshape(n_init, -1)
+
+    x_mean = (x * mask).sum(axis=1) / lengths
+    xc = np.where(mask, x - x_mean[:, None], 0.0)
+    x_sq = xc * xc
+    tol = (x_sq.sum(axis=1) / lengths) * KMEANS_TOL
+    rows = np.arange(B)
+    ones = np.ones(N)
+    first_cdf = {}
+    for n in np.unique(lengths):
+        cdf = np.cumsum(np.full(n, 1.0 / n))
+        first_cdf[n] = cdf / cdf[-1]
+
+    # k-means++ seeding for every (series, init)
+    centers = np.empty((B, n_init, K))
+    for i in range(n_init):
+        u = draws[i]
+        idx = np.array([first_cdf[n].searchsorted(u[0], side="right") for n in lengths])
+        c = xc[rows, idx]
+        centers[:, i, 0] = c
+        closest = _sq_dist(c[:, None], xc, x_sq) * mask
+        pot = closest @ ones
+        for k in range(1, K):
+            rand_vals = u[1 + (k - 1) * n_trials: 1 + k * n_trials][None, :] * pot[:, None]
+            cum = np.cumsum(closest, axis=1)
+            cand = (cum[:, None, :] < rand_vals[:, :, None]).sum(axis=2)
+            cand = np.minimum(cand, (lengths - 1)[:, None])
+            cand_vals = xc[rows[:, None], cand]
+            dist = np.minimum(closest[:, None, :], _sq_dist(cand_vals[:, :, None], xc[:, None, :], x_sq[:, None, :]))
+            dist *= mask[:, None, :]
+            cand_pot = dist @ ones
+            best = cand_pot.argmin(axis=1)
+            pot = cand_pot[rows, best]
+            closest = dist[rows, best]
+            centers[:, i, k] = cand_vals[rows, best]
+
+    # Lloyd iterations. In 1-D every cluster is a contiguous range of the sorted series, so
+    # an assignment step is a binary search for K-1 boundaries per run and the centroid
+    # sums come from prefix sums: O(K log N) per run instead of O(N K).
+    xs = np.sort(np.where(mask, xc, np.inf), axis=1)
+    prefix = np.zeros((B, N + 1))
+    np.cumsum(np.where(mask, xs, 0.0), axis=1, out=prefix[:, 1:])
+    R = B * n_init
+    series_of = np.repeat(rows, n_init)
+    n_of = lengths[series_of]
+    run_tol = tol[series_of]
+    centers = centers.reshape(R, K)
+    ranges = np.full((R, K, 2), -1)
+    strict = np.zeros(R, dtype=bool)
+    active = np.arange(R)
+    for _ in range(KMEANS_MAX_ITER):
+        ca = centers[active]
+        new_ranges = _cluster_ranges(xs, series_of[active], n_of[active], ca)
+        lo, hi = new_ranges[..., 0], new_ranges[..., 1]
+        sa = series_of[active]
+        counts = hi - lo
+        sums = prefix[sa[:, None], hi] - prefix[sa[:, None], lo]
+        new_centers = np.where(counts > 0, sums / np.maximum(counts, 1), ca)
+        shift = ((new_centers - ca) ** 2).sum(axis=1)
+        same = (new_ranges == ranges[active]).all(axis=(1, 2))
+        ranges[active] = new_ranges
+        centers[active] = new_centers
+        strict[active[same]] = True
+        active = active[~(same | (shift <= run_tol[active]))]
+        if active.size == 0:
+            break
+    # Runs stopped by the shift tolerance re-assign labels to their final centers
+    loose = np.flatnonzero(~strict)
+    if loose.size:
+        ranges[loose] = _cluster_ranges(xs, series_of[loose], n_of[loose], centers[loose])
+
+    lo, hi = ranges[..., 0], ranges[..., 1]
+    sq = np.zeros((B, N + 1))
+    np.cumsum(np.where(mask, xs * xs, 0.0), axis=1, out=sq[:, 1:])
+    s1 = prefix[series_of[:, None], hi] - prefix[series_of[:, None], lo]
+    s2 = sq[series_of[:, None], hi] - sq[series_of[:, None], lo]
+    inertia = (s2 - 2 * centers * s1 + (hi - lo) * centers ** 2).sum(axis=1).reshape(B, n_init)
+    centers = centers.reshape(B, n_init, K)
+    # Clusterings compared as partitions: the sorted set of range starts
+    cuts = np.sort(np.where(hi > lo, lo, -1), axis=1).reshape(B, n_init, K)
+
+    # First run wins unless a later one has lower inertia and a genuinely different clustering
+    best = np.zeros(B, dtype=int)
+    for i in range(1, n_init):
+        same_clustering = (cuts[:, i] == cuts[rows, best]).all(axis=1)
+        better = (inertia[:, i] < inertia[rows, best]) & ~same_clustering
+        best = np.where(better, i, best)
+    return centers[rows, best] + x_mean[:, None]
+
+
+class BatchedGaussianHMM:
+    """
+    Fits many independent univariate Gaussian HMMs (one per series) in a single EM loop.
+    Series are padded to a common length with a validity mask; forward-backward advances
+    all of them one time step per vectorized operation, so per-call overhead is paid
+    once per batch instead of once per ticker. Each series stops updating as soon as it
+    meets the same tol rule as UnivariateGaussianHMM.
+
+    Initialisation reproduces hmmlearn's (Dirichlet draws + sklearn KMeans, see
+    batched_kmeans_1d), so every series ends up where UnivariateGaussianHMM would.
+    """
+    def __init__(self, n_components: int = 3, n_iter: int = 100, tol: float = DEFAULT_TOL,
+                 random_state=None, min_covar: float = 1e-3, covars_prior: float = COVARS_PRIOR):
+        self.n_components = n_components
+        self.n_iter = n_iter
+        self.tol = tol
+        self.random_state = random_state
+        self.min_covar = min_covar
+        self.covars_prior = covars_prior
+
+    def _init_params(self, x: np.ndarray, mask: np.ndarray, lengths: np.ndarray):
+        K = self.n_components
+        B = x.shape[0]
+        rs = self.random_state
+        if not isinstance(rs, np.random.RandomState):
+            rs = np.random.RandomState(rs)
+        startprob = rs.dirichlet(np.full(K, 1.0 / K))
+        transmat = rs.dirichlet(np.full(K, 1.0 / K), size=K)
+        self.startprob_ = np.tile(startprob, (B, 1))
+        self.transmat_ = np.tile(transmat, (B, 1, 1))
+        self.means_ = batched_kmeans_1d(x, mask, lengths, K, random_state=self.random_state)
+        mean = (x * mask).sum(axis=1) / lengths
+        var = (((x - mean[:, None]) ** 2) * mask).sum(axis=1) / np.maximum(lengths - 1, 1)
+        self.covars_ = np.tile((var + self.min_covar)[:, None], (1, K))
+
+    @staticmethod
+    def _log_emissions(x, mask, means, covars):
+        covars = np.maximum(covars, _TINY)[:, None, :]
+        lf = -0.5 * (_LOG_2PI + np.log(covars) + (x[:, :, None] - means[:, None, :]) ** 2 / covars)
+        lf[~mask] = 0.0  # Padding: uninformative frames leave the valid part of every lattice unchanged
+        return lf
+
+    @staticmethod
+    def _forward(startprob, transmat, lf):
+        """
+        Scaled forward pass over a (B, N, K) batch, time-major: returns (alpha, emit,
+        scale, frame_max) with alpha/emit (N, B, K) and every alpha row normalised, so
+        alpha[t] is the filtered state distribution at frame t. Emissions are rescaled
+        by their per-frame max.
+        """
+        B, N, K = lf.shape
+        frame_max = lf.max(axis=2)
+        emit = np.exp(lf - frame_max[:, :, None]).transpose(1, 0, 2).copy()
+        alpha = np.empty((N, B, K))
+        scale = np.empty((N, B))
+        ones = np.ones(K)  # Row sums as a matvec: far cheaper than .sum() on tiny rows
+        step = np.empty((B, 1, K))
+
+        np.multiply(startprob, emit[0], out=alpha[0])
+        for t in range(N):
+            a = alpha[t]
+            if t:
+                np.matmul(alpha[t - 1][:, None, :], transmat, out=step)
+                np.multiply(step[:, 0, :], emit[t], out=a)
+            c = np.matmul(a, ones, out=scale[t])
+            np.maximum(c, _TINY, out=c)
+            a /= c[:, None]
+        return alpha, emit, scale, frame_max
+
+    @classmethod
+    def _forward_backward(cls, startprob, transmat, lf):
+        """
+        Scaled forward-backward over a (B, N, K) batch. Returns (log_prob (B,), posteriors
+        (B, N, K), alpha, beta, emit, scale) with emissions rescaled by their per-frame max.
+        Lattices are filled time-major so every step touches contiguous memory.
+        """
+        B, N, K = lf.shape
+        alpha, emit, scale, frame_max = cls._forward(startprob, transmat, lf)
+        beta = np.empty((N, B, K))
+        beta[-1] = 1.0
+        b = np.empty((B, K))
+        for t in range(N - 2, -1, -1):
+            np.multiply(emit[t + 1], beta[t + 1], out=b)
+            b /= scale[t + 1][:, None]
+            np.matmul(transmat, b[:, :, None], out=beta[t][:, :, None])
+
+        alpha, beta = alpha.transpose(1, 0, 2), beta.transpose(1, 0, 2)
+        emit, scale = emit.transpose(1, 0, 2), scale.T
+        log_prob = np.log(scale).sum(axis=1) + frame_max.sum(axis=1)
+        posteriors = alpha * beta
+        posteriors /= posteriors.sum(axis=2, keepdims=True)
+        return log_prob, posteriors, alpha, beta, emit, scale
+
+    def _em_step(self, idx, x, mask):
+        startprob, transmat = self.startprob_[idx], self.transmat_[idx]
+        means, covars = self.means_[idx], self.covars_[idx]
+        lf = self._log_emissions(x, mask, means, covars)
+        log_prob, post, alpha, beta, emit, scale = self._forward_backward(startprob, transmat, lf)
+
+        # Transition counts over valid steps only
+        step = (emit[:, 1:] * beta[:, 1:]) / scale[:, 1:, None]
+        step *= mask[:, 1:, None]
+        xi_sum = transmat * np.einsum("bti,btj->bij", alpha[:, :-1], step)
+
+        startprob = np.where(startprob == 0, 0, np.maximum(post[:, 0], 0))
+        self.startprob_[idx] = startprob / startprob.sum(axis=1, keepdims=True)
+        trans = np.where(transmat == 0, 0, np.maximum(xi_sum, 0))
+        row_sums = trans.sum(axis=2, keepdims=True)
+        row_sums[row_sums == 0] = 1
+        self.transmat_[idx] = trans / row_sums
+
+        post = post * mask[:, :, None]
+        n_post = post.sum(axis=1)
+        obs = np.einsum("bnk,bn->bk", post, x)
+        obs_sq = np.einsum("bnk,bn->bk", post, x * x)
+        means = obs / n_post
+        c_n = obs_sq - 2 * means * obs + means ** 2 * n_post
+        self.means_[idx] = means
+        self.covars_[idx] = (self.covars_prior + c_n) / np.maximum(n_post, 1e-5)
+        return log_prob
+
+    def fit(self, series: list):
+        """`series`: list of 1-D float arrays (finite, at least 2 points each)."""
+        x, mask, lengths = _pad([np.asarray(s, dtype=np.float64) for s in series])
+        if not np.isfinite(x).all():
+            raise ValueError("Input contains NaN or infinity.")
+        self._init_params(x, mask, lengths)
+        B = x.shape[0]
+        self.n_iter_ = np.zeros(B, dtype=int)
+        self.converged_ = np.zeros(B, dtype=bool)
+        last = np.full(B, -np.inf)
+        active = np.arange(B)
+        for _ in range(self.n_iter):
+            if active.size <= BATCH_TAIL_SIZE:
+                # A handful of slow-converging series: per-step batch overhead no longer pays off
+                self._finish_single(active, x, lengths, last)
+                break
+            # Only still-running series are carried, trimmed to their longest member
+            width = int(lengths[active].max())
+            log_prob = self._em_step(active, x[active, :width], mask[active, :width])
+            self.n_iter_[active] += 1
+            done = (self.n_iter_[active] >= 2) & (log_prob - last[active] < self.tol)
+            last[active] = log_prob
+            self.converged_[active[done]] = True
+            active = active[~done]
+            if active.size == 0:
+                break
+        self._lengths = lengths
+        self.log_prob_ = last
+        return self
+
+    def _finish_single(self, active, x, lengths, last):
+        """Continues EM for the remaining series one by one on the single-series engine."""
+        for b in active:
+            model = UnivariateGaussianHMM(n_components=self.n_components, tol=self.tol,
+                                          covars_prior=self.covars_prior)
+            model.startprob_, model.transmat_ = self.startprob_[b].copy(), self.transmat_[b].copy()
+            model.means_, model.covars_ = self.means_[b].copy(), self.covars_[b].copy()
+            seeded = [last[b]] if self.n_iter_[b] else []  # Keeps the tol check continuous
+            model.history = list(seeded)
+            model._run_em(x[b, :lengths[b]], self.n_iter - self.n_iter_[b])
+            self.startprob_[b], self.transmat_[b] = model.startprob_, model.transmat_
+            self.means_[b], self.covars_[b] = model.means_, model.covars_
+            self.n_iter_[b] += model.n_iter_ - len(seeded)
+            self.converged_[b] = model.converged_
+            last[b] = model.log_prob_
+
+    def params_for(self, b: int) -> dict:
+        """Fitted parameters of series `b`, in UnivariateGaussianHMM.get_params form"""
+        return {
+            "startprob": self.startprob_[b].tolist(),
+            "transmat": self.transmat_[b].tolist(),
+            "means": self.means_[b].tolist(),
+            "covars": self.covars_[b].tolist(),
+        }
+
+    def decode(self, series: list, posteriors: str = "all") -> list:
+        """
+        Per-series (viterbi_states, posteriors) under the fitted parameters. With
+        posteriors="last" only the last observation's row is returned, shape (1, K),
+        from the forward pass alone (see UnivariateGaussianHMM.predict_last_proba).
+        """
+        x, mask, lengths = _pad([np.asarray(s, dtype=np.float64) for s in series])
+        B, N = x.shape
+        K = self.n_components
+        rows = np.arange(B)
+        lf = self._log_emissions(x, mask, self.means_, self.covars_)
+        if posteriors == "last":
+            alpha = self._forward(self.startprob_, self.transmat_, lf)[0]
+            post_rows = [alpha[lengths[b] - 1, b][None, :].copy() for b in range(B)]
+        else:
+            post = self._forward_backward(self.startprob_, self.transmat_, lf)[1]
+            post_rows = [post[b, :lengths[b]] for b in range(B)]
+
+        with np.errstate(divide="ignore"):
+            log_start = np.log(self.startprob_)
+            log_trans = np.log(self.transmat_)
+        delta = log_start + lf[:, 0]
+        deltas = np.empty((B, N, K))
+        psi = np.zeros((B, N, K), dtype=np.int64)
+        deltas[:, 0] = delta
+        for t in range(1, N):
+            cand = delta[:, :, None] + log_trans
+            psi[:, t] = cand.argmax(axis=1)
+            delta = np.take_along_axis(cand, psi[:, t][:, None, :], axis=1)[:, 0, :] + lf[:, t]
+            deltas[:, t] = delta
+
+        # Backtrack every series from its own last valid frame
+        states = np.zeros((B, N), dtype=np.int64)
+        current = np.zeros(B, dtype=np.int64)
+        for t in range(N - 1, -1, -1):
+            is_last = t == lengths - 1
+            follow = psi[rows, np.minimum(t + 1, N - 1), current]
+            current = np.where(is_last, deltas[:, t].argmax(axis=1), np.where(t < lengths - 1, follow, 0))
+            states[:, t] = current
+        return [(states[b, :lengths[b]], post_rows[b]) for b in range(B)]
@@ -0,0 +1,238 @@
+import os
+import zlib
+import atexit
+import asyncio
+import logging
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+from ..core.scheduler import PriorityScheduler
+
+logger = logging.getLogger(__name__)
+
+# --- REGIME WORKER CONFIGURATION ---
+# "auto" sizes the pool to the cores this process may run on (off on a single core);
+# an integer forces that many workers and 0 keeps HMM work in-process
+HMM_WORKERS = os.getenv("HMM_WORKERS", "auto")
+WORKER_NAME_PREFIX = "regime-worker"
+FRAME_COLUMNS = ("Close", "Returns", "Diff_Returns", "RVOL")   # Everything analyze_regimes reads
+STATS_TIMEOUT = float(os.getenv("HMM_WORKER_STATS_TIMEOUT", "1.0"))   # Seconds /health waits for a busy lane's registry stats
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:   # Not available on Windows / macOS
+        return os.cpu_count() or 1
+
+
+def _resolve_workers(setting: str) -> int:
+    if setting.strip().lower() in ("", "auto"):
+        cores = available_cores()
+        return cores if cores > 1 else 0
+    return max(0, int(setting))
+
+
+def pack_frame(data: pd.DataFrame) -> tuple:
+    """
+    (int64 ns index, tz, column names, float64 block of shape (columns, bars)): two flat
+    buffers per frame, so the trip to a worker pickles as plain memory copies instead
+    of a full DataFrame (block manager, index metadata, unused OHLCV columns).
+    """
+    columns = tuple(c for c in FRAME_COLUMNS if c in data.columns)
+    block = np.ascontiguousarray(data[list(columns)].to_numpy(dtype=np.float64).T)
+    tz = str(data.index.tz) if data.index.tz is not None else None
+    return data.index.asi8, tz, columns, block
+
+
+def unpack_frame(packed: tuple) -> pd.DataFrame:
+    index_ns, tz, columns, block = packed
+    index = pd.DatetimeIndex(index_ns)
+    if tz is not None:
+        index = index.tz_localize("UTC").tz_convert(tz)
+    return pd.DataFrame(dict(zip(columns, block)), index=index)
+
+
+def _init_worker():
+    # The pool is the parallelism: one BLAS thread per process avoids oversubscribing the cores
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = "1"
+    mp.current_process().name = f"{WORKER_NAME_PREFIX}-{os.getpid()}"
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+def _warm_up_job() -> int:
+    from . import analysis  # noqa: F401  (numpy, pandas and the HMM kernels load once per worker)
+    return os.getpid()
+
+
+def _registry_stats_job() -> dict:
+    from .model_registry import model_registry
+    return model_registry.stats()
+
+
+def _regimes_job(packed: tuple, ticker: str, verdict_only: bool) -> dict:
+    from .analysis import analyze_regimes
+    return analyze_regimes(unpack_frame(packed), ticker, verdict_only=verdict_only)
+
+
+def _batch_job(packed: dict, full_posteriors: bool) -> dict:
+    from .analysis import train_hmm_batch
+    return train_hmm_batch({t: unpack_frame(p) for t, p in packed.items()}, full_posteriors=full_posteriors)
+
+
+class RegimeWorkerPool:
+    """
+    Process pool for the pure-NumPy stages of an analysis: HMM fits and hysteresis
+    scoring (analysis.analyze_regimes, analysis.train_hmm_batch). Chronos keeps its
+    own serialized lane; these stages carry no PyTorch thread-safety concerns.
+
+    One single-process lane per worker, with every ticker pinned to a lane by a
+    stable hash of its symbol: the model registry and online regime tracks live in
+    the worker, so a ticker must come back to the same process to stay warm.
+    A crashed lane is recreated on the next call; the failed call raises and the
+    caller falls back to in-process fitting.
+
+    Submissions to a lane go through its own PriorityScheduler (one task in the
+    worker at a time), so interactive tickers overtake a queued portfolio sweep
+    instead of waiting in the executor's FIFO.
+    """
+    def __init__(self, workers: int | None = None):
+        self.workers = _resolve_workers(HMM_WORKERS) if workers is None else workers
+        self._lanes: list[ProcessPoolExecutor | None] = [None] * self.workers
+        self._schedulers = [PriorityScheduler(f"regime-lane-{i}") for i in range(self.workers)]
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+        self._stats_pending: dict[int, asyncio.Future] = {}
+        self.tasks = 0
+        self.batches = 0
+        self.crashes = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def lane_of(self, ticker: str) -> int:
+        return zlib.crc32(ticker.encode("utf-8")) % self.workers
+
+    def _lane(self, i: int) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._lanes[i] is None:
+                self._lanes[i] = ProcessPoolExecutor(
+                    max_workers=1, mp_context=mp.get_context("spawn"), initializer=_init_worker
+                )
+                if not self._atexit_registered:
+                    atexit.register(self.shutdown)
+                    self._atexit_registered = True
+            return self._lanes[i]
+
+    def _drop_lane(self, i: int, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._lanes[i] is executor:
+                self._lanes[i] = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _submit(self, i: int, fn, *args):
+        async with self._schedulers[i].slot():
+            return await self._run_on_lane(i, fn, *args)
+
+    async def _run_on_lane(self, i: int, fn, *args):
+        executor = self._lane(i)
+        try:
+            return await asyncio.wrap_future(executor.submit(fn, *args))
+        except BrokenProcessPool:
+            self.crashes += 1
+            logger.error(f"Regime worker lane {i} crashed; it restarts on the next call")
+            self._drop_lane(i, executor)
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+
+    async def run_regimes(self, ticker: str, data: pd.DataFrame, verdict_only: bool = False) -> dict:
+        """analysis.analyze_regimes(data, ticker, verdict_only) on the ticker's lane"""
+        self.tasks += 1
+        return await self._submit(self.lane_of(ticker), _regimes_job, pack_frame(data), ticker, verdict_only)
+
+    async def fit_batch(self, datasets: dict, full_posteriors: bool = True) -> dict:
+        """
+        analysis.train_hmm_batch split by lane: every worker fits the batch of the
+        tickers pinned to it, all lanes in parallel. Same result dict as train_hmm_batch.
+        """
+        chunks: dict[int, dict] = {}
+        for ticker, data in datasets.items():
+            chunks.setdefault(self.lane_of(ticker), {})[ticker] = pack_frame(data)
+        self.batches += 1
+        results = await asyncio.gather(*(
+            self._submit(i, _batch_job, chunk, full_posteriors) for i, chunk in chunks.items()
+        ))
+        merged = {}
+        for result in results:
+            merged.update(result)
+        return merged
+
+    def estimate_wait(self, priority: str, ticker: str | None = None) -> float:
+        """Estimated queue wait on the ticker's lane, or on the most loaded lane"""
+        if ticker is not None:
+            return self._schedulers[self.lane_of(ticker)].estimate_wait(priority)
+        return max((scheduler.estimate_wait(priority) for scheduler in self._schedulers), default=0.0)
+
+    async def registry_stats(self, local: dict) -> dict:
+        """
+        The model registries live in the workers: `local` (the in-process registry's
+        stats) plus every started lane's, summed. The stats job bypasses the lane's
+        scheduler queue but still waits for the task running in the worker, so a lane
+        busier than STATS_TIMEOUT is reported as null and left out of the totals.
+        """
+        started = [i for i, lane in enumerate(self._lanes) if lane is not None]
+        lanes = await asyncio.gather(*(self._lane_registry_stats(i) for i in started))
+        total = dict(local)
+        for lane in lanes:
+            for key, value in (lane or {}).items():
+                if isinstance(value, int) and not isinstance(value, bool) and key != "max_entries":
+                    total[key] = total.get(key, 0) + value
+        total["lanes"] = dict(zip(started, lanes))
+        return total
+
+    async def _lane_registry_stats(self, i: int) -> dict | None:
+        future = self._stats_pending.get(i)
+        if future is None or future.done() or future.get_loop() is not asyncio.get_running_loop():
+            # One outstanding stats job per lane, however often /health is polled
+            future = self._stats_pending[i] = asyncio.wrap_future(self._lane(i).submit(_registry_stats_job))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=STATS_TIMEOUT)
+        except Exception:
+            return None
+
+    def warm_up(self):
+        """Starts every worker and imports the analysis stack there (blocking; call from a thread)"""
+        futures = [self._lane(i).submit(_warm_up_job) for i in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        with self._lock:
+            lanes, self._lanes = self._lanes, [None] * self.workers
+        for executor in lanes:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "cores": available_cores(),
+            "started": sum(1 for lane in self._lanes if lane is not None),
+            "tasks": self.tasks,
+            "batches": self.batches,
+            "crashes": self.crashes,
+            "errors": self.errors,
+            "lanes": [scheduler.stats() for scheduler in self._schedulers],
+        }
+
+
+# Global instance
+regime_pool = RegimeWorkerPool()
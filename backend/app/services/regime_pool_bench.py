@@ -0,0 +1,79 @@
+"""
+Index-wide throughput of the regime worker pool.
+
+Runs the pure-NumPy stages of a lite (verdict-only) analysis, analysis.analyze_regimes,
+over a synthetic index (see portfolio_bench) in-process and on RegimeWorkerPools of
+1, 2, 4, ... workers up to --workers (default: the available cores). Per-ticker jobs
+are submitted all at once, as /api/portfolio does; worker start-up is excluded.
+Also reports scaling efficiency vs one worker and how many tickers get a different
+verdict or current regimes than the in-process run.
+
+Registry warm starts are off so every run fits cold; parallel speedup needs a
+multi-core machine (on one core the pool only adds pickling overhead).
+
+Usage: python -m backend.app.services.regime_pool_bench [--tickers 300] [--workers 4]
+"""
+import os
+import time
+import json
+import asyncio
+import argparse
+import logging
+
+from . import analysis
+from .portfolio_bench import synthetic_portfolio
+from .regime_pool import RegimeWorkerPool, available_cores
+
+
+def _summary(result: dict) -> tuple:
+    return result["stable_state"], int(result["regimes_ret"][-1]), int(result["regimes_diff"][-1])
+
+
+async def _sweep(pool: RegimeWorkerPool, portfolio: dict) -> dict:
+    results = await asyncio.gather(*(pool.run_regimes(t, d, verdict_only=True) for t, d in portfolio.items()))
+    return {t: _summary(r) for t, r in zip(portfolio, results)}
+
+
+def run_benchmark(n_tickers: int = 300, max_workers: int | None = None) -> dict:
+    os.environ["HMM_WARM_START"] = "0"   # Inherited by the spawned workers
+    analysis.HMM_WARM_START = False
+    max_workers = max_workers or available_cores()
+    portfolio = synthetic_portfolio(n_tickers)
+
+    start = time.perf_counter()
+    baseline = {t: _summary(analysis.analyze_regimes(d, t, verdict_only=True)) for t, d in portfolio.items()}
+    timings = {"in_process": time.perf_counter() - start}
+    mismatches = {}
+
+    workers = 1
+    while workers <= max_workers:
+        pool = RegimeWorkerPool(workers)
+        try:
+            pool.warm_up()
+            start = time.perf_counter()
+            results = asyncio.run(_sweep(pool, portfolio))
+            timings[f"workers_{workers}"] = time.perf_counter() - start
+        finally:
+            pool.shutdown()
+        mismatches[f"workers_{workers}"] = sum(results[t] != baseline[t] for t in portfolio)
+        workers = workers * 2 if workers * 2 <= max_workers or workers == max_workers else max_workers
+
+    one = timings["workers_1"]
+    return {
+        "tickers": n_tickers,
+        "cores": available_cores(),
+        "tickers_per_s": {k: round(n_tickers / v, 1) for k, v in timings.items()},
+        "scaling_efficiency_vs_1_worker": {
+            k: round(one / v / int(k.split("_")[1]), 2) for k, v in timings.items() if k.startswith("workers_")
+        },
+        "mismatches_vs_in_process": mismatches,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the regime worker pool")
+    parser.add_argument("--tickers", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=None, help="Largest pool size (default: available cores)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(json.dumps(run_benchmark(args.tickers, args.workers), indent=2))
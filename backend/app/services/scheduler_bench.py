@@ -0,0 +1,72 @@
+"""
+Single-ticker latency under bulk load on the serialized inference lane.
+
+Simulates the lane with a fixed service time per task (a thread-pool sleep, like
+run_in_threadpool around one HMM+score). A 300-ticker portfolio sweep is queued at
+t=0 and interactive /analyze requests arrive at a fixed interval while it drains.
+Compares the old FIFO asyncio.Semaphore(1) with core.scheduler.PriorityScheduler,
+plus an idle lane as the reference. Reports interactive latency percentiles and when
+the sweep finished (interleaving must not starve it).
+
+Usage: python -m backend.app.services.scheduler_bench [--portfolio 300] [--service-ms 10]
+"""
+import time
+import json
+import asyncio
+import argparse
+import logging
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from ..core.scheduler import PriorityScheduler, INTERACTIVE, PORTFOLIO
+
+
+def _percentiles(latencies: list) -> dict:
+    ms = np.array(latencies) * 1000
+    return {"p50": round(float(np.percentile(ms, 50)), 1), "p99": round(float(np.percentile(ms, 99)), 1),
+            "max": round(float(ms.max()), 1)}
+
+
+async def _scenario(lane, n_portfolio: int, n_interactive: int, service: float, interval: float) -> dict:
+    def slot(cls):
+        return lane.slot(cls) if isinstance(lane, PriorityScheduler) else lane
+
+    async def task(cls):
+        start = time.perf_counter()
+        async with slot(cls):
+            await run_in_threadpool(time.sleep, service)
+        return time.perf_counter() - start
+
+    t0 = time.perf_counter()
+    bulk = [asyncio.ensure_future(task(PORTFOLIO)) for _ in range(n_portfolio)]
+    interactive = []
+    for _ in range(n_interactive):
+        await asyncio.sleep(interval)
+        interactive.append(asyncio.ensure_future(task(INTERACTIVE)))
+    latencies = await asyncio.gather(*interactive)
+    await asyncio.gather(*bulk)
+    return {"interactive_ms": _percentiles(latencies), "sweep_s": round(time.perf_counter() - t0, 2)}
+
+
+def run_benchmark(n_portfolio: int = 300, service_ms: float = 10.0, n_interactive: int = 40) -> dict:
+    service = service_ms / 1000
+    interval = n_portfolio * service / (n_interactive + 1)   # Spread the requests over the sweep
+    return {
+        "portfolio_tasks": n_portfolio,
+        "service_ms": service_ms,
+        "interactive_requests": n_interactive,
+        "idle_lane": asyncio.run(_scenario(asyncio.Semaphore(1), 0, n_interactive, service, interval)),
+        "fifo_semaphore": asyncio.run(_scenario(asyncio.Semaphore(1), n_portfolio, n_interactive, service, interval)),
+        "priority_scheduler": asyncio.run(_scenario(PriorityScheduler("bench"), n_portfolio, n_interactive,
+                                                    service, interval)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark interactive latency under portfolio load")
+    parser.add_argument("--portfolio", type=int, default=300)
+    parser.add_argument("--service-ms", type=float, default=10.0)
+    parser.add_argument("--interactive", type=int, default=40)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(json.dumps(run_benchmark(args.portfolio, args.service_ms, args.interactive), indent=2))
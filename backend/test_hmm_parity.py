@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import logging
+import numpy as np
+from hmmlearn import hmm
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from app.services import regime_engine
+from app.services.regime_engine import UnivariateGaussianHMM
+
+logging.getLogger("hmmlearn").setLevel(logging.ERROR)
+
+# Same configuration as services.analysis
+N_COMPONENTS = 3
+N_ITER = 100
+RANDOM_STATE = 42
+MIN_COVAR = 1e-3
+TOLERANCE = 1e-8
+
+
+def synthetic_returns(seed, n=260):
+    """Daily log returns with regime switches and a few crash days."""
+    rng = np.random.default_rng(seed)
+    vol = np.where(rng.random(n) < 0.2, 0.035, 0.012)
+    drift = np.where(np.arange(n) % 90 < 45, 0.001, -0.0005)
+    r = rng.normal(drift, vol)
+    r[rng.integers(0, n, 4)] -= 0.05
+    return r.reshape(-1, 1)
+
+
+def fit_both(X, kernels):
+    ref = hmm.GaussianHMM(n_components=N_COMPONENTS, covariance_type="diag", n_iter=N_ITER,
+                          random_state=RANDOM_STATE, min_covar=MIN_COVAR).fit(X)
+    native = UnivariateGaussianHMM(n_components=N_COMPONENTS, n_iter=N_ITER, random_state=RANDOM_STATE,
+                                   min_covar=MIN_COVAR, kernels=kernels).fit(X)
+    return ref, native
+
+
+print("--- HMM ENGINE PARITY TEST ---")
+failures = 0
+for kernels in ("numpy", "compiled"):
+    for seed in range(10):
+        for name, X in (("returns", synthetic_returns(seed)), ("diff", np.diff(synthetic_returns(seed), axis=0))):
+            ref, native = fit_both(X, kernels)
+            same_states = np.array_equal(ref.predict(X), native.predict(X))
+            errors = {
+                "startprob": np.abs(ref.startprob_ - native.startprob_).max(),
+                "transmat": np.abs(ref.transmat_ - native.transmat_).max(),
+                "means": np.abs(ref.means_.ravel() - native.means_).max() / np.abs(ref.means_).max(),
+                "covars": np.abs(np.diagonal(ref.covars_, axis1=1, axis2=2).ravel() - native.covars_).max()
+                          / np.abs(ref.covars_).max(),
+                "probs": np.abs(ref.predict_proba(X) - native.predict_proba(X)).max(),
+            }
+            same_iters = ref.monitor_.iter == native.n_iter_
+            ok = same_states and same_iters and max(errors.values()) < TOLERANCE
+            failures += not ok
+            if not ok:
+                print(f"[{kernels}] seed {seed} {name}: states={same_states} iters={ref.monitor_.iter}/{native.n_iter_} "
+                      f"errors={ {k: f'{v:.2e}' for k, v in errors.items()} }")
+    print(f"[{kernels}] checked 20 fits")
+
+# "compiled" depends on hmmlearn's private _hmmc: without it, it must fall back to the NumPy kernels
+hmmlearn_module, regime_engine._KERNELS = sys.modules.get("hmmlearn"), {}
+sys.modules["hmmlearn"] = None   # Makes `from hmmlearn import _hmmc` raise ImportError
+try:
+    fallback_ok = regime_engine.get_kernels("compiled") is regime_engine
+finally:
+    sys.modules["hmmlearn"], regime_engine._KERNELS = hmmlearn_module, {}
+failures += not fallback_ok
+print(f"[compiled] fallback without hmmlearn._hmmc: {'numpy kernels' if fallback_ok else 'FAILED'}")
+
+X = synthetic_returns(0)
+for label, factory in (
+    ("hmmlearn", lambda: hmm.GaussianHMM(n_components=N_COMPONENTS, covariance_type="diag", n_iter=N_ITER,
+                                         random_state=RANDOM_STATE, min_covar=MIN_COVAR)),
+    ("native (numpy)", lambda: UnivariateGaussianHMM(n_components=N_COMPONENTS, n_iter=N_ITER,
+                                                     random_state=RANDOM_STATE, min_covar=MIN_COVAR, kernels="numpy")),
+    ("native (compiled)", lambda: UnivariateGaussianHMM(n_components=N_COMPONENTS, n_iter=N_ITER,
+                                                        random_state=RANDOM_STATE, min_covar=MIN_COVAR, kernels="compiled")),
+):
+    start = time.perf_counter()
+    for _ in range(10):
+        model = factory().fit(X)
+        model.predict(X)
+        model.predict_proba(X)
+    print(f"{label}: {(time.perf_counter() - start) / 10 * 1000:.1f} ms per fit+predict")
+
+print(f"\nParity: {'PASS' if failures == 0 else f'FAIL ({failures} mismatches)'}")
+sys.exit(1 if failures else 0)
@@ -0,0 +1,108 @@
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from app.core.singleflight import SingleFlight
+from app.core.scheduler import PriorityScheduler, inference_priority, INTERACTIVE, PORTFOLIO
+from app.core import deadline
+
+# Regression: once the last caller of a flight leaves, the flight is cancelled. A caller
+# arriving right after (before the cancelled task has unwound) must get a fresh flight
+# and its own result, never the abandoned flight's CancelledError.
+# Regression: a flight takes the best priority and latest deadline of its callers, not
+# just the starter's, so an interactive caller joining a portfolio flight is not served
+# at portfolio priority.
+
+
+async def check_late_caller_after_abandon() -> bool:
+    sf = SingleFlight("test")
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return len(runs)
+
+    first = asyncio.ensure_future(sf.run("k", work))
+    await asyncio.sleep(0)        # First caller starts the flight
+    first.cancel()
+    await asyncio.sleep(0)        # ...and leaves: the flight is cancelled, still unwinding
+    try:
+        result = await sf.run("k", work)
+    except asyncio.CancelledError:
+        print("late caller: CancelledError (joined the abandoned flight)")
+        return False
+    ok = result == 2 and sf.stats()["abandoned"] == 1 and sf.stats()["started"] == 2
+    print(f"late caller: result={result} stats={sf.stats()}")
+    return ok
+
+
+async def check_remaining_waiter_keeps_flight() -> bool:
+    sf = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    first = asyncio.ensure_future(sf.run("k", work))
+    second = asyncio.ensure_future(sf.run("k", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    result = await second
+    print(f"remaining waiter: result={result} stats={sf.stats()}")
+    return result == "done" and sf.stats()["abandoned"] == 0
+
+
+async def check_joiner_promotes_flight() -> bool:
+    sf = SingleFlight("test")
+    lane = PriorityScheduler("test", slots=1)
+    order = []
+
+    async def queued(name):
+        async with lane.slot():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def portfolio(coro):
+        inference_priority.set(PORTFOLIO)
+        return await coro
+
+    await lane.acquire(INTERACTIVE)   # Lane busy: everything below queues
+    others = [asyncio.ensure_future(portfolio(queued(f"portfolio-{i}"))) for i in range(3)]
+    await asyncio.sleep(0)
+    flight = asyncio.ensure_future(portfolio(sf.run("k", lambda: queued("flight"))))
+    await asyncio.sleep(0)
+    joiner = asyncio.ensure_future(sf.run("k", lambda: queued("flight")))   # Interactive by default
+    await asyncio.sleep(0)
+    lane.release()
+    await asyncio.gather(flight, joiner, *others)
+    print(f"promotion: order={order} stats={sf.stats()}")
+    return order[0] == "flight" and sf.stats()["promoted"] == 1
+
+
+async def check_joiner_extends_deadline() -> bool:
+    sf = SingleFlight("test")
+    seen = []
+
+    async def work():
+        await asyncio.sleep(0.02)
+        seen.append(deadline.remaining())
+
+    async def caller(budget):
+        deadline.start(budget)
+        await sf.run("k", work)
+
+    await asyncio.gather(caller(0.5), caller(30))
+    print(f"deadline: flight saw {seen[0]:.1f}s left")
+    return seen[0] > 20
+
+
+print("--- SINGLEFLIGHT CANCELLATION / PRIORITY TEST ---")
+failures = 0
+for check in (check_late_caller_after_abandon, check_remaining_waiter_keeps_flight,
+              check_joiner_promotes_flight, check_joiner_extends_deadline):
+    failures += not asyncio.run(check())
+
+print(f"\nSingleFlight: {'PASS' if failures == 0 else f'FAIL ({failures} checks)'}")
+sys.exit(1 if failures else 0)
@@ -13,20 +13,15 @@ os.environ["VECLIB_MAXIMUM_THREADS"] = "1"
 os.environ["NUMEXPR_NUM_THREADS"] = "1"
 os.environ["PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION"] = "python"
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
-from hmmlearn import hmm
 from datetime import datetime, timedelta
 import re
 import logging
 from concurrent.futures import ThreadPoolExecutor
 import time
 import asyncio
-import torch
-torch.set_num_threads(1)
-if torch.get_num_interop_threads() > 1:
-    torch.set_num_interop_threads(1)
+# torch is imported (and limited to 1 thread) by chronos_service when the model warms up
 # Configure structured logging
 logging.basicConfig(
     level=logging.INFO,
@@ -57,8 +52,6 @@ cpu_executor = ThreadPoolExecutor(max_workers=1)
 
 from backend.app.services.chronos import chronos_service
 
-# Redundant Local Chronos loading removed in favor of chronos_service
-pipeline = chronos_service.pipeline
 logger.info("Sistema de predicción Chronos vinculado desde servicios centrales")
 
 # ... (rest of imports)
@@ -79,6 +72,12 @@ class ChatResponse(BaseModel):
     response: str
 
 app = FastAPI()
+
+# Chronos loads in background at startup (GBM fallback until ready)
+@app.on_event("startup")
+async def warm_up_chronos():
+    asyncio.get_running_loop().run_in_executor(io_executor, chronos_service.warm_up)
+
 logger.info(f"Starting StockAI Pulse Backend - {VERSION}")
 
 # CORS configuration
@@ -148,17 +147,17 @@ except ImportError:
     limiter = None
 
 from backend.app.services.analysis import train_hmm_returns, train_hmm_diff, generate_ai_recommendation
+from backend.app.services.regime_pool import regime_pool
 
-# Response cache (TTL: 5 minutes) - DISABLED FOR VERIFICATION
-response_cache = {}
-CACHE_TTL = 0  # Set to 0 to bypass cache
+# Response cache: shared market-aware cache (fresh until next session open when closed)
+from backend.app.core.response_cache import analysis_cache
 
 def get_from_cache(cache_key: str):
-    return None # Always miss for now
+    return analysis_cache.get_fresh(cache_key)
 
 def save_to_cache(cache_key: str, data: dict):
-    """Save response to cache with current timestamp"""
-    response_cache[cache_key] = (datetime.now(), data)
+    """Save response to the shared analysis cache"""
+    analysis_cache.put(cache_key, cache_key.split(":")[0], data)
     logger.debug(f"Saved to cache: {cache_key}")
 
 # Redundant functions removed (using backend.app.services.analysis)
@@ -177,7 +176,7 @@ async def health_check():
     llm_active = llm_service.is_active()
     return {
         "status": "healthy",
-        "chronos_loaded": pipeline is not None,
+        "chronos_loaded": chronos_service.enabled,
         "rate_limiting": RATE_LIMIT_ENABLED,
         "llm_active": llm_active,
         "timestamp": datetime.now().isoformat()
@@ -197,7 +196,7 @@ async def analyze_stock(ticker: str, request: Request):
     logger.info(f"Análisis solicitado para: {ticker}")
     
     # Check cache first
-    cache_key = f"{ticker}_{datetime.now().date()}"
+    cache_key = f"{ticker}:legacy"
     cached_response = get_from_cache(cache_key)
     if cached_response:
         return cached_response
@@ -212,6 +211,7 @@ async def analyze_stock(ticker: str, request: Request):
         
         # Obtener datos de forma asíncrona para no bloquear el loop
         logger.debug(f"Descargando datos para {ticker} desde {start_date.date()} hasta {end_date.date()}")
+        import yfinance as yf  # Lazy: keeps the import off the cold-start path
         ticker_obj = yf.Ticker(ticker)
         
         loop = asyncio.get_running_loop()
@@ -262,10 +262,18 @@ async def analyze_stock(ticker: str, request: Request):
         loop = asyncio.get_running_loop()
         
         # Add a safety timeout (60s) for the combined HMM training to allow queue waiting
-        regimes_ret, probs_ret, final_ret_stats, regimes_diff, probs_diff, final_diff_stats = await asyncio.wait_for(
-            loop.run_in_executor(cpu_executor, train_hmms_combined, data),
-            timeout=60.0
-        )
+        if regime_pool.enabled:
+            # HMM work goes to the regime worker pool (parallel across cores); cpu_executor stays the Chronos lane
+            regimes = await asyncio.wait_for(regime_pool.run_regimes(ticker, data), timeout=60.0)
+            regimes_ret, probs_ret, final_ret_stats, regimes_diff, probs_diff, final_diff_stats = (
+                regimes[k] for k in ("regimes_ret", "probs_ret", "final_ret_stats",
+                                     "regimes_diff", "probs_diff", "final_diff_stats")
+            )
+        else:
+            regimes_ret, probs_ret, final_ret_stats, regimes_diff, probs_diff, final_diff_stats = await asyncio.wait_for(
+                loop.run_in_executor(cpu_executor, train_hmms_combined, data),
+                timeout=60.0
+            )
         
         hmm_duration = time.time() - hmm_start
         logger.debug(f"HMM completado en {hmm_duration:.2f}s")
@@ -276,7 +284,7 @@ async def analyze_stock(ticker: str, request: Request):
         forecast_result = []
         last_date = data.index[-1]
         
-        if chronos_service.enabled:
+        if chronos_service.available:
             try:
                 # Use unified chronos_service prediction logic
                 forecast_data = await asyncio.wait_for(
@@ -34,6 +34,7 @@ const App = () => {
     portfolioData,
     loading: portfolioLoading,
     error: portfolioError,
+    progress: portfolioProgress,
     addTicker,
     removeTicker,
     analyzePortfolio
@@ -44,7 +45,8 @@ const App = () => {
     loading: indicesLoading,
     error: indicesError,
     analyzeIndices,
-    currentIndex
+    currentIndex,
+    progress: indicesProgress
   } = useIndices();
 
   const handleSearch = (e) => {
@@ -110,6 +112,7 @@ const App = () => {
               portfolioTickers={portfolioTickers}
               portfolioData={portfolioData}
               portfolioLoading={portfolioLoading}
+              portfolioProgress={portfolioProgress}
               removeTicker={removeTicker}
               analyzePortfolio={analyzePortfolio}
               onNavigateToTicker={handleNavigateToTicker}
@@ -120,6 +123,7 @@ const App = () => {
             <IndicesView
               indicesData={indicesData}
               indicesLoading={indicesLoading}
+              indicesProgress={indicesProgress}
               analyzeIndices={analyzeIndices}
               currentIndex={currentIndex}
               handleIndexSelect={handleIndexSelect}
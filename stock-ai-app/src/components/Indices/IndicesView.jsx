@@ -6,6 +6,7 @@ import { INDICES_CONSTITUENTS } from '../../data/indices';
 export const IndicesView = ({
     indicesData,
     indicesLoading,
+    indicesProgress,
     analyzeIndices,
     currentIndex,
     handleIndexSelect,
@@ -67,7 +68,7 @@ export const IndicesView = ({
                         </div>
                     )}
 
-                    {indicesLoading && (
+                    {indicesLoading && !indicesData && (
                         <div style={{ height: '100%', display: 'flex', flexDirection: 'column', alignItems: 'center', justifyContent: 'center', textAlign: 'center' }}>
                             <div style={{ width: '64px', height: '64px', border: '4px solid #38bdf8', borderTopColor: 'transparent', borderRadius: '50%', animation: 'spin 1.2s cubic-bezier(0.4, 0, 0.2, 1) infinite', marginBottom: '24px' }}></div>
                             <h4 style={{ fontSize: '1.2rem', fontWeight: 700 }}>Analizando {currentIndex}...</h4>
@@ -75,12 +76,15 @@ export const IndicesView = ({
                         </div>
                     )}
 
-                    {indicesData && !indicesLoading && (
+                    {indicesData && (
                         <div>
                             <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', marginBottom: '32px' }}>
                                 <div>
                                     <h2 style={{ fontSize: '1.8rem', fontWeight: 800, margin: 0 }}>Oportunidades en {currentIndex}</h2>
-                                    <p style={{ color: '#94a3b8', margin: '4px 0 0' }}>Filtrando por <strong>COMPRA FUERTE</strong></p>
+                                    <p style={{ color: '#94a3b8', margin: '4px 0 0' }}>
+                                        Filtrando por <strong>COMPRA FUERTE</strong>
+                                        {indicesLoading && ` · analizados ${indicesProgress?.done || 0}/${indicesProgress?.total || '…'}`}
+                                    </p>
                                 </div>
                                 <div style={{ padding: '8px 20px', borderRadius: '20px', background: '#38bdf820', border: '1px solid #38bdf840', color: '#38bdf8', fontWeight: 800, fontSize: '0.9rem' }}>
                                     {indicesData.assets.filter(a => a.recommendation?.verdict === 'COMPRA FUERTE').length} OPORTUNIDADES
@@ -103,7 +107,7 @@ export const IndicesView = ({
                                         />
                                     ))}
 
-                                {indicesData.assets.filter(a => a.recommendation?.verdict === 'COMPRA FUERTE').length === 0 && (
+                                {!indicesLoading && indicesData.assets.filter(a => a.recommendation?.verdict === 'COMPRA FUERTE').length === 0 && (
                                     <div style={{ gridColumn: '1 / -1', padding: '60px', textAlign: 'center', background: 'rgba(255,255,255,0.02)', borderRadius: '16px', border: '1px dashed rgba(255,255,255,0.1)' }}>
                                         <p style={{ fontSize: '1.1rem', color: '#94a3b8', marginBottom: '8px' }}>No se han encontrado oportunidades claras.</p>
                                         <p style={{ fontSize: '0.9rem', color: '#64748b' }}>Ningún activo del {currentIndex} presenta actualmente una señal de <strong>COMPRA FUERTE</strong>.</p>
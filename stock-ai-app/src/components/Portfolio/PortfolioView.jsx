@@ -6,6 +6,7 @@ export const PortfolioView = ({
     portfolioTickers,
     portfolioData,
     portfolioLoading,
+    portfolioProgress,
     removeTicker,
     analyzePortfolio,
     onNavigateToTicker
@@ -50,7 +51,7 @@ export const PortfolioView = ({
 
             <div className="portfolio-content" style={{ gridColumn: 'span 9' }}>
                 <div style={{ padding: '32px', borderRadius: '24px', background: 'rgba(15, 23, 42, 0.4)', border: '1px solid rgba(255,255,255,0.05)', minHeight: '500px' }}>
-                    {portfolioLoading ? (
+                    {portfolioLoading && !portfolioData ? (
                         <div key="loading" style={{ height: '100%', display: 'flex', flexDirection: 'column', alignItems: 'center', justifyContent: 'center', textAlign: 'center' }}>
                             <div style={{ width: '64px', height: '64px', border: '4px solid #38bdf8', borderTopColor: 'transparent', borderRadius: '50%', animation: 'spin 1.2s cubic-bezier(0.4, 0, 0.2, 1) infinite', marginBottom: '24px' }}></div>
                             <h4 style={{ fontSize: '1.2rem', fontWeight: 700 }}>Sincronizando Modelos HMM...</h4>
@@ -60,20 +61,28 @@ export const PortfolioView = ({
                         <div key="content">
                             <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', marginBottom: '32px' }}>
                                 <h3 style={{ margin: 0, fontSize: '1.5rem', fontWeight: 800 }}>Veredicto Agregado HMM</h3>
-                                <div style={{ padding: '8px 20px', borderRadius: '20px', background: portfolioData.summary.risk_level === 'Alto' ? '#ef444420' : '#10b98120', border: '1px solid ' + (portfolioData.summary.risk_level === 'Alto' ? '#ef444440' : '#10b98140'), color: portfolioData.summary.risk_level === 'Alto' ? '#ef4444' : '#10b981', fontWeight: 800, fontSize: '0.8rem' }}>
-                                    RIESGO: {portfolioData.summary.risk_level?.toUpperCase() || 'DESCONOCIDO'}
-                                </div>
+                                {portfolioData.summary ? (
+                                    <div style={{ padding: '8px 20px', borderRadius: '20px', background: portfolioData.summary.risk_level === 'Alto' ? '#ef444420' : '#10b98120', border: '1px solid ' + (portfolioData.summary.risk_level === 'Alto' ? '#ef444440' : '#10b98140'), color: portfolioData.summary.risk_level === 'Alto' ? '#ef4444' : '#10b981', fontWeight: 800, fontSize: '0.8rem' }}>
+                                        RIESGO: {portfolioData.summary.risk_level?.toUpperCase() || 'DESCONOCIDO'}
+                                    </div>
+                                ) : (
+                                    <div style={{ padding: '8px 20px', borderRadius: '20px', background: '#38bdf820', border: '1px solid #38bdf840', color: '#38bdf8', fontWeight: 800, fontSize: '0.8rem' }}>
+                                        ANALIZANDO {portfolioProgress?.done || 0}/{portfolioProgress?.total || '…'}
+                                    </div>
+                                )}
                             </div>
 
-                            <div style={{ padding: '24px', borderRadius: '20px', background: 'linear-gradient(135deg, rgba(56, 189, 248, 0.1) 0%, rgba(15, 23, 42, 1) 100%)', border: '1px solid rgba(56, 189, 248, 0.2)', marginBottom: '32px' }}>
-                                <div style={{ display: 'flex', gap: '16px', alignItems: 'flex-start' }}>
-                                    <Activity style={{ width: '28px', color: '#38bdf8', marginTop: '4px', flexShrink: 0 }} />
-                                    <p style={{ margin: 0, fontSize: '1.1rem', lineHeight: 1.6, fontWeight: 500, whiteSpace: 'pre-wrap' }}>{portfolioData.summary.advice || 'Análisis no disponible.'}</p>
+                            {portfolioData.summary && (
+                                <div style={{ padding: '24px', borderRadius: '20px', background: 'linear-gradient(135deg, rgba(56, 189, 248, 0.1) 0%, rgba(15, 23, 42, 1) 100%)', border: '1px solid rgba(56, 189, 248, 0.2)', marginBottom: '32px' }}>
+                                    <div style={{ display: 'flex', gap: '16px', alignItems: 'flex-start' }}>
+                                        <Activity style={{ width: '28px', color: '#38bdf8', marginTop: '4px', flexShrink: 0 }} />
+                                        <p style={{ margin: 0, fontSize: '1.1rem', lineHeight: 1.6, fontWeight: 500, whiteSpace: 'pre-wrap' }}>{portfolioData.summary.advice || 'Análisis no disponible.'}</p>
+                                    </div>
                                 </div>
-                            </div>
+                            )}
 
                             {/* Gemini AI Analyst Panel */}
-                            {portfolioData.summary.ai_insight && (
+                            {portfolioData.summary?.ai_insight && (
                                 <div style={{ marginBottom: '40px', padding: '24px', borderRadius: '20px', background: 'rgba(15, 23, 42, 0.6)', border: `1px solid ${portfolioData.summary.ai_insight.color}40`, position: 'relative', overflow: 'hidden' }}>
                                     <div style={{ position: 'absolute', top: 0, left: 0, width: '4px', height: '100%', background: portfolioData.summary.ai_insight.color }} />
 
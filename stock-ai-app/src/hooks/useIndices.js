@@ -1,4 +1,5 @@
 import { useState, useCallback } from 'react';
+import { streamPortfolio } from '../utils/portfolioStream';
 
 const API_URL = import.meta.env.PROD
     ? ''
@@ -9,6 +10,7 @@ export const useIndices = () => {
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState(null);
     const [currentIndex, setCurrentIndex] = useState(null);
+    const [progress, setProgress] = useState(null);
 
     const analyzeIndices = useCallback(async (tickers, indexName) => {
         if (!tickers || tickers.length === 0) return;
@@ -17,22 +19,21 @@ export const useIndices = () => {
         setError(null);
         setIndicesData(null);
         setCurrentIndex(indexName);
+        setProgress(null);
 
         try {
-            const resp = await fetch(`${API_URL}/api/portfolio`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(tickers)
+            // Components render as they arrive; summary stays null until the final event
+            const result = await streamPortfolio(API_URL, tickers, {
+                onAsset: (asset) => setIndicesData(prev => ({
+                    assets: [...(prev?.assets || []), asset],
+                    summary: null
+                })),
+                onProgress: setProgress
             });
-            if (!resp.ok) {
-                const errData = await resp.json().catch(() => ({}));
-                throw new Error(errData.detail || "Error al analizar componentes del índice.");
-            }
-            const result = await resp.json();
             setIndicesData(result);
         } catch (err) {
             console.error(err);
-            setError(err.message);
+            setError(err.message || "Error al analizar componentes del índice.");
         } finally {
             setLoading(false);
         }
@@ -43,6 +44,7 @@ export const useIndices = () => {
         loading,
         error,
         analyzeIndices,
-        currentIndex
+        currentIndex,
+        progress
     };
 };
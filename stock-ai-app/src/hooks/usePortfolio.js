@@ -1,4 +1,5 @@
 import { useState, useEffect, useCallback } from 'react';
+import { streamPortfolio } from '../utils/portfolioStream';
 
 const API_URL = import.meta.env.PROD
     ? ''
@@ -13,6 +14,7 @@ export const usePortfolio = () => {
     const [portfolioData, setPortfolioData] = useState(null);
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState(null);
+    const [progress, setProgress] = useState(null);
 
     // Persistence
     useEffect(() => {
@@ -33,20 +35,20 @@ export const usePortfolio = () => {
         if (portfolioTickers.length === 0) return;
         setLoading(true);
         setError(null);
+        setPortfolioData(null);
+        setProgress(null);
         try {
-            const resp = await fetch(`${API_URL}/api/portfolio`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(portfolioTickers)
+            // Assets render as they arrive; summary stays null until the final event
+            const result = await streamPortfolio(API_URL, portfolioTickers, {
+                onAsset: (asset) => setPortfolioData(prev => ({
+                    assets: [...(prev?.assets || []), asset],
+                    summary: null
+                })),
+                onProgress: setProgress
             });
-            if (!resp.ok) {
-                const errData = await resp.json().catch(() => ({}));
-                throw new Error(errData.detail || "Error al analizar la cartera.");
-            }
-            const result = await resp.json();
             setPortfolioData(result);
         } catch (err) {
-            setError(err.message);
+            setError(err.message || "Error al analizar la cartera.");
         } finally {
             setLoading(false);
         }
@@ -57,6 +59,7 @@ export const usePortfolio = () => {
         portfolioData,
         loading,
         error,
+        progress,
         addTicker,
         removeTicker,
         analyzePortfolio
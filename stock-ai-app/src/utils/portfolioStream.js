@@ -0,0 +1,55 @@
+// Reads POST /api/portfolio/stream (NDJSON): one event per line as {event, data}.
+// Calls onAsset(asset) as each lite result arrives and onProgress({done, total, failed})
+// after every asset or failure. Resolves with {assets, summary} like /api/portfolio.
+export const streamPortfolio = async (apiUrl, tickers, { onAsset, onProgress, signal } = {}) => {
+    const resp = await fetch(`${apiUrl}/api/portfolio/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(tickers),
+        signal
+    });
+    if (!resp.ok) {
+        const errData = await resp.json().catch(() => ({}));
+        throw new Error(errData.detail || `Error ${resp.status}`);
+    }
+
+    const assets = [];
+    const progress = { done: 0, total: tickers.length, failed: [] };
+    let summary = null;
+
+    const handle = ({ event, data }) => {
+        if (event === 'start') {
+            progress.total = data.total;
+            onProgress?.({ ...progress });
+        } else if (event === 'asset') {
+            assets.push(data);
+            progress.done += 1;
+            onAsset?.(data);
+            onProgress?.({ ...progress });
+        } else if (event === 'failed') {
+            progress.done += 1;
+            progress.failed = [...progress.failed, data.ticker];
+            onProgress?.({ ...progress });
+        } else if (event === 'summary') {
+            summary = data;
+        } else if (event === 'error') {
+            throw new Error(data.detail);
+        }
+    };
+
+    const reader = resp.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+        const { value, done } = await reader.read();
+        buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.filter(line => line.trim()).forEach(line => handle(JSON.parse(line)));
+        if (done) break;
+    }
+    if (buffer.trim()) handle(JSON.parse(buffer));
+
+    if (!summary) throw new Error('La respuesta de la cartera se interrumpió.');
+    return { assets, summary };
+};